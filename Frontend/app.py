@@ -12,6 +12,46 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 if "conversation_id" not in st.session_state:
     st.session_state.conversation_id = str(uuid.uuid4())
+if "older_conversations" not in st.session_state:
+    st.session_state.older_conversations = []
+if "conversations_cursor" not in st.session_state:
+    st.session_state.conversations_cursor = None
+if "history_cursor" not in st.session_state:
+    st.session_state.history_cursor = None
+
+def auth_headers():
+    return {"Authorization": f"Bearer {st.session_state.access_token}"}
+
+def fetch_conversations(cursor=None):
+    params = {"limit": 20}
+    if cursor is not None:
+        params["cursor"] = cursor
+    try:
+        response = requests.get(f"{API_URL}/conversations", params=params, headers=auth_headers())
+        if response.status_code == 200:
+            return response.json()
+    except Exception:
+        pass
+    return {"conversations": [], "next_cursor": None}
+
+def fetch_messages(conversation_id, cursor=None):
+    params = {"limit": 50}
+    if cursor is not None:
+        params["cursor"] = cursor
+    try:
+        response = requests.get(f"{API_URL}/conversations/{conversation_id}/messages", params=params, headers=auth_headers())
+        if response.status_code == 200:
+            return response.json()
+    except Exception:
+        pass
+    return {"messages": [], "next_cursor": None}
+
+def open_conversation(conversation_id):
+    page = fetch_messages(conversation_id)
+    st.session_state.conversation_id = conversation_id
+    st.session_state.messages = [{"role": m["role"], "content": m["content"]} for m in page["messages"]]
+    st.session_state.history_cursor = page["next_cursor"]
+    st.rerun()
 
 def login():
     # Remove excessive top padding and expand max width for a desktop-friendly layout
@@ -93,15 +133,25 @@ def login():
                                 st.session_state.access_token = data.get("access_token")
                                 st.success("✅ Login successful! Redirecting...")
                                 st.rerun()
+                            elif response.status_code in (429, 503):
+                                st.warning(f"⏳ Too many sign-in attempts right now. Please try again in {response.headers.get('Retry-After', 'a few')} seconds.")
                             else:
                                 st.error("❌ Invalid username or password.")
                     except Exception as e:
                         st.error(f"❌ Failed to connect to backend API.")
 
 def logout():
+    if st.session_state.access_token:
+        try:
+            requests.post(f"{API_URL}/logout", headers=auth_headers())
+        except Exception:
+            pass
     st.session_state.access_token = None
     st.session_state.messages = []
     st.session_state.conversation_id = str(uuid.uuid4())
+    st.session_state.older_conversations = []
+    st.session_state.conversations_cursor = None
+    st.session_state.history_cursor = None
     st.rerun()
 
 def chat_interface():
@@ -170,24 +220,45 @@ def chat_interface():
         if st.button("➕ New Chat", use_container_width=True, type="primary"):
             st.session_state.messages = []
             st.session_state.conversation_id = str(uuid.uuid4())
+            st.session_state.history_cursor = None
             st.rerun()
             
         st.markdown("<div class='sidebar-title'>Recent Chats</div>", unsafe_allow_html=True)
         
-        # Display the current active chat session in the history section
-        # Ideally, you would fetch historical conversation IDs from the backend here.
-        # For now, we represent the current session dynamically.
+        # Most recent page from the backend, plus any older pages the user asked for
+        recent = fetch_conversations()
+        conversations = recent["conversations"] + st.session_state.older_conversations
+        next_cursor = st.session_state.conversations_cursor if st.session_state.older_conversations else recent["next_cursor"]
         session_id_short = st.session_state.conversation_id[:8]
-        if st.session_state.messages:
-            preview = st.session_state.messages[0]["content"][:20] + "..."
-        else:
-            preview = "New Conversation"
-            
-        st.markdown(f"""
-        <div class='history-item history-item-active'>
-            💬 <span>{preview}</span>
-        </div>
-        """, unsafe_allow_html=True)
+
+        # a new chat is not in the backend index until its first answer is saved
+        if all(c["conversation_id"] != st.session_state.conversation_id for c in conversations):
+            if st.session_state.messages:
+                preview = st.session_state.messages[0]["content"][:20] + "..."
+            else:
+                preview = "New Conversation"
+            st.markdown(f"""
+            <div class='history-item history-item-active'>
+                💬 <span>{preview}</span>
+            </div>
+            """, unsafe_allow_html=True)
+
+        seen = set()
+        for conversation in conversations:
+            conversation_id = conversation["conversation_id"]
+            if conversation_id in seen:
+                continue
+            seen.add(conversation_id)
+            active = conversation_id == st.session_state.conversation_id
+            label = f"💬 {conversation['title'] or 'Untitled'}"
+            if st.button(label, key=f"conv_{conversation_id}", use_container_width=True, disabled=active):
+                open_conversation(conversation_id)
+
+        if next_cursor is not None and st.button("Show older chats", use_container_width=True):
+            page = fetch_conversations(next_cursor)
+            st.session_state.older_conversations += page["conversations"]
+            st.session_state.conversations_cursor = page["next_cursor"]
+            st.rerun()
         
         st.markdown("<br><br><br>", unsafe_allow_html=True)
         st.markdown("<div class='sidebar-title'>Settings</div>", unsafe_allow_html=True)
@@ -214,6 +285,13 @@ def chat_interface():
             </div>
         """, unsafe_allow_html=True)
 
+    if st.session_state.history_cursor is not None and st.button("Load earlier messages"):
+        page = fetch_messages(st.session_state.conversation_id, st.session_state.history_cursor)
+        earlier = [{"role": m["role"], "content": m["content"]} for m in page["messages"]]
+        st.session_state.messages = earlier + st.session_state.messages
+        st.session_state.history_cursor = page["next_cursor"]
+        st.rerun()
+
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
@@ -250,6 +328,8 @@ def chat_interface():
                     elif response.status_code == 401:
                         st.error("Session expired or invalid token. Please log in again.")
                         logout()
+                    elif response.status_code in (429, 503):
+                        st.warning(f"The assistant is busy right now. Please try again in {response.headers.get('Retry-After', 'a few')} seconds.")
                     else:
                         st.error(f"Error: {response.status_code}")
             except Exception as e:
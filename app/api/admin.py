@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from app.api.dependencies import get_current_user
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.services.retrieval import current_generation, broadcast_reload
+from app.services.ollama_pool import get_pool
+
+router = APIRouter()
+
+def require_admin(user=Depends(get_current_user)):
+    admin_roles = {r.strip().casefold() for r in settings.ADMIN_ROLES.split(",")}
+    if str(user.get("role", "")).casefold() not in admin_roles:
+        logger.warning(f"Admin endpoint denied | User: {user.get('sub')} | Role: {user.get('role')}")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="admin role required"
+        )
+    return user
+
+@router.get("/admin/index")
+def index_status(user=Depends(require_admin)):
+    return current_generation().describe()
+
+@router.post("/admin/reload-index")
+def reload_page_index(user=Depends(require_admin)):
+    logger.info(f"Index reload requested by: {user.get('sub')}")
+    try:
+        generation = broadcast_reload()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"index reload failed: {str(e)}"
+        )
+    return generation.describe()
+
+@router.get("/admin/ollama")
+def ollama_status(user=Depends(require_admin)):
+    return get_pool().describe()
+
+@router.get("/metrics")
+def get_metrics(user=Depends(require_admin)):
+    return metrics.snapshot()
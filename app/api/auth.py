@@ -1,15 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from app.models import Employee
-from app.core.config import SessionLocal
-from app.core.security import verify_password, create_access_tokens
-from app.api.dependencies import get_current_user
+from app.core.config import SessionLocal, settings
+from app.core.security import averify_password, create_access_tokens, revoke_token
+from app.core.rate_limit import RateLimiter
+from app.core.metrics import metrics
+from app.services.scheduler import PASSWORD_SCHEDULER, SchedulerRejected
+from app.api.dependencies import get_current_user, oauth2_scheme
 from app.core.logger import logger
 import time
+import asyncio
 
 router = APIRouter()
 
+# failed attempts per account and per client IP; limited callers are refused before bcrypt runs
+ACCOUNT_LIMITER = RateLimiter("login_account", settings.LOGIN_ACCOUNT_FAILURES, settings.LOGIN_FAILURE_WINDOW)
+IP_LIMITER = RateLimiter("login_ip", settings.LOGIN_IP_FAILURES, settings.LOGIN_FAILURE_WINDOW)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -28,28 +36,58 @@ def get_me(user=Depends(get_current_user)):
 
 
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     start_time = time.time()
+    account = form_data.username.casefold()
+    client_ip = request.client.host if request.client else "unknown"
     logger.info(f"Login attempt for email: {form_data.username}")
 
-    existing = db.query(Employee).filter(Employee.email == form_data.username).first()
+    def fail(outcome, status_code, detail, headers=None):
+        metrics.incr(f"auth.login.{outcome}")
+        metrics.observe("auth.login", time.time() - start_time)
+        return HTTPException(status_code=status_code, detail=detail, headers=headers)
+
+    # the attempt is counted before the lookup and bcrypt, and refunded below unless it fails
+    retry_after = ACCOUNT_LIMITER.try_acquire(account)
+    if not retry_after:
+        retry_after = IP_LIMITER.try_acquire(client_ip)
+        if retry_after:
+            ACCOUNT_LIMITER.refund(account)
+    if retry_after:
+        logger.warning(f"Login rate limited | Email: {form_data.username} | IP: {client_ip} | Retry-After: {retry_after}s")
+        raise fail("rate_limited", status.HTTP_429_TOO_MANY_REQUESTS, "too many failed login attempts", {"Retry-After": str(retry_after)})
+
+    def refund_attempt():
+        ACCOUNT_LIMITER.refund(account)
+        IP_LIMITER.refund(client_ip)
+
+    existing = await asyncio.to_thread(lambda: db.query(Employee).filter(Employee.email == form_data.username).first())
 
     if not existing:
         logger.warning(f"Login failed - employee not found: {form_data.username}")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="employee does not exist"
-        )
+        raise fail("failed", status.HTTP_401_UNAUTHORIZED, "employee does not exist")
 
-    if not verify_password(form_data.password, existing.hashed_password):
+    try:
+        ticket = await PASSWORD_SCHEDULER.acquire()
+    except SchedulerRejected as e:
+        refund_attempt()
+        logger.warning(f"Login rejected | Email: {form_data.username} | Status: {e.status_code} | Retry-After: {e.retry_after}s")
+        raise fail("rejected", e.status_code, e.detail, {"Retry-After": str(e.retry_after)})
+    try:
+        valid = await averify_password(form_data.password, existing.hashed_password)
+    finally:
+        ticket.release()
+
+    if not valid:
         logger.warning(f"Login failed - incorrect password for: {form_data.username}")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="incorrect password"
-        )
+        raise fail("failed", status.HTTP_401_UNAUTHORIZED, "incorrect password")
 
+    ACCOUNT_LIMITER.reset(account)
+    IP_LIMITER.refund(client_ip)
     access_token = create_access_tokens(data={"sub": existing.email,  "role": existing.role})
 
+    metrics.incr("auth.login.succeeded")
+    metrics.observe("auth.login", time.time() - start_time)
     total_time = round(time.time() - start_time, 2)
 
     logger.info( f"Login successful | Employee: {existing.email} | Role: {existing.role} | Time: {total_time}s")
@@ -58,4 +96,11 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     return {
         "access_token": access_token,
         "token_type": "bearer"
-    }
\ No newline at end of file
+    }
+
+
+@router.post("/logout")
+def logout(token: str = Depends(oauth2_scheme), user=Depends(get_current_user)):
+    revoke_token(token)
+    logger.info(f"Logout | Token revoked for user: {user.get('sub')}")
+    return {"message": "Logged out"}
@@ -1,20 +1,29 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from app.api.dependencies import get_current_user
-from app.core.cache import add_message, get_messages, redis_client
+from app.core.cache import asave_turn, aget_history, aget_ollama_context
 from app.core.logger import logger
+from app.core.config import settings
 from pydantic import BaseModel
 from fastapi.responses import StreamingResponse
-from app.services.rag_orchestrator import stream_response
+from app.services.rag_orchestrator import aprepare_prompt, route_message, canned_reply, build_smalltalk_prompt
+from app.core.metrics import metrics
+from app.services.streaming import astream_ollama
+from app.services.coalescer import COALESCER, generation_key
+from app.services.answer_cache import answer_cache_key, get_cached_answer, replay_answer, cache_answer
+from app.services.summarizer import history_context, schedule_summary
+from app.services.scheduler import LLM_SCHEDULER, SMALLTALK_SCHEDULER, SchedulerRejected, request_priority
 import time
+import asyncio
 
 router = APIRouter()
 
 class ChatRequest(BaseModel):
     query: str
     conversation_id: str
+    batch: bool = False
 
 @router.post("/chat")
-def chat(requests: ChatRequest, current_user: dict = Depends(get_current_user)):
+async def chat(requests: ChatRequest, current_user: dict = Depends(get_current_user)):
 
     start_time = time.time()
 
@@ -25,30 +34,104 @@ def chat(requests: ChatRequest, current_user: dict = Depends(get_current_user)):
     logger.info(f"/chat | User: {username} | Role: {user_role} | Conv: {conversation_id}")
     logger.info(f"User Query: {requests.query}")
 
-    history = get_messages(username=username, conversation_id=conversation_id)
+    # small talk skips retrieval and history: a canned reply or a short answer from the small model
+    intent, route = route_message(requests.query)
 
-    def response_generator():
+    async def load_history():
+        if settings.HISTORY_SUMMARY:
+            summary, history = await asyncio.to_thread(history_context, username, conversation_id)
+            conversation_context = await aget_ollama_context(username, conversation_id) if settings.CONVERSATION_CONTEXT else None
+            return summary, history, conversation_context
+        history, conversation_context = await aget_history(username, conversation_id, settings.CONVERSATION_CONTEXT)
+        return None, history, conversation_context
+
+    # filled from Ollama's final stream message when this request runs the generation
+    ollama_state = {}
+
+    def on_generation_done(backend, data):
+        ollama_state.update(backend=backend.url, context=data.get("context"))
+
+    async def save_turn(full_answer):
+        ollama_context = None
+        if settings.CONVERSATION_CONTEXT:
+            # a replayed or shared answer leaves no context for this turn, so the stored one is dropped
+            ollama_context = {"model": settings.OLLAMA_MODEL, "backend": ollama_state.get("backend"), "context": ollama_state.get("context")}
+        await asave_turn(username, conversation_id, requests.query, full_answer, ollama_context)
+        if settings.HISTORY_SUMMARY:
+            schedule_summary(username, conversation_id)
+
+    async def acquire_slot(scheduler):
+        # wait for a generation slot before answering, so overload is reported with a status code, not a stalled stream
+        try:
+            return await scheduler.acquire(request_priority(user_role, requests.batch))
+        except SchedulerRejected as e:
+            logger.warning(f"/chat rejected | User: {username} | Status: {e.status_code} | Retry-After: {e.retry_after}s")
+            raise HTTPException(
+                status_code=e.status_code,
+                detail=e.detail,
+                headers={"Retry-After": str(e.retry_after)}
+            )
+
+    async def rag_chunks():
+        prompt, conversation_context = await aprepare_prompt(requests.query, user_role, load_history)
+
+        if conversation_context:
+            # the answer depends on the conversation's stored context, so it is neither cached nor shared
+            answer_key = key = None
+            cached_answer = None
+            start = lambda: astream_ollama(
+                prompt,
+                context=conversation_context["context"],
+                preferred_backend=conversation_context["backend"],
+                on_done=on_generation_done
+            )
+        else:
+            prompt_key = generation_key(prompt)
+            answer_key = answer_cache_key(prompt_key)
+            # identical prompts (same role-filtered context and history) share one generation
+            key = prompt_key if settings.COALESCE_GENERATIONS else None
+            cached_answer = await asyncio.to_thread(get_cached_answer, answer_key)
+            start = lambda: cache_answer(answer_key, astream_ollama(prompt, on_done=on_generation_done))
+
+        if cached_answer is not None:
+            logger.info(f"Answer cache hit | Characters: {len(cached_answer)}")
+            return replay_answer(cached_answer)
+
+        # requests joining a generation already in flight do not need a slot
+        ticket = None
+        if not COALESCER.in_flight(key):
+            ticket = await acquire_slot(LLM_SCHEDULER)
+
+        # the flight owns the ticket and frees the slot when the upstream generation ends
+        return COALESCER.subscribe(key, start, ticket)
+
+    if route == "canned":
+        chunks = replay_answer(canned_reply(intent))
+    elif route == "small_model":
+        ticket = await acquire_slot(SMALLTALK_SCHEDULER)
+        smalltalk_prompt = build_smalltalk_prompt(requests.query)
+        chunks = COALESCER.subscribe(None, lambda: astream_ollama(smalltalk_prompt, model=settings.SMALL_MODEL), ticket)
+    else:
+        chunks = await rag_chunks()
+
+    async def response_generator():
         full_answer = ""
 
         try:
             logger.info("Streaming response started.")
 
-            for chunk in stream_response(
-                query=requests.query,
-                user_role=user_role,
-                conversation_history=history
-            ):
+            async for chunk in chunks:
                 full_answer += chunk
                 yield chunk
 
-            add_message(username, conversation_id, "user", requests.query)
-            add_message(username, conversation_id, "assistant", full_answer)
+            await save_turn(full_answer)
 
             total_time = round(time.time() - start_time, 2)
+            metrics.observe(f"chat.latency.{route}", time.time() - start_time)
 
             logger.info("Streaming completed successfully.")
             logger.info(f"Response Length: {len(full_answer)} characters")
-            logger.info(f"Total Time: {total_time}s")
+            logger.info(f"Total Time: {total_time}s | Route: {route}")
             logger.info("-" * 60)
 
         except Exception as e:
@@ -0,0 +1,35 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from app.api.dependencies import get_current_user
+from app.core.cache import list_conversations, get_message_page
+from app.core.logger import logger
+
+router = APIRouter()
+
+@router.get("/conversations")
+def conversations(
+    cursor: Optional[float] = None,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    username = current_user.get("sub")
+    page = list_conversations(username, cursor, limit)
+    logger.info(f"/conversations | User: {username} | Returned: {len(page['conversations'])}")
+    return page
+
+@router.get("/conversations/{conversation_id}/messages")
+def conversation_messages(
+    conversation_id: str,
+    cursor: Optional[int] = Query(None, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    username = current_user.get("sub")
+    page = get_message_page(username, conversation_id, cursor, limit)
+    if not page["messages"] and cursor is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="conversation not found"
+        )
+    logger.info(f"/conversations/messages | User: {username} | Conv: {conversation_id} | Returned: {len(page['messages'])}")
+    return page
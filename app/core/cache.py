@@ -1,28 +1,135 @@
 import redis
-import json
+import redis.asyncio as aioredis
+import time
+import threading
+from contextlib import contextmanager
 from app.core.logger import logger
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.history_store import RedisHistoryStore, MemoryHistoryStore
 
-redis_client = redis.Redis(host="localhost", port=6379, decode_responses=True)
-MAX_HISTORY = settings.MAX_HISTORY
+def connection_kwargs():
+    return {
+        "host": settings.REDIS_HOST,
+        "port": settings.REDIS_PORT,
+        "db": settings.REDIS_DB,
+        # history is stored as msgpack, so replies stay bytes
+        "decode_responses": False,
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "max_connections": settings.REDIS_MAX_CONNECTIONS,
+        # a saturated pool waits this long for a free connection instead of failing right away
+        "timeout": settings.REDIS_POOL_TIMEOUT
+    }
 
-try:
-    redis_client.ping()
-    logger.info("Redis connected successfully.")
-except Exception as e:
-    logger.error(f"Redis connection failed: {str(e)}")
+REDIS_POOL = redis.BlockingConnectionPool(**connection_kwargs())
+redis_client = redis.Redis(connection_pool=REDIS_POOL)
+# created on first use, inside the event loop that serves requests
+ASYNC_REDIS_CLIENT = None
+
+if settings.HISTORY_BACKEND == "redis":
+    try:
+        redis_client.ping()
+        logger.info("Redis connected successfully.")
+    except Exception as e:
+        logger.error(f"Redis connection failed: {str(e)}")
+
+def get_async_redis():
+    global ASYNC_REDIS_CLIENT
+    if ASYNC_REDIS_CLIENT is None:
+        ASYNC_REDIS_CLIENT = aioredis.Redis(connection_pool=aioredis.BlockingConnectionPool(**connection_kwargs()))
+    return ASYNC_REDIS_CLIENT
+
+async def close_async_redis():
+    global ASYNC_REDIS_CLIENT
+    if ASYNC_REDIS_CLIENT is not None:
+        client, ASYNC_REDIS_CLIENT = ASYNC_REDIS_CLIENT, None
+        await client.aclose()
+
+IN_USE = {"sync": 0, "async": 0}
+IN_USE_LOCK = threading.Lock()
+
+@contextmanager
+def redis_call(name, pool="sync"):
+    # one command or pipeline holds one pooled connection, so calls in progress are connections in use
+    with IN_USE_LOCK:
+        IN_USE[pool] += 1
+        in_use = IN_USE[pool]
+    metrics.set_gauge(f"redis.{pool}.in_use", in_use)
+    metrics.set_gauge(f"redis.{pool}.saturation", round(in_use / settings.REDIS_MAX_CONNECTIONS, 3))
+    if in_use > settings.REDIS_MAX_CONNECTIONS:
+        metrics.incr(f"redis.{pool}.pool_waits")
+    start_time = time.perf_counter()
+    try:
+        yield
+    except redis.RedisError:
+        metrics.incr(f"redis.{pool}.errors")
+        raise
+    finally:
+        metrics.observe(f"redis.{name}", time.perf_counter() - start_time)
+        with IN_USE_LOCK:
+            IN_USE[pool] -= 1
+
+def create_history_store():
+    if settings.HISTORY_BACKEND == "memory":
+        return MemoryHistoryStore(settings.HISTORY_MAX_BYTES, settings.HISTORY_TTL)
+    return RedisHistoryStore(redis_client, get_async_redis, redis_call)
+
+HISTORY_STORE = create_history_store()
+logger.info(f"History backend: {HISTORY_STORE.name}")
+
+def get_history_store():
+    return HISTORY_STORE
+
+def set_history_store(store):
+    global HISTORY_STORE
+    HISTORY_STORE = store
+    return store
 
 def add_message(username: str, conversation_id: str, role: str, content: str):
-    key = f"chat:{username}:{conversation_id}"
-    message = json.dumps({"role": role,"content": content})
-    redis_client.rpush(key, message)
-    redis_client.ltrim(key, -MAX_HISTORY, -1)
+    HISTORY_STORE.append(username, conversation_id, [{"role": role, "content": content}])
+
+async def asave_turn(username: str, conversation_id: str, question: str, answer: str, ollama_context=None):
+    messages = [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+    await HISTORY_STORE.aappend(username, conversation_id, messages, ollama_context)
 
 def get_messages(username: str, conversation_id: str):
-    key = f"chat:{username}:{conversation_id}"
-    messages = redis_client.lrange(key, 0, -1)
-    return [json.loads(msg) for msg in messages]
+    return HISTORY_STORE.load(username, conversation_id)[0]
+
+async def aget_history(username: str, conversation_id: str, with_context=False):
+    return await HISTORY_STORE.aload(username, conversation_id, with_context)
+
+def get_message_window(username: str, conversation_id: str):
+    return HISTORY_STORE.window(username, conversation_id)
+
+def get_summary(username: str, conversation_id: str):
+    return HISTORY_STORE.get_summary(username, conversation_id)
+
+def set_summary(username: str, conversation_id: str, summary: str, covered: int):
+    HISTORY_STORE.set_summary(username, conversation_id, summary, covered)
+
+def get_ollama_context(username: str, conversation_id: str):
+    return HISTORY_STORE.get_ollama_context(username, conversation_id)
+
+async def aget_ollama_context(username: str, conversation_id: str):
+    return await HISTORY_STORE.aget_ollama_context(username, conversation_id)
+
+def set_ollama_context(username: str, conversation_id: str, model: str, backend: str, context):
+    HISTORY_STORE.set_ollama_context(username, conversation_id, {"model": model, "backend": backend, "context": context})
+
+def delete_ollama_context(username: str, conversation_id: str):
+    HISTORY_STORE.set_ollama_context(username, conversation_id, {"model": "", "backend": None, "context": None})
 
 def delete_conversation(username: str, conversation_id: str):
-    key = f"chat:{username}:{conversation_id}"
-    redis_client.delete(key)
\ No newline at end of file
+    HISTORY_STORE.delete(username, conversation_id)
+
+def list_conversations(username: str, cursor=None, limit: int = 20):
+    return HISTORY_STORE.list_conversations(username, cursor, limit)
+
+def get_message_page(username: str, conversation_id: str, cursor=None, limit: int = 20):
+    return HISTORY_STORE.message_page(username, conversation_id, cursor, limit)
+
+def try_lock(name: str, ttl: int):
+    return HISTORY_STORE.try_lock(name, ttl)
+
+def unlock(name: str):
+    HISTORY_STORE.unlock(name)
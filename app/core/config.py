@@ -17,6 +17,73 @@ class Settings(BaseSettings):
     CSV_PATH: str
     DEFAULT_PASSWORD: str
     DATA_PATH: str
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    INDEX_WATCH_INTERVAL: float = 0
+    INDEX_RELOAD_POLL_INTERVAL: float = 2
+    ADMIN_ROLES: str = "c-level"
+    RETRIEVAL_CACHE_SIZE: int = 2048
+    RETRIEVAL_CACHE_TTL: int = 600
+    RETRIEVAL_CACHE_REDIS: bool = False
+    LSA_DIM: int = 128
+    HYBRID_RETRIEVAL: bool = False
+    HYBRID_CANDIDATES: int = 50
+    DENSE_MIN_SIMILARITY: float = 0.2
+    DENSE_BUDGET_MS: float = 25
+    RRF_K: int = 60
+    OLLAMA_NUM_CTX: int = 8192
+    TOKEN_ENCODING: str = "cl100k_base"
+    CONTEXT_TOKEN_BUDGET: int = 2048
+    CONTEXT_DEDUP_OVERLAP: float = 0.9
+    PASSAGE_EXTRACTION: bool = True
+    PASSAGE_MAX_TOKENS: int = 256
+    HISTORY_SUMMARY: bool = False
+    HISTORY_RAW_TURNS: int = 3
+    HISTORY_TOKEN_BUDGET: int = 1024
+    SUMMARY_MAX_TOKENS: int = 256
+    SUMMARY_WORKERS: int = 1
+    OLLAMA_TIMEOUT: float = 120
+    OLLAMA_MAX_CONNECTIONS: int = 512
+    OLLAMA_URLS: str = ""
+    OLLAMA_RETRY: bool = True
+    OLLAMA_BREAKER_FAILURES: int = 3
+    OLLAMA_BREAKER_COOLDOWN: float = 30
+    OLLAMA_HEALTH_INTERVAL: float = 10
+    OLLAMA_HEALTH_TIMEOUT: float = 2
+    LLM_CONCURRENCY: int = 8
+    LLM_QUEUE_SIZE: int = 64
+    LLM_QUEUE_TIMEOUT: float = 15
+    LLM_PRIORITY_ROLES: str = "c-level"
+    COALESCE_GENERATIONS: bool = True
+    ANSWER_CACHE_SIZE: int = 1024
+    ANSWER_CACHE_TTL: int = 3600
+    ANSWER_CACHE_REDIS: bool = False
+    CONVERSATION_CONTEXT: bool = False
+    OLLAMA_AFFINITY_SLACK: int = 2
+    INTENT_ROUTING: bool = True
+    INTENT_MIN_CONFIDENCE: float = 0.75
+    INTENT_MAX_WORDS: int = 8
+    SMALL_MODEL: str = ""
+    SMALL_MODEL_CONCURRENCY: int = 2
+    REDIS_HOST: str = "localhost"
+    REDIS_PORT: int = 6379
+    REDIS_DB: int = 0
+    REDIS_MAX_CONNECTIONS: int = 64
+    REDIS_POOL_TIMEOUT: float = 5
+    REDIS_SOCKET_TIMEOUT: float = 5
+    HISTORY_TTL: int = 2592000
+    HISTORY_BACKEND: str = "redis"
+    HISTORY_COMPRESS_MIN_BYTES: int = 512
+    HISTORY_MAX_BYTES: int = 268435456
+    TOKEN_CACHE_SIZE: int = 10000
+    TOKEN_DENYLIST_WARN_SIZE: int = 100000
+    TOKEN_DENYLIST_REDIS: bool = False
+    PASSWORD_WORKERS: int = 2
+    PASSWORD_QUEUE_SIZE: int = 256
+    PASSWORD_QUEUE_TIMEOUT: float = 10
+    LOGIN_ACCOUNT_FAILURES: int = 5
+    LOGIN_IP_FAILURES: int = 50
+    LOGIN_FAILURE_WINDOW: int = 300
 
     class Config:
         env_file = ".env"
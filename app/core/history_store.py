@@ -0,0 +1,405 @@
+# Conversation history storage :- messages, running count, summary and Ollama context per conversation,
+# msgpack-encoded (zlib for long answers) with a TTL refreshed on every write.
+# Backends: Redis (or any redis-py compatible client, e.g. fakeredis) and an in-process LRU bounded by bytes.
+import json
+import time
+import zlib
+import heapq
+import threading
+import msgpack
+from collections import OrderedDict, defaultdict
+from app.core.config import settings
+from app.core.metrics import metrics
+
+ZLIB_LEVEL = 6
+# characters of the first question shown as a conversation's title
+TITLE_CHARS = 60
+
+def encode_message(message):
+    content = message["content"]
+    if 0 < settings.HISTORY_COMPRESS_MIN_BYTES <= len(content):
+        compressed = zlib.compress(content.encode("utf-8"), ZLIB_LEVEL)
+        # compressed content is stored as bytes, plain content as str
+        if len(compressed) < len(content):
+            content = compressed
+    return msgpack.packb([message["role"], content], use_bin_type=True)
+
+def decode_message(data):
+    if data[:1] in (b"{", "{"):
+        # stored as JSON before the compact encoding
+        return json.loads(data)
+    role, content = msgpack.unpackb(data, raw=False)
+    if isinstance(content, bytes):
+        content = zlib.decompress(content).decode("utf-8")
+    return {"role": role, "content": content}
+
+def encode_ollama_context(ollama_context):
+    return {
+        "model": ollama_context["model"],
+        "backend": ollama_context["backend"] or "",
+        "context": msgpack.packb(ollama_context["context"])
+    }
+
+def decode_ollama_context(data):
+    if not data:
+        return None
+    data = {k.decode() if isinstance(k, bytes) else k: v for k, v in data.items()}
+    context = data["context"]
+    context = json.loads(context) if context[:1] in (b"[", "[") else msgpack.unpackb(context)
+    text = lambda value: value.decode() if isinstance(value, bytes) else value
+    return {"model": text(data["model"]), "backend": text(data.get("backend")) or None, "context": context}
+
+def conversation_title(messages):
+    for message in messages:
+        if message["role"] == "user":
+            title = " ".join(message["content"].split())
+            return title if len(title) <= TITLE_CHARS else title[:TITLE_CHARS - 3].rstrip() + "..."
+    return ""
+
+def page_messages(first_index, messages, cursor=None, limit=20):
+    # newest page first; the cursor is the absolute index of the oldest message already returned
+    end = len(messages) if cursor is None else max(min(cursor - first_index, len(messages)), 0)
+    start = max(end - limit, 0)
+    page = [{"index": first_index + i, **messages[i]} for i in range(start, end)]
+    return {"messages": page, "next_cursor": first_index + start if start > 0 else None}
+
+class HistoryStore:
+    name = "base"
+
+    # async callers go through these; backends with a native async client override them
+    async def aappend(self, username, conversation_id, messages, ollama_context=None):
+        return self.append(username, conversation_id, messages, ollama_context)
+
+    async def aload(self, username, conversation_id, with_context=False):
+        return self.load(username, conversation_id, with_context)
+
+    async def aget_ollama_context(self, username, conversation_id):
+        return self.get_ollama_context(username, conversation_id)
+
+    def message_page(self, username, conversation_id, cursor=None, limit=20):
+        first_index, messages = self.window(username, conversation_id)
+        return page_messages(first_index, messages, cursor, limit)
+
+class RedisHistoryStore(HistoryStore):
+    name = "redis"
+
+    def __init__(self, client, async_client, call):
+        self.client = client
+        # callable, so the async client is created inside the serving event loop
+        self.async_client = async_client
+        self.call = call
+
+    def queue_expire(self, pipe, *keys):
+        if settings.HISTORY_TTL > 0:
+            for key in keys:
+                pipe.expire(key, settings.HISTORY_TTL)
+
+    def queue_ollama_context(self, pipe, key, ollama_context):
+        # a dict without a context (replayed or shared answer) drops the stale one
+        if ollama_context.get("context"):
+            pipe.hset(f"{key}:ollama", mapping=encode_ollama_context(ollama_context))
+            self.queue_expire(pipe, f"{key}:ollama")
+        else:
+            pipe.delete(f"{key}:ollama")
+
+    def queue_index(self, pipe, username, conversation_id, messages):
+        # per-user index: conversation ids by last activity, titles from the first question
+        index_key = f"chats:{username}"
+        now = time.time()
+        pipe.zadd(index_key, {conversation_id: now})
+        title = conversation_title(messages)
+        if title:
+            pipe.hsetnx(f"{index_key}:titles", conversation_id, title)
+        if settings.HISTORY_TTL > 0:
+            # conversations idle past the TTL have expired, so their entries go too
+            pipe.zremrangebyscore(index_key, "-inf", now - settings.HISTORY_TTL)
+            self.queue_expire(pipe, index_key, f"{index_key}:titles")
+
+    def queue_append(self, pipe, username, conversation_id, messages, ollama_context):
+        key = f"chat:{username}:{conversation_id}"
+        self.queue_index(pipe, username, conversation_id, messages)
+        pipe.rpush(key, *[encode_message(message) for message in messages])
+        pipe.ltrim(key, -settings.MAX_HISTORY, -1)
+        # running message count, so trimmed lists still know each message's position in the conversation
+        pipe.incrby(f"{key}:count", len(messages))
+        self.queue_expire(pipe, key, f"{key}:count", f"{key}:summary")
+        if ollama_context is not None:
+            self.queue_ollama_context(pipe, key, ollama_context)
+
+    def append(self, username, conversation_id, messages, ollama_context=None):
+        with self.call("append"):
+            pipe = self.client.pipeline(transaction=True)
+            self.queue_append(pipe, username, conversation_id, messages, ollama_context)
+            pipe.execute()
+
+    async def aappend(self, username, conversation_id, messages, ollama_context=None):
+        # messages, trim, count, TTL, the conversation index and the turn's Ollama context in one MULTI round trip
+        with self.call("append", "async"):
+            async with self.async_client().pipeline(transaction=True) as pipe:
+                self.queue_append(pipe, username, conversation_id, messages, ollama_context)
+                await pipe.execute()
+
+    def load(self, username, conversation_id, with_context=False):
+        key = f"chat:{username}:{conversation_id}"
+        with self.call("load"):
+            pipe = self.client.pipeline(transaction=False)
+            pipe.lrange(key, 0, -1)
+            if with_context:
+                pipe.hgetall(f"{key}:ollama")
+            results = pipe.execute()
+        return [decode_message(m) for m in results[0]], decode_ollama_context(results[1]) if with_context else None
+
+    async def aload(self, username, conversation_id, with_context=False):
+        # messages and the stored Ollama context in one round trip
+        key = f"chat:{username}:{conversation_id}"
+        with self.call("load", "async"):
+            async with self.async_client().pipeline(transaction=False) as pipe:
+                pipe.lrange(key, 0, -1)
+                if with_context:
+                    pipe.hgetall(f"{key}:ollama")
+                results = await pipe.execute()
+        return [decode_message(m) for m in results[0]], decode_ollama_context(results[1]) if with_context else None
+
+    def window(self, username, conversation_id):
+        key = f"chat:{username}:{conversation_id}"
+        with self.call("window"):
+            pipe = self.client.pipeline(transaction=False)
+            pipe.lrange(key, 0, -1)
+            pipe.get(f"{key}:count")
+            messages, count = pipe.execute()
+        messages = [decode_message(m) for m in messages]
+        # conversations stored before the counter existed start at 0
+        first_index = max(int(count) - len(messages), 0) if count else 0
+        return first_index, messages
+
+    def get_summary(self, username, conversation_id):
+        with self.call("get_summary"):
+            data = self.client.hgetall(f"chat:{username}:{conversation_id}:summary")
+        data = {k.decode() if isinstance(k, bytes) else k: v for k, v in data.items()}
+        summary = data.get("summary", "")
+        return summary.decode() if isinstance(summary, bytes) else summary, int(data.get("covered", 0))
+
+    def set_summary(self, username, conversation_id, summary, covered):
+        key = f"chat:{username}:{conversation_id}:summary"
+        with self.call("set_summary"):
+            pipe = self.client.pipeline(transaction=False)
+            pipe.hset(key, mapping={"summary": summary, "covered": covered})
+            self.queue_expire(pipe, key)
+            pipe.execute()
+
+    def get_ollama_context(self, username, conversation_id):
+        with self.call("get_ollama_context"):
+            data = self.client.hgetall(f"chat:{username}:{conversation_id}:ollama")
+        return decode_ollama_context(data)
+
+    async def aget_ollama_context(self, username, conversation_id):
+        with self.call("get_ollama_context", "async"):
+            data = await self.async_client().hgetall(f"chat:{username}:{conversation_id}:ollama")
+        return decode_ollama_context(data)
+
+    def set_ollama_context(self, username, conversation_id, ollama_context):
+        key = f"chat:{username}:{conversation_id}"
+        with self.call("set_ollama_context"):
+            pipe = self.client.pipeline(transaction=False)
+            self.queue_ollama_context(pipe, key, ollama_context)
+            pipe.execute()
+
+    def delete(self, username, conversation_id):
+        key = f"chat:{username}:{conversation_id}"
+        with self.call("delete"):
+            pipe = self.client.pipeline(transaction=True)
+            pipe.delete(key, f"{key}:count", f"{key}:summary", f"{key}:ollama")
+            pipe.zrem(f"chats:{username}", conversation_id)
+            pipe.hdel(f"chats:{username}:titles", conversation_id)
+            pipe.execute()
+
+    def list_conversations(self, username, cursor=None, limit=20):
+        # newest first; the cursor is the last-activity time of the last conversation already returned
+        index_key = f"chats:{username}"
+        newest = f"({cursor}" if cursor is not None else "+inf"
+        oldest = time.time() - settings.HISTORY_TTL if settings.HISTORY_TTL > 0 else "-inf"
+        with self.call("list_conversations"):
+            entries = self.client.zrevrangebyscore(index_key, newest, oldest, start=0, num=limit + 1, withscores=True)
+            page = entries[:limit]
+            titles = self.client.hmget(f"{index_key}:titles", [member for member, _ in page]) if page else []
+        conversations = [
+            {
+                "conversation_id": member.decode() if isinstance(member, bytes) else member,
+                "title": (title.decode() if isinstance(title, bytes) else title) or "",
+                "updated_at": score
+            }
+            for (member, score), title in zip(page, titles)
+        ]
+        return {"conversations": conversations, "next_cursor": page[-1][1] if len(entries) > limit else None}
+
+    def try_lock(self, name, ttl):
+        with self.call("lock"):
+            return bool(self.client.set(f"{name}:lock", "1", nx=True, ex=ttl))
+
+    def unlock(self, name):
+        with self.call("lock"):
+            self.client.delete(f"{name}:lock")
+
+    def conversation_bytes(self, username, conversation_id):
+        key = f"chat:{username}:{conversation_id}"
+        return sum(len(m) for m in self.client.lrange(key, 0, -1))
+
+class Conversation:
+    def __init__(self):
+        self.messages = []
+        self.count = 0
+        self.summary = ""
+        self.covered = 0
+        self.ollama = None
+        self.expires_at = None
+        self.size = 0
+        self.title = ""
+        self.updated_at = 0.0
+
+    def measure(self):
+        ollama_size = len(self.ollama["context"]) if self.ollama else 0
+        self.size = sum(len(m) for m in self.messages) + len(self.summary.encode("utf-8")) + ollama_size
+        return self.size
+
+class MemoryHistoryStore(HistoryStore):
+    name = "memory"
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # least recently used conversation first
+        self.conversations = OrderedDict()
+        self.total_bytes = 0
+        # username -> conversation ids, for listing a user's conversations
+        self.users = defaultdict(set)
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def lookup(self, username, conversation_id, create=False):
+        key = (username, conversation_id)
+        conversation = self.conversations.get(key)
+        if conversation is not None and conversation.expires_at is not None and conversation.expires_at <= time.monotonic():
+            self.drop(key)
+            metrics.incr("history.memory.expired")
+            conversation = None
+        if conversation is None and create:
+            conversation = self.conversations[key] = Conversation()
+            self.users[username].add(conversation_id)
+        if conversation is not None:
+            self.conversations.move_to_end(key)
+        return conversation
+
+    def drop(self, key):
+        conversation = self.conversations.pop(key, None)
+        if conversation is not None:
+            self.total_bytes -= conversation.size
+            username, conversation_id = key
+            self.users[username].discard(conversation_id)
+            if not self.users[username]:
+                del self.users[username]
+
+    def touch(self, key, conversation):
+        if self.ttl > 0:
+            conversation.expires_at = time.monotonic() + self.ttl
+        previous = conversation.size
+        self.total_bytes += conversation.measure() - previous
+        # evict idle conversations until the store fits, never the one just written
+        while self.max_bytes > 0 and self.total_bytes > self.max_bytes and len(self.conversations) > 1:
+            oldest = next(iter(self.conversations))
+            if oldest == key:
+                break
+            self.drop(oldest)
+            metrics.incr("history.memory.evicted")
+        metrics.set_gauge("history.memory.bytes", self.total_bytes)
+        metrics.set_gauge("history.memory.conversations", len(self.conversations))
+
+    def append(self, username, conversation_id, messages, ollama_context=None):
+        with metrics.timer("history.memory.append"), self.lock:
+            conversation = self.lookup(username, conversation_id, create=True)
+            conversation.messages.extend(encode_message(message) for message in messages)
+            del conversation.messages[:-settings.MAX_HISTORY]
+            conversation.count += len(messages)
+            conversation.updated_at = time.time()
+            conversation.title = conversation.title or conversation_title(messages)
+            if ollama_context is not None:
+                conversation.ollama = encode_ollama_context(ollama_context) if ollama_context.get("context") else None
+            self.touch((username, conversation_id), conversation)
+
+    def load(self, username, conversation_id, with_context=False):
+        with metrics.timer("history.memory.load"), self.lock:
+            conversation = self.lookup(username, conversation_id)
+            if conversation is None:
+                return [], None
+            messages, ollama = list(conversation.messages), conversation.ollama
+        return [decode_message(m) for m in messages], decode_ollama_context(ollama) if with_context else None
+
+    def window(self, username, conversation_id):
+        with self.lock:
+            conversation = self.lookup(username, conversation_id)
+            if conversation is None:
+                return 0, []
+            messages, count = list(conversation.messages), conversation.count
+        return count - len(messages), [decode_message(m) for m in messages]
+
+    def get_summary(self, username, conversation_id):
+        with self.lock:
+            conversation = self.lookup(username, conversation_id)
+            return (conversation.summary, conversation.covered) if conversation else ("", 0)
+
+    def set_summary(self, username, conversation_id, summary, covered):
+        with self.lock:
+            conversation = self.lookup(username, conversation_id, create=True)
+            conversation.summary, conversation.covered = summary, covered
+            self.touch((username, conversation_id), conversation)
+
+    def get_ollama_context(self, username, conversation_id):
+        with self.lock:
+            conversation = self.lookup(username, conversation_id)
+            ollama = conversation.ollama if conversation else None
+        return decode_ollama_context(ollama)
+
+    def set_ollama_context(self, username, conversation_id, ollama_context):
+        with self.lock:
+            conversation = self.lookup(username, conversation_id, create=True)
+            conversation.ollama = encode_ollama_context(ollama_context) if ollama_context.get("context") else None
+            self.touch((username, conversation_id), conversation)
+
+    def delete(self, username, conversation_id):
+        with self.lock:
+            self.drop((username, conversation_id))
+
+    def list_conversations(self, username, cursor=None, limit=20):
+        now = time.monotonic()
+        with self.lock:
+            candidates = [
+                (conversation.updated_at, conversation_id, conversation.title)
+                for conversation_id in self.users.get(username, ())
+                for conversation in [self.conversations[(username, conversation_id)]]
+                if conversation.updated_at > 0
+                and (cursor is None or conversation.updated_at < cursor)
+                and (conversation.expires_at is None or conversation.expires_at > now)
+            ]
+        entries = heapq.nlargest(limit + 1, candidates)
+        page = entries[:limit]
+        conversations = [
+            {"conversation_id": conversation_id, "title": title, "updated_at": updated_at}
+            for updated_at, conversation_id, title in page
+        ]
+        return {"conversations": conversations, "next_cursor": page[-1][0] if len(entries) > limit else None}
+
+    def try_lock(self, name, ttl):
+        now = time.monotonic()
+        with self.lock:
+            if self.locks.get(name, 0) > now:
+                return False
+            self.locks[name] = now + ttl
+            return True
+
+    def unlock(self, name):
+        with self.lock:
+            self.locks.pop(name, None)
+
+    def conversation_bytes(self, username, conversation_id):
+        with self.lock:
+            conversation = self.conversations.get((username, conversation_id))
+            return sum(len(m) for m in conversation.messages) if conversation else 0
@@ -0,0 +1,77 @@
+# In-process metrics :- counters, gauges and latency summaries, exposed on /metrics
+
+import time
+import threading
+from contextlib import contextmanager
+from collections import defaultdict, deque
+
+SAMPLE_WINDOW = 2048
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+class Metrics:
+    def __init__(self, window=SAMPLE_WINDOW):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.gauges = {}
+        # latest samples only, so percentiles follow current behaviour and memory stays bounded
+        self.samples = defaultdict(lambda: deque(maxlen=window))
+        self.sample_counts = defaultdict(int)
+
+    def incr(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def counter(self, name):
+        with self.lock:
+            return self.counters.get(name, 0)
+
+    def set_gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def add_gauge(self, name, delta):
+        with self.lock:
+            self.gauges[name] = self.gauges.get(name, 0) + delta
+
+    def observe(self, name, seconds):
+        with self.lock:
+            self.samples[name].append(seconds)
+            self.sample_counts[name] += 1
+
+    @contextmanager
+    def timer(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start_time)
+
+    def summary(self, name):
+        with self.lock:
+            values = sorted(self.samples.get(name, ()))
+            count = self.sample_counts.get(name, 0)
+        return {
+            "count": count,
+            "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+            "max_ms": round(values[-1] * 1000, 3) if values else 0.0
+        }
+
+    def snapshot(self):
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            names = list(self.samples)
+        return {
+            "counters": counters,
+            "gauges": gauges,
+            "timings": {name: self.summary(name) for name in names}
+        }
+
+metrics = Metrics()
@@ -0,0 +1,52 @@
+# Fixed-window counters per key :- cheap checks that shed brute-force logins before bcrypt runs.
+# Attempts are reserved up front and refunded when they do not fail.
+
+import math
+import time
+import threading
+from collections import OrderedDict
+from app.core.metrics import metrics
+
+class RateLimiter:
+    def __init__(self, name, limit, window, max_keys=100000):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        # key -> [count, window end], least recently hit first
+        self.windows = OrderedDict()
+        self.lock = threading.Lock()
+
+    def try_acquire(self, key):
+        # counts the attempt before it runs, so concurrent attempts cannot all pass the check;
+        # returns seconds until the key may try again, 0 when the attempt was reserved
+        if self.limit <= 0:
+            return 0
+        now = time.time()
+        with self.lock:
+            entry = self.windows.get(key)
+            if entry is None or entry[1] <= now:
+                entry = self.windows[key] = [0, now + self.window]
+            if entry[0] >= self.limit:
+                retry_after = max(1, math.ceil(entry[1] - now))
+            else:
+                entry[0] += 1
+                retry_after = 0
+            self.windows.move_to_end(key)
+            while len(self.windows) > self.max_keys:
+                self.windows.popitem(last=False)
+            metrics.set_gauge(f"rate_limit.{self.name}.keys", len(self.windows))
+        if retry_after:
+            metrics.incr(f"rate_limit.{self.name}.limited")
+        return retry_after
+
+    def refund(self, key):
+        # gives back a reserved attempt that did not fail
+        with self.lock:
+            entry = self.windows.get(key)
+            if entry is not None and entry[0] > 0:
+                entry[0] -= 1
+
+    def reset(self, key):
+        with self.lock:
+            self.windows.pop(key, None)
@@ -1,12 +1,61 @@
 # Security utilities :- Password hashing, jwt creation, jwt verification
+import time
+import heapq
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from starlette.concurrency import run_in_threadpool
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from datetime import datetime, timedelta, timezone
 from app.core.config import settings
 from app.core.logger import logger
+from app.core.metrics import metrics
+from app.core.ttl_cache import TTLCache
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated = "auto")
 
+# verified claims by token hash, each entry expiring with its token
+TOKEN_CACHE = TTLCache("tokens", settings.TOKEN_CACHE_SIZE, settings.ACCESS_TOKENS_EXPIRE_MINUTES * 60)
+
+class RevokedTokens:
+    # token hash -> exp; never evicted early, since a dropped entry would make its token valid again.
+    # Entries leave only once their token has expired, so the size is bounded by logouts per token lifetime.
+    def __init__(self, warn_size):
+        self.warn_size = warn_size
+        self.expiries = {}
+        self.heap = []
+        self.lock = threading.Lock()
+
+    def prune(self, now):
+        while self.heap and self.heap[0][0] <= now:
+            expires_at, key = heapq.heappop(self.heap)
+            if self.expiries.get(key) == expires_at:
+                del self.expiries[key]
+
+    def add(self, key, expires_at):
+        with self.lock:
+            self.prune(time.time())
+            self.expiries[key] = expires_at
+            heapq.heappush(self.heap, (expires_at, key))
+            size = len(self.expiries)
+        metrics.set_gauge("auth.revoked_tokens", size)
+        # once per warn_size entries, not on every logout
+        if self.warn_size > 0 and size % self.warn_size == 0:
+            logger.warning(f"Token deny-list holds {size} revoked tokens (TOKEN_DENYLIST_WARN_SIZE={self.warn_size})")
+
+    def __contains__(self, key):
+        expires_at = self.expiries.get(key)
+        return expires_at is not None and expires_at > time.time()
+
+    def __len__(self):
+        return len(self.expiries)
+
+REVOKED_TOKENS = RevokedTokens(settings.TOKEN_DENYLIST_WARN_SIZE)
+# shared deny-list: one sorted set scored by exp, with no TTL so volatile-* eviction policies never drop it
+REVOKED_TOKENS_KEY = "revoked_tokens"
+
 def hash_password(password: str) -> str:
     logger.info("Password hashing initiated.")
     return pwd_context.hash(password)
@@ -19,6 +68,16 @@ def verify_password(normal_password: str, hashed_password: str) -> bool:
         logger.warning("Password verification failed.")
     return result
 
+# bcrypt releases the GIL, so a few threads keep hashing off the event loop and the request threadpool
+PASSWORD_EXECUTOR = ThreadPoolExecutor(max_workers=max(settings.PASSWORD_WORKERS, 1), thread_name_prefix="bcrypt")
+
+async def averify_password(normal_password: str, hashed_password: str) -> bool:
+    if settings.PASSWORD_WORKERS <= 0:
+        # shares the request threadpool, as a sync endpoint would
+        return await run_in_threadpool(verify_password, normal_password, hashed_password)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(PASSWORD_EXECUTOR, verify_password, normal_password, hashed_password)
+
 def create_access_tokens(data: dict) -> str:
     logger.info(f"Creating access token for user: {data.get('sub')} | Role: {data.get('role')}")
 
@@ -39,4 +98,54 @@ def decode_token(token: str):
     except JWTError as e:
         logger.warning(f"JWT decoding failed: {str(e)}")
         return None
-    
+
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def is_revoked(key: str) -> bool:
+    if key in REVOKED_TOKENS:
+        return True
+    if not settings.TOKEN_DENYLIST_REDIS:
+        return False
+
+    from app.core.cache import redis_client
+    try:
+        expires_at = redis_client.zscore(REVOKED_TOKENS_KEY, key)
+        return expires_at is not None and expires_at > time.time()
+    except Exception as e:
+        logger.warning(f"Shared token deny-list unavailable: {str(e)}")
+        return False
+
+def revoke_token(token: str):
+    data = verify_token(token)
+    if data is None:
+        return
+    key = token_hash(token)
+    expires_at = data.get("exp", time.time() + settings.ACCESS_TOKENS_EXPIRE_MINUTES * 60)
+    TOKEN_CACHE.pop(key)
+    REVOKED_TOKENS.add(key, expires_at)
+    metrics.incr("auth.revoked")
+    if settings.TOKEN_DENYLIST_REDIS:
+        from app.core.cache import redis_client
+        try:
+            pipe = redis_client.pipeline(transaction=True)
+            pipe.zadd(REVOKED_TOKENS_KEY, {key: expires_at})
+            pipe.zremrangebyscore(REVOKED_TOKENS_KEY, "-inf", time.time())
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Shared token deny-list unavailable: {str(e)}")
+
+def verify_token(token: str):
+    # signature checks are skipped for tokens already verified; the claims expire with the token
+    key = token_hash(token)
+    if is_revoked(key):
+        metrics.incr("auth.rejected_revoked")
+        return None
+    data = TOKEN_CACHE.get(key)
+    if data is not None:
+        return data
+
+    data = decode_token(token)
+    if data is not None and "exp" in data:
+        TOKEN_CACHE.set(key, data, expires_at=data["exp"])
+    return data
@@ -0,0 +1,55 @@
+# Bounded in-process LRU cache with per-entry expiry; hit/miss/eviction counters go to metrics
+
+import time
+import threading
+from collections import OrderedDict
+from app.core.metrics import metrics
+
+class TTLCache:
+    def __init__(self, name, max_entries, ttl):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self.entries[key]
+                metrics.incr(f"cache.{self.name}.expirations")
+                entry = None
+            if entry is None:
+                metrics.incr(f"cache.{self.name}.misses")
+                return default
+            self.entries.move_to_end(key)
+        metrics.incr(f"cache.{self.name}.hits")
+        return entry[1]
+
+    def set(self, key, value, ttl=None, expires_at=None):
+        if self.max_entries <= 0:
+            return
+        if expires_at is None:
+            expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                metrics.incr(f"cache.{self.name}.evictions")
+            metrics.set_gauge(f"cache.{self.name}.entries", len(self.entries))
+
+    def pop(self, key, default=None):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+        return entry[1] if entry is not None else default
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        metrics.set_gauge(f"cache.{self.name}.entries", 0)
+
+    def __len__(self):
+        return len(self.entries)
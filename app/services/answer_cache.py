@@ -0,0 +1,65 @@
+# Answer cache :- finished generations keyed by index generation + Ollama payload, replayed as a stream
+import json
+import asyncio
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.core.ttl_cache import TTLCache
+from app.services.retrieval import current_generation
+from app.services.streaming import GENERATION_ERROR
+
+ANSWER_CACHE = TTLCache("answers", settings.ANSWER_CACHE_SIZE, settings.ANSWER_CACHE_TTL)
+REPLAY_CHUNK_CHARS = 64
+
+def answer_cache_key(prompt_key):
+    # a reload changes the fingerprint, so answers built on the old index are never served again
+    return f"{current_generation().fingerprint}:{prompt_key}"
+
+def shared_answer_key(key):
+    return f"answer:{key}"
+
+def record_lookup(hit, answer=None):
+    metrics.incr("answer_cache.hits" if hit else "answer_cache.misses")
+    if hit:
+        metrics.incr("answer_cache.bytes_saved", len(answer.encode("utf-8")))
+    hits, misses = metrics.counter("answer_cache.hits"), metrics.counter("answer_cache.misses")
+    metrics.set_gauge("answer_cache.hit_ratio", round(hits / (hits + misses), 4))
+
+def get_cached_answer(key):
+    answer = ANSWER_CACHE.get(key)
+    if answer is None and settings.ANSWER_CACHE_REDIS:
+        from app.core.cache import redis_client
+        try:
+            cached = redis_client.get(shared_answer_key(key))
+        except Exception as e:
+            logger.warning(f"Shared answer cache unavailable: {str(e)}")
+            cached = None
+        if cached is not None:
+            answer = json.loads(cached)
+            ANSWER_CACHE.set(key, answer)
+    record_lookup(answer is not None, answer)
+    return answer
+
+def set_cached_answer(key, answer):
+    ANSWER_CACHE.set(key, answer)
+    if not settings.ANSWER_CACHE_REDIS:
+        return
+
+    from app.core.cache import redis_client
+    try:
+        redis_client.set(shared_answer_key(key), json.dumps(answer), ex=settings.ANSWER_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Shared answer cache unavailable: {str(e)}")
+
+async def replay_answer(answer):
+    for start in range(0, len(answer), REPLAY_CHUNK_CHARS):
+        yield answer[start:start + REPLAY_CHUNK_CHARS]
+
+async def cache_answer(key, chunks):
+    parts = []
+    async for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    # only complete, successful generations are stored
+    if parts and GENERATION_ERROR not in parts:
+        await asyncio.to_thread(set_cached_answer, key, "".join(parts))
@@ -0,0 +1,223 @@
+# Memory-mapped binary PageIndex :- term dictionary, varint delta postings, lazily decoded page store
+#
+# Layout: MAGIC | u64 header size | JSON header | 8-byte aligned sections.
+# The header maps every section name to its (offset, length) in the file.
+import os
+import json
+import mmap
+import struct
+from functools import lru_cache
+import numpy as np
+from scipy import sparse
+
+MAGIC = b"PAGEIDX1"
+POSTINGS_CACHE_SIZE = 1024
+
+def encode_varints(values):
+    values = np.asarray(values, dtype=np.uint64)
+    if not len(values):
+        return b""
+    bit_lengths = np.zeros(len(values), dtype=np.int64)
+    remaining = values.copy()
+    while remaining.any():
+        bit_lengths += remaining > 0
+        remaining >>= np.uint64(7)
+    byte_counts = np.maximum(bit_lengths, 1)
+
+    starts = np.concatenate(([0], np.cumsum(byte_counts)[:-1]))
+    out = np.zeros(int(byte_counts.sum()), dtype=np.uint8)
+    for byte_index in range(int(byte_counts.max())):
+        active = byte_counts > byte_index
+        chunk = (values[active] >> np.uint64(7 * byte_index)) & np.uint64(0x7F)
+        more = (byte_counts[active] - 1 > byte_index).astype(np.uint64) << np.uint64(7)
+        out[starts[active] + byte_index] = (chunk | more).astype(np.uint8)
+    return out.tobytes()
+
+def decode_varints(buffer, count):
+    if not count:
+        return np.zeros(0, dtype=np.uint64)
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    ends = np.flatnonzero(data < 0x80)[:count]
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    byte_counts = ends - starts + 1
+    value_of_byte = np.repeat(np.arange(count), byte_counts)
+    shifts = (7 * (np.arange(ends[-1] + 1) - starts[value_of_byte])).astype(np.uint64)
+    parts = (data[:ends[-1] + 1] & 0x7F).astype(np.uint64) << shifts
+    return np.add.reduceat(parts, starts)
+
+def encode_string_table(strings):
+    blobs = [s.encode("utf-8") for s in strings]
+    offsets = np.concatenate(([0], np.cumsum([len(b) for b in blobs], dtype=np.uint64))).astype(np.uint64)
+    return offsets.tobytes(), b"".join(blobs)
+
+class StringTable:
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return self.raw(index).decode("utf-8")
+
+    def raw(self, index):
+        return bytes(self.blob[int(self.offsets[index]):int(self.offsets[index + 1])])
+
+    def find(self, value):
+        # only valid for sorted tables; utf-8 byte order equals code point order
+        key = value.encode("utf-8")
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self.raw(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self) and self.raw(low) == key:
+            return low
+        return None
+
+def write_binary_index(path, index, pages, role_doc_ids):
+    sections = {}
+
+    sections["page_id_offsets"], sections["page_ids"] = encode_string_table(index.page_ids)
+    sections["term_offsets"], sections["terms"] = encode_string_table(index.terms)
+
+    postings_blobs = []
+    for term_id in range(len(index.terms)):
+        start, end = index.offsets[term_id], index.offsets[term_id + 1]
+        doc_ids = index.doc_ids[start:end].astype(np.int64)
+        deltas = np.diff(doc_ids, prepend=0)
+        postings_blobs.append(encode_varints(deltas) + encode_varints(index.tfs[start:end]))
+    postings_offsets = np.concatenate(([0], np.cumsum([len(b) for b in postings_blobs]))).astype(np.uint64)
+    sections["postings_offsets"] = postings_offsets.tobytes()
+    sections["postings"] = b"".join(postings_blobs)
+
+    sections["doc_freqs"] = index.doc_freqs.astype(np.uint32).tobytes()
+    sections["max_scores"] = index.max_scores.astype(np.float64).tobytes()
+    sections["doc_lengths"] = index.doc_lengths.astype(np.uint32).tobytes()
+    if index.idf is not None:
+        sections["idf"] = index.idf.astype(np.float64).tobytes()
+
+    roles = sorted(role_doc_ids)
+    role_bitmaps = []
+    for role in roles:
+        mask = np.zeros(index.num_docs, dtype=bool)
+        mask[list(role_doc_ids[role])] = True
+        role_bitmaps.append(np.packbits(mask).tobytes())
+    sections["role_bitmaps"] = b"".join(role_bitmaps)
+
+    page_blobs = [json.dumps(page, separators=(",", ":")).encode("utf-8") for page in pages]
+    page_offsets = np.concatenate(([0], np.cumsum([len(b) for b in page_blobs]))).astype(np.uint64)
+    sections["page_offsets"] = page_offsets.tobytes()
+    sections["pages"] = b"".join(page_blobs)
+
+    header = {
+        "num_docs": index.num_docs,
+        "num_terms": len(index.terms),
+        "roles": roles,
+        "has_idf": index.idf is not None,
+        "sections": {}
+    }
+    # section offsets depend on the header size, so lay them out relative to the data start
+    position = 0
+    for name, data in sections.items():
+        header["sections"][name] = [position, len(data)]
+        position += len(data) + (-len(data) % 8)
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes += b" " * (-(len(MAGIC) + 8 + len(header_bytes)) % 8)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for data in sections.values():
+            f.write(data)
+            f.write(b"\0" * (-len(data) % 8))
+    os.replace(tmp_path, path)
+
+class BinaryIndex:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a binary page index: {path}")
+        header_size = struct.unpack_from("<Q", self.mm, len(MAGIC))[0]
+        header_start = len(MAGIC) + 8
+        self.header = json.loads(self.mm[header_start:header_start + header_size])
+        self.data_start = header_start + header_size
+
+        self.num_docs = self.header["num_docs"]
+        self.num_terms = self.header["num_terms"]
+
+        self.page_ids = StringTable(self.array("page_id_offsets", np.uint64), self.section("page_ids"))
+        self.terms = StringTable(self.array("term_offsets", np.uint64), self.section("terms"))
+        self.postings_offsets = self.array("postings_offsets", np.uint64)
+        self.postings_blob = self.section("postings")
+        self.doc_freqs = self.array("doc_freqs", np.uint32)
+        self.max_scores = self.array("max_scores", np.float64)
+        self.doc_lengths = self.array("doc_lengths", np.uint32)
+        self.idf = self.array("idf", np.float64) if self.header["has_idf"] else None
+        self.page_offsets = self.array("page_offsets", np.uint64)
+        self.pages_blob = self.section("pages")
+
+        self.postings_by_id = lru_cache(maxsize=POSTINGS_CACHE_SIZE)(self.decode_postings)
+
+    def section(self, name):
+        offset, length = self.header["sections"][name]
+        start = self.data_start + offset
+        return memoryview(self.mm)[start:start + length]
+
+    def array(self, name, dtype):
+        # zero-copy view over the mapping, shared through the page cache across workers
+        return np.frombuffer(self.section(name), dtype=dtype)
+
+    def term_id(self, term):
+        return self.terms.find(term)
+
+    def decode_postings(self, term_id):
+        doc_freq = int(self.doc_freqs[term_id])
+        start, end = int(self.postings_offsets[term_id]), int(self.postings_offsets[term_id + 1])
+        values = decode_varints(self.postings_blob[start:end], 2 * doc_freq)
+        doc_ids = np.cumsum(values[:doc_freq]).astype(np.int32)
+        tfs = values[doc_freq:].astype(np.int32)
+        return doc_ids, tfs
+
+    def postings(self, term):
+        term_id = self.term_id(term)
+        if term_id is None:
+            return None
+        return self.postings_by_id(term_id)
+
+    def term_max_score(self, term):
+        return float(self.max_scores[self.term_id(term)])
+
+    def term_idf(self, term):
+        if self.idf is None:
+            return None
+        return float(self.idf[self.term_id(term)])
+
+    def term_frequency_matrix(self):
+        doc_ids, tfs = zip(*(self.decode_postings(term_id) for term_id in range(self.num_terms)))
+        offsets = np.concatenate(([0], np.cumsum(self.doc_freqs, dtype=np.int64)))
+        return sparse.csr_matrix(
+            (np.concatenate(tfs).astype(np.float64), np.concatenate(doc_ids), offsets),
+            shape=(self.num_terms, self.num_docs)
+        )
+
+    def role_masks(self):
+        bitmaps = self.array("role_bitmaps", np.uint8)
+        bitmap_size = (self.num_docs + 7) // 8
+        role_masks = {}
+        for position, role in enumerate(self.header["roles"]):
+            bitmap = bitmaps[position * bitmap_size:(position + 1) * bitmap_size]
+            role_masks[role] = np.unpackbits(bitmap, count=self.num_docs).astype(bool)
+        return role_masks
+
+    def page(self, doc_id):
+        start, end = int(self.page_offsets[doc_id]), int(self.page_offsets[doc_id + 1])
+        return json.loads(bytes(self.pages_blob[start:end]))
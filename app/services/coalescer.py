@@ -0,0 +1,91 @@
+# Single-flight generation :- concurrent requests with the same final prompt share one upstream stream.
+# The prompt already holds the role-filtered context, so requests only share answers they could each see.
+import json
+import asyncio
+import hashlib
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.services.streaming import ollama_payload, GENERATION_ERROR
+
+class Flight:
+    def __init__(self, key, ticket):
+        self.key = key
+        self.ticket = ticket
+        self.chunks = []
+        self.done = False
+        self.subscribers = 0
+        self.task = None
+        self.updated = asyncio.Event()
+
+    def publish(self, chunk=None):
+        if chunk is not None:
+            self.chunks.append(chunk)
+        # wake everyone waiting on the previous event; later waits use a fresh one
+        updated, self.updated = self.updated, asyncio.Event()
+        updated.set()
+
+class Coalescer:
+    def __init__(self):
+        self.flights = {}
+
+    def in_flight(self, key):
+        return key is not None and key in self.flights
+
+    async def produce(self, flight, start):
+        try:
+            async for chunk in start():
+                flight.publish(chunk)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Shared generation failed | Error: {str(e)}")
+            flight.publish(GENERATION_ERROR)
+        finally:
+            flight.done = True
+            flight.publish()
+            if self.flights.get(flight.key) is flight:
+                del self.flights[flight.key]
+            metrics.set_gauge("coalesce.in_flight", len(self.flights))
+            if flight.ticket:
+                flight.ticket.release()
+
+    def subscribe(self, key, start, ticket=None):
+        # registers right away, so a request that saw this flight cannot miss it before iterating
+        flight = self.flights.get(key) if key is not None else None
+        if flight is None:
+            flight = Flight(key, ticket)
+            flight.task = asyncio.get_running_loop().create_task(self.produce(flight, start))
+            if key is not None:
+                self.flights[key] = flight
+                metrics.incr("coalesce.leaders")
+                metrics.set_gauge("coalesce.in_flight", len(self.flights))
+        else:
+            # the existing flight already holds a generation slot
+            if ticket:
+                ticket.release()
+            metrics.incr("coalesce.followers")
+        flight.subscribers += 1
+        return self.replay(flight)
+
+    async def replay(self, flight):
+        position = 0
+        try:
+            while True:
+                # late joiners start from the chunks buffered so far
+                while position < len(flight.chunks):
+                    yield flight.chunks[position]
+                    position += 1
+                if flight.done:
+                    return
+                await flight.updated.wait()
+        finally:
+            flight.subscribers -= 1
+            # nobody is listening anymore; stop the upstream generation
+            if flight.subscribers == 0 and not flight.done:
+                flight.task.cancel()
+
+def generation_key(prompt):
+    payload = json.dumps(ollama_payload(prompt, True), sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+COALESCER = Coalescer()
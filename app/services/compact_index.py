@@ -0,0 +1,134 @@
+# Compact in-memory PageIndex :- integer doc ids + CSR style postings arrays
+import os
+import numpy as np
+from scipy import sparse
+
+class CompactIndex:
+    def __init__(self, page_ids, terms, offsets, doc_ids, tfs, idf=None, max_scores=None, doc_lengths=None):
+        self.page_ids = list(page_ids)
+        self.page_id_lookup = {page_id: doc_id for doc_id, page_id in enumerate(self.page_ids)}
+        self.terms = list(terms)
+        self.term_ids = {term: term_id for term_id, term in enumerate(self.terms)}
+
+        # postings of term t are doc_ids[offsets[t]:offsets[t + 1]] (sorted by doc id)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        self.tfs = np.asarray(tfs, dtype=np.int32)
+        self.idf = np.asarray(idf, dtype=np.float64) if idf is not None else None
+
+        # per-term upper bound of a single posting's score, used to prune top-k retrieval
+        if max_scores is None:
+            max_scores = self.compute_max_scores()
+        self.max_scores = np.asarray(max_scores, dtype=np.float64)
+
+        # every token of a section is indexed, so its length is also the sum of its tfs
+        if doc_lengths is None:
+            doc_lengths = np.bincount(self.doc_ids, weights=self.tfs, minlength=self.num_docs)
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.int32)
+
+    @property
+    def num_docs(self):
+        return len(self.page_ids)
+
+    @property
+    def num_terms(self):
+        return len(self.terms)
+
+    @property
+    def doc_freqs(self):
+        return np.diff(self.offsets)
+
+    def compute_max_scores(self):
+        max_tfs = np.zeros(self.num_terms, dtype=np.float64)
+        non_empty = self.offsets[1:] > self.offsets[:-1]
+        if non_empty.any():
+            max_tfs[non_empty] = np.maximum.reduceat(self.tfs, self.offsets[:-1][non_empty])
+        if self.idf is not None:
+            return max_tfs * self.idf
+        return max_tfs
+
+    @classmethod
+    def from_inverted_index(cls, page_ids, inverted_index, idf_index=None, doc_lengths=None):
+        page_ids = list(page_ids)
+        page_id_lookup = {page_id: doc_id for doc_id, page_id in enumerate(page_ids)}
+        terms = sorted(inverted_index)
+
+        offsets = [0]
+        doc_ids = []
+        tfs = []
+        for term in terms:
+            postings = sorted(
+                (page_id_lookup[entry["page_id"]], entry["tf"])
+                for entry in inverted_index[term]
+                if entry["page_id"] in page_id_lookup
+            )
+            doc_ids.extend(doc_id for doc_id, _ in postings)
+            tfs.extend(tf for _, tf in postings)
+            offsets.append(len(doc_ids))
+
+        idf = None
+        if idf_index:
+            idf = [idf_index.get(term, 1.0) for term in terms]
+
+        if doc_lengths is not None:
+            doc_lengths = [doc_lengths.get(page_id, 0) for page_id in page_ids]
+
+        return cls(page_ids, terms, offsets, doc_ids, tfs, idf, doc_lengths=doc_lengths)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            idf = data["idf"] if data["idf"].size else None
+            max_scores = data["max_scores"] if "max_scores" in data.files else None
+            doc_lengths = data["doc_lengths"] if "doc_lengths" in data.files else None
+            return cls(
+                data["page_ids"].tolist(),
+                data["terms"].tolist(),
+                data["offsets"],
+                data["doc_ids"],
+                data["tfs"],
+                idf,
+                max_scores,
+                doc_lengths
+            )
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                page_ids=np.array(self.page_ids, dtype=str),
+                terms=np.array(self.terms, dtype=str),
+                offsets=self.offsets,
+                doc_ids=self.doc_ids,
+                tfs=self.tfs,
+                idf=self.idf if self.idf is not None else np.empty(0, dtype=np.float64),
+                max_scores=self.max_scores,
+                doc_lengths=self.doc_lengths
+            )
+        os.replace(tmp_path, path)
+
+    def term_id(self, term):
+        return self.term_ids.get(term)
+
+    def postings(self, term):
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            return None
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.doc_ids[start:end], self.tfs[start:end]
+
+    def term_frequency_matrix(self):
+        # the postings layout already is CSR: one row per term, one column per doc
+        return sparse.csr_matrix(
+            (self.tfs.astype(np.float64), self.doc_ids, self.offsets),
+            shape=(self.num_terms, self.num_docs)
+        )
+
+    def term_max_score(self, term):
+        return float(self.max_scores[self.term_ids[term]])
+
+    def term_idf(self, term):
+        if self.idf is None:
+            return None
+        return float(self.idf[self.term_ids[term]])
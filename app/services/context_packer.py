@@ -0,0 +1,91 @@
+# Token-aware context packing :- dedupe retrieved sections and fill a prompt token budget by score
+import re
+import hashlib
+import threading
+from app.core.config import settings
+from app.core.logger import logger
+
+# the "[Document n | Score: x]" header and separators added by build_prompt
+SECTION_OVERHEAD_TOKENS = 12
+# estimate used when the tiktoken encoding cannot be loaded (it is downloaded on first use)
+CHARS_PER_TOKEN = 4
+
+ENCODING_LOCK = threading.Lock()
+ENCODING = None
+ENCODING_LOADED = False
+
+def get_encoding():
+    global ENCODING, ENCODING_LOADED
+    if ENCODING_LOADED:
+        return ENCODING
+    with ENCODING_LOCK:
+        if not ENCODING_LOADED:
+            try:
+                import tiktoken
+                ENCODING = tiktoken.get_encoding(settings.TOKEN_ENCODING)
+            except Exception as e:
+                logger.warning(f"tiktoken encoding unavailable, estimating tokens from length | Error: {str(e)}")
+                ENCODING = None
+            ENCODING_LOADED = True
+    return ENCODING
+
+def count_tokens(text):
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text, max_tokens):
+    encoding = get_encoding()
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+def word_set(text):
+    return set(re.findall(r"[a-z0-9]+", text.lower()))
+
+def is_overlapping(words, kept_words):
+    # share of the smaller section that also appears in the other one
+    smaller = min(len(words), len(kept_words))
+    if smaller == 0:
+        return False
+    return len(words & kept_words) / smaller >= settings.CONTEXT_DEDUP_OVERLAP
+
+def pack_contexts(contexts, token_budget=None):
+    token_budget = settings.CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    packed = []
+    seen_hashes = set()
+    kept_words = []
+    tokens_used = 0
+
+    for ctx in sorted(contexts, key=lambda c: c["score"], reverse=True):
+        content = ctx["content"] or ""
+        content_hash = hashlib.sha1(" ".join(content.split()).encode("utf-8")).hexdigest()
+        if content_hash in seen_hashes:
+            continue
+        words = word_set(content)
+        if any(is_overlapping(words, other) for other in kept_words):
+            continue
+
+        token_count = ctx.get("token_count")
+        if token_count is None:
+            token_count = count_tokens(content)
+        cost = token_count + SECTION_OVERHEAD_TOKENS
+        remaining = token_budget - tokens_used
+
+        if cost > remaining:
+            # the best section is always sent, cut down to the budget if needed
+            if packed or remaining <= SECTION_OVERHEAD_TOKENS:
+                continue
+            content = truncate_to_tokens(content, remaining - SECTION_OVERHEAD_TOKENS)
+            token_count = count_tokens(content)
+            cost = token_count + SECTION_OVERHEAD_TOKENS
+
+        packed.append({**ctx, "content": content, "token_count": token_count})
+        seen_hashes.add(content_hash)
+        kept_words.append(words)
+        tokens_used += cost
+
+    return packed, tokens_used
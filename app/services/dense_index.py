@@ -0,0 +1,73 @@
+# Dense LSA section vectors :- TF-IDF + TruncatedSVD, brute-force cosine search on CPU
+import os
+import numpy as np
+
+def build_lsa(index, dimensions):
+    from sklearn.feature_extraction.text import TfidfTransformer
+    from sklearn.decomposition import TruncatedSVD
+
+    # docs x terms counts; columns line up with the page index term ids
+    counts = index.term_frequency_matrix().T.tocsr()
+    tfidf = TfidfTransformer(sublinear_tf=True)
+    weighted = tfidf.fit_transform(counts)
+
+    dimensions = max(1, min(dimensions, weighted.shape[0] - 1, weighted.shape[1] - 1))
+    svd = TruncatedSVD(n_components=dimensions, random_state=0)
+    vectors = normalize_rows(svd.fit_transform(weighted))
+
+    return vectors.astype(np.float32), tfidf.idf_.astype(np.float32), svd.components_.astype(np.float32)
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def write_dense_index(vectors_path, model_path, vectors, idf, components):
+    # np.save appends .npy to names without it, so write through an open handle
+    tmp_path = f"{vectors_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, vectors)
+    os.replace(tmp_path, vectors_path)
+
+    tmp_path = f"{model_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, idf=idf, components=components)
+    os.replace(tmp_path, model_path)
+
+class DenseIndex:
+    def __init__(self, vectors, idf, components):
+        self.vectors = vectors
+        self.idf = idf
+        self.components = components
+
+    @property
+    def num_terms(self):
+        return len(self.idf)
+
+    @classmethod
+    def load(cls, vectors_path, model_path):
+        # vectors stay memory-mapped, like index.bin
+        vectors = np.load(vectors_path, mmap_mode="r")
+        with np.load(model_path) as model:
+            return cls(vectors, model["idf"], model["components"])
+
+    def encode_query(self, term_ids):
+        if not term_ids:
+            return None
+        unique_ids, counts = np.unique(np.asarray(term_ids), return_counts=True)
+        weights = (1 + np.log(counts)) * self.idf[unique_ids]
+        weights /= np.linalg.norm(weights)
+        query_vector = weights @ self.components[:, unique_ids].T
+        norm = np.linalg.norm(query_vector)
+        if norm == 0:
+            return None
+        return query_vector / norm
+
+    def search(self, query_vector, allowed_mask, depth, min_similarity):
+        similarities = self.vectors @ query_vector.astype(np.float32)
+        candidates = np.flatnonzero(allowed_mask & (similarities >= min_similarity))
+        if len(candidates) > depth:
+            top = np.argpartition(-similarities[candidates], depth - 1)[:depth]
+            candidates = candidates[top]
+        order = np.lexsort((candidates, -similarities[candidates]))
+        return [(int(candidates[i]), float(similarities[candidates[i]])) for i in order.tolist()]
@@ -2,17 +2,32 @@
 import os
 import re
 import json
+import math
+import time
+import hashlib
+import argparse
 import yaml
 from pathlib import Path
 from collections import defaultdict, Counter
+from concurrent.futures import ProcessPoolExecutor
 from app.core.config import settings
 from app.core.logger import logger
+from app.services.compact_index import CompactIndex
+from app.services.binary_index import write_binary_index
+from app.services.dense_index import build_lsa, write_dense_index
+from app.services.context_packer import count_tokens
+from app.services.passage_extractor import split_passages
 
 INDEX_PATH = Path("page_index")
 PAGE_STORE_FILE = INDEX_PATH / "page_store.json"
 INVERTED_INDEX_FILE = INDEX_PATH / "inverted_index.json"
 METADATA_INDEX_FILE = INDEX_PATH / "metadata_index.json"
 IDF_INDEX_FILE = INDEX_PATH / "idf_index.json"
+COMPACT_INDEX_FILE = INDEX_PATH / "compact_index.npz"
+BINARY_INDEX_FILE = INDEX_PATH / "index.bin"
+MANIFEST_FILE = INDEX_PATH / "manifest.json"
+LSA_VECTORS_FILE = INDEX_PATH / "lsa_vectors.npy"
+LSA_MODEL_FILE = INDEX_PATH / "lsa_model.npz"
 STOP_WORDS = {
         "the","is","a","an","in","on","at","for",
         "of","to","and","or","with","by","this",
@@ -20,67 +35,222 @@ STOP_WORDS = {
         "what", "how", "why", "when", "where", "who"
     }
 
+def process_file(filepath, data_path):
+    # runs in a worker process; returns a shard for IndexBuilder.merge_shard
+    return IndexBuilder(data_path).parse_file(filepath)
+
 class IndexBuilder:
-    def __init__(self):
+    def __init__(self, data_path=None):
+        self.data_path = data_path or settings.DATA_PATH
         self.page_store = {}
         self.inverted_index = defaultdict(list)
         self.metadata_index = defaultdict(list)
+        self.doc_lengths = {}
+        self.idf_index = {}
+        # relative source path -> {"mtime", "sha256", "page_ids"}
+        self.manifest = {}
 
-    def build(self):
+    def build(self, workers=1):
         logger.info("=" * 60)
-        logger.info("Starting PageIndex build process...")
+        logger.info(f"Starting PageIndex build process... | Workers: {workers}")
+        start_time = time.time()
 
         INDEX_PATH.mkdir(exist_ok=True)
-        total_pages = 0
-
-        for root, _, files in os.walk(settings.DATA_PATH):
-            for file in files:
-                if not file.endswith("md"):
-                    continue
+        filepaths = self.list_source_files()
 
-                filepath = Path(root)/file
+        if workers > 1:
+            # executor.map yields shards in input order, so the merge is deterministic
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunksize = max(1, len(filepaths) // (workers * 4))
+                shards = executor.map(process_file, filepaths, [self.data_path] * len(filepaths), chunksize=chunksize)
+                for shard in shards:
+                    self.merge_shard(shard)
+        else:
+            for filepath in filepaths:
                 logger.info(f"Processing: {filepath}")
+                self.index_file(filepath)
+
+        self.idf_index = self.compute_idf()
+        self.write_indexes()
+
+        total_time = round(time.time() - start_time, 2)
+        logger.info(f"PageIndex build completed. Total sections indexed: {len(self.page_store)} | Time: {total_time}s")
+        logger.info("=" * 60)
+
+    def build_incremental(self):
+        logger.info("=" * 60)
+        logger.info("Starting incremental PageIndex build...")
+
+        if not MANIFEST_FILE.exists() or not PAGE_STORE_FILE.exists():
+            logger.warning("No manifest or previous index found. Falling back to a full build.")
+            return self.build()
+
+        self.load_indexes()
+        previous_total = len(self.page_store)
+        source_files = {self.relative_path(filepath): filepath for filepath in self.list_source_files()}
+
+        changed, added = [], []
+        for relative_path, filepath in source_files.items():
+            entry = self.manifest.get(relative_path)
+            if entry is None:
+                added.append(relative_path)
+                continue
+            mtime = filepath.stat().st_mtime
+            if mtime == entry["mtime"]:
+                continue
+            # touched but not necessarily edited; only the hash decides
+            if self.file_hash(filepath) == entry["sha256"]:
+                entry["mtime"] = mtime
+                continue
+            changed.append(relative_path)
+        deleted = [relative_path for relative_path in self.manifest if relative_path not in source_files]
+
+        logger.info(f"Incremental build | Added: {len(added)} | Changed: {len(changed)} | Deleted: {len(deleted)}")
+        if not (added or changed or deleted):
+            self.write_manifest()
+            logger.info("PageIndex is up to date.")
+            logger.info("=" * 60)
+            return
+
+        affected_tokens = set()
+        for relative_path in changed + deleted:
+            affected_tokens |= self.remove_file(relative_path)
 
-                metadata, body = self.parse_markdown(filepath)
-
-                if not metadata:
-                    continue
-                
-                sections = self.split_into_sections(body)
-
-                for idx, section in enumerate(sections):
-                    page_id = self.generate_page_id(filepath, idx)
-
-                    roles = metadata.get("role_access", [])
-                    if isinstance(roles, str):
-                        roles = [r.strip().casefold() for r in roles.split(",")]
-                    else:
-                        roles = [str(r).casefold() for r in roles]
-
-                    page_data = {
-                        "title": metadata.get("title"),
-                        "department": metadata.get("department"),
-                        "sensitivity": metadata.get("sensitivity"),
-                        "document_type": metadata.get("document_type"),
-                        "last_updated": str(metadata.get("last_updated")) if metadata.get("last_updated") else None,
-                        "version": metadata.get("version"),
-                        "role_access": roles,
-                        "source_file": file,
-                        "content": section.strip()
-                    }
-
-                    self.page_store[page_id] = page_data
-                    self.index_content(page_id, section)
-
-                    for role in roles:
-                        self.metadata_index[role].append(page_id)
-                    total_pages += 1
-        
+        for relative_path in changed + added:
+            logger.info(f"Processing: {source_files[relative_path]}")
+            for page_id in self.index_file(source_files[relative_path]):
+                affected_tokens |= set(self.tokenize(self.page_store[page_id]["content"]))
+
+        self.update_idf(affected_tokens, previous_total)
         self.write_indexes()
 
-        logger.info(f"PageIndex build completed. Total sections indexed: {total_pages}")
+        logger.info(f"Incremental PageIndex build completed. Total sections indexed: {len(self.page_store)}")
         logger.info("=" * 60)
 
+    def list_source_files(self):
+        # sorted so page order (and therefore integer doc ids) does not depend on the filesystem
+        filepaths = []
+        for root, dirs, files in os.walk(self.data_path):
+            dirs.sort()
+            for file in sorted(files):
+                if file.endswith("md"):
+                    filepaths.append(Path(root)/file)
+        return filepaths
+
+    def relative_path(self, filepath):
+        return str(Path(filepath).relative_to(self.data_path))
+
+    def file_hash(self, filepath):
+        with open(filepath, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def parse_file(self, filepath):
+        pages = []
+        metadata, body = self.parse_markdown(filepath)
+
+        if metadata:
+            sections = self.split_into_sections(body)
+
+            for idx, section in enumerate(sections):
+                page_id = self.generate_page_id(filepath, idx)
+
+                roles = metadata.get("role_access", [])
+                if isinstance(roles, str):
+                    roles = [r.strip().casefold() for r in roles.split(",")]
+                else:
+                    roles = [str(r).casefold() for r in roles]
+
+                page_data = {
+                    "title": metadata.get("title"),
+                    "department": metadata.get("department"),
+                    "sensitivity": metadata.get("sensitivity"),
+                    "document_type": metadata.get("document_type"),
+                    "last_updated": str(metadata.get("last_updated")) if metadata.get("last_updated") else None,
+                    "version": metadata.get("version"),
+                    "role_access": roles,
+                    "source_file": Path(filepath).name,
+                    "content": section.strip(),
+                    "token_count": count_tokens(section.strip()),
+                    "passages": split_passages(section.strip())[1]
+                }
+                tokens = self.tokenize(section)
+                pages.append((page_id, page_data, Counter(tokens), len(tokens)))
+
+        return {
+            "relative_path": self.relative_path(filepath),
+            "mtime": Path(filepath).stat().st_mtime,
+            "sha256": self.file_hash(filepath),
+            "pages": pages
+        }
+
+    def merge_shard(self, shard):
+        page_ids = []
+        for page_id, page_data, token_counts, doc_length in shard["pages"]:
+            self.page_store[page_id] = page_data
+            self.doc_lengths[page_id] = doc_length
+            for token, count in token_counts.items():
+                self.inverted_index[token].append({"page_id": page_id,"tf": count})
+            for role in page_data["role_access"]:
+                self.metadata_index[role].append(page_id)
+            page_ids.append(page_id)
+
+        # unparseable files are recorded too, so they are not re-read until they change
+        self.manifest[shard["relative_path"]] = {
+            "mtime": shard["mtime"],
+            "sha256": shard["sha256"],
+            "page_ids": page_ids
+        }
+        return page_ids
+
+    def index_file(self, filepath):
+        return self.merge_shard(self.parse_file(filepath))
+
+    def remove_file(self, relative_path):
+        entry = self.manifest.pop(relative_path)
+        removed = set(entry["page_ids"])
+        affected_tokens = set()
+
+        for page_id in entry["page_ids"]:
+            page_data = self.page_store.pop(page_id, None)
+            self.doc_lengths.pop(page_id, None)
+            if page_data is None:
+                continue
+            affected_tokens |= set(self.tokenize(page_data["content"]))
+            for role in page_data["role_access"]:
+                if role in self.metadata_index:
+                    self.metadata_index[role] = [p for p in self.metadata_index[role] if p not in removed]
+                    if not self.metadata_index[role]:
+                        del self.metadata_index[role]
+
+        for token in affected_tokens:
+            postings = [entry for entry in self.inverted_index.get(token, []) if entry["page_id"] not in removed]
+            if postings:
+                self.inverted_index[token] = postings
+            else:
+                self.inverted_index.pop(token, None)
+
+        return affected_tokens
+
+    def load_indexes(self):
+        with open(PAGE_STORE_FILE, "r", encoding="utf-8") as f:
+            self.page_store = json.load(f)
+        with open(INVERTED_INDEX_FILE, "r", encoding="utf-8") as f:
+            self.inverted_index = defaultdict(list, json.load(f))
+        with open(METADATA_INDEX_FILE, "r", encoding="utf-8") as f:
+            self.metadata_index = defaultdict(list, json.load(f))
+        if IDF_INDEX_FILE.exists():
+            with open(IDF_INDEX_FILE, "r", encoding="utf-8") as f:
+                self.idf_index = json.load(f)
+        with open(MANIFEST_FILE, "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+
+        # every token of a section is indexed, so its length is the sum of its tfs
+        self.doc_lengths = defaultdict(int)
+        for postings in self.inverted_index.values():
+            for entry in postings:
+                self.doc_lengths[entry["page_id"]] += entry["tf"]
+        self.doc_lengths = dict(self.doc_lengths)
+
     def parse_markdown(self, filepath):
         try:
             with open(filepath, "r", encoding="utf-8") as f:
@@ -110,36 +280,98 @@ class IndexBuilder:
         tokens = [t for t in tokens if t not in STOP_WORDS and len(t) > 2]
         return tokens
 
-    def index_content(self, page_id, content):
-        tokens = self.tokenize(content)
-        token_counts = Counter(tokens)
-        for token, count in token_counts.items():
-            self.inverted_index[token].append({"page_id": page_id,"tf": count})
-    
     def generate_page_id(self, filepath, section_index):
-        relative_path = Path(filepath).relative_to(settings.DATA_PATH)
+        relative_path = Path(filepath).relative_to(self.data_path)
         base = str(relative_path).replace("/", "_").replace(".md", "")
         return f"{base}_sec_{section_index}"
     
+    def token_idf(self, token, total_docs):
+        doc_freq = len(self.inverted_index[token])
+        return math.log(total_docs / (1 + doc_freq)) + 1.0
+
+    def compute_idf(self):
+        idf_index = {}
+        total_docs = len(self.page_store)
+        if total_docs > 0:
+            for token in self.inverted_index:
+                idf_index[token] = self.token_idf(token, total_docs)
+        return idf_index
+
+    def update_idf(self, affected_tokens, previous_total):
+        total_docs = len(self.page_store)
+        if total_docs != previous_total or not self.idf_index:
+            # the corpus size is part of every idf value
+            self.idf_index = self.compute_idf()
+            return
+        for token in affected_tokens:
+            if token in self.inverted_index:
+                self.idf_index[token] = self.token_idf(token, total_docs)
+            else:
+                self.idf_index.pop(token, None)
+
+    def canonical_order(self):
+        # pages ordered by source path then section, whether built in one go or patched incrementally
+        page_ids = [
+            page_id
+            for relative_path in sorted(self.manifest)
+            for page_id in self.manifest[relative_path]["page_ids"]
+            if page_id in self.page_store
+        ]
+        return {page_id: position for position, page_id in enumerate(page_ids)}
+
+    def write_manifest(self):
+        with open(MANIFEST_FILE, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(self.manifest.items())), f, indent=2)
+
     def write_indexes(self):
+        order = self.canonical_order()
+        self.page_store = {page_id: self.page_store[page_id] for page_id in order}
+        for token, postings in self.inverted_index.items():
+            postings.sort(key=lambda entry: order[entry["page_id"]])
+        for page_ids in self.metadata_index.values():
+            page_ids.sort(key=order.__getitem__)
+
         with open(PAGE_STORE_FILE, "w", encoding="utf-8") as f:
             json.dump(self.page_store, f, indent=2)
         with open(INVERTED_INDEX_FILE, "w", encoding="utf-8") as f:
-            json.dump(dict(self.inverted_index), f, indent=2)
+            json.dump(dict(self.inverted_index), f, indent=2, sort_keys=True)
         with open(METADATA_INDEX_FILE, "w", encoding="utf-8") as f:
-            json.dump(dict(self.metadata_index), f, indent=2)
-
-        import math
-        idf_index = {}
-        total_docs = len(self.page_store)
-        if total_docs > 0:
-            for token, postings in self.inverted_index.items():
-                doc_freq = len(postings)
-                idf_index[token] = math.log(total_docs / (1 + doc_freq)) + 1.0
+            json.dump(dict(self.metadata_index), f, indent=2, sort_keys=True)
 
+        idf_index = self.idf_index
         with open(IDF_INDEX_FILE, "w", encoding="utf-8") as f:
-            json.dump(idf_index, f, indent=2)
+            json.dump(idf_index, f, indent=2, sort_keys=True)
+
+        compact_index = CompactIndex.from_inverted_index(
+            self.page_store.keys(), self.inverted_index, idf_index, self.doc_lengths
+        )
+        compact_index.save(COMPACT_INDEX_FILE)
+        logger.info(f"Compact index written: {compact_index.num_docs} docs | {len(compact_index.terms)} terms | {len(compact_index.doc_ids)} postings")
+
+        pages = [self.page_store[page_id] for page_id in compact_index.page_ids]
+        role_doc_ids = {
+            role: [compact_index.page_id_lookup[page_id] for page_id in page_ids]
+            for role, page_ids in self.metadata_index.items()
+        }
+        write_binary_index(BINARY_INDEX_FILE, compact_index, pages, role_doc_ids)
+        logger.info(f"Binary index written: {BINARY_INDEX_FILE} ({BINARY_INDEX_FILE.stat().st_size} bytes)")
+
+        if settings.LSA_DIM > 0 and compact_index.num_docs > 1:
+            vectors, lsa_idf, components = build_lsa(compact_index, settings.LSA_DIM)
+            write_dense_index(LSA_VECTORS_FILE, LSA_MODEL_FILE, vectors, lsa_idf, components)
+            logger.info(f"LSA vectors written: {vectors.shape[0]} docs x {vectors.shape[1]} dims")
+
+        # written last: its presence means the index files above are complete
+        self.write_manifest()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the PageIndex from DATA_PATH")
+    parser.add_argument("--incremental", action="store_true", help="only re-process added, changed or deleted files")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes for a full build (0 = all cores)")
+    args = parser.parse_args()
+
     builder = IndexBuilder()
-    builder.build()
\ No newline at end of file
+    if args.incremental:
+        builder.build_incremental()
+    else:
+        builder.build(workers=args.workers or os.cpu_count())
\ No newline at end of file
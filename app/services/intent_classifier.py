@@ -0,0 +1,108 @@
+# Message intent :- multinomial naive Bayes over words and word pairs, trained offline from
+# models/intent_examples.json into models/intent_model.json
+#
+# Train: python -m app.services.intent_classifier
+import re
+import json
+import math
+import argparse
+from pathlib import Path
+from collections import Counter, defaultdict
+
+MODEL_PATH = Path("models/intent_model.json")
+EXAMPLES_PATH = Path("models/intent_examples.json")
+QUESTION = "question"
+# words this short ("ok", "hi", "so") are not checked against the chit-chat vocabulary
+MIN_CHECKED_CHARS = 3
+
+def message_words(text):
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+def message_features(text):
+    words = message_words(text)
+    # chit-chat is short; the length bucket lets the model use that
+    length = "__words_1" if len(words) <= 1 else "__words_2_3" if len(words) <= 3 else "__words_4_plus"
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])] + [length]
+
+def train(examples, alpha=0.1):
+    feature_counts = defaultdict(Counter)
+    for label, messages in examples.items():
+        for message in messages:
+            feature_counts[label].update(message_features(message))
+
+    vocabulary = set()
+    for counts in feature_counts.values():
+        vocabulary.update(counts)
+    total_examples = sum(len(messages) for messages in examples.values())
+
+    model = {"labels": sorted(examples), "priors": {}, "log_likelihoods": {}, "unseen": {}}
+    for label in model["labels"]:
+        counts = feature_counts[label]
+        denominator = sum(counts.values()) + alpha * len(vocabulary)
+        model["priors"][label] = math.log(len(examples[label]) / total_examples)
+        model["log_likelihoods"][label] = {
+            feature: round(math.log((count + alpha) / denominator), 6) for feature, count in sorted(counts.items())
+        }
+        model["unseen"][label] = math.log(alpha / denominator)
+    model["vocabulary"] = sorted(vocabulary)
+    return model
+
+class IntentClassifier:
+    def __init__(self, model):
+        self.labels = model["labels"]
+        self.priors = model["priors"]
+        self.log_likelihoods = model["log_likelihoods"]
+        self.unseen = model["unseen"]
+        self.vocabulary = set(model["vocabulary"])
+        # every word of the chit-chat examples; anything outside it is treated as part of a question
+        self.chitchat_words = {
+            feature for label in self.labels if label != QUESTION for feature in self.log_likelihoods[label]
+        }
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def predict(self, text):
+        # features never seen in training say nothing about the intent
+        features = [f for f in message_features(text) if f in self.vocabulary]
+        if not features:
+            return QUESTION, 0.0
+
+        scores = {
+            label: self.priors[label] + sum(self.log_likelihoods[label].get(f, self.unseen[label]) for f in features)
+            for label in self.labels
+        }
+        best = max(scores, key=scores.get)
+        if best != QUESTION and self.unknown_words(text):
+            # "morning shift allowance" is a question that happens to open with a greeting word
+            return QUESTION, 0.0
+        total = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / total
+
+    def unknown_words(self, text):
+        return [word for word in message_words(text) if len(word) >= MIN_CHECKED_CHARS and word not in self.chitchat_words]
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the message intent model")
+    parser.add_argument("--examples", default=str(EXAMPLES_PATH))
+    parser.add_argument("--output", default=str(MODEL_PATH))
+    args = parser.parse_args()
+
+    with open(args.examples) as f:
+        examples = json.load(f)
+    model = train(examples)
+
+    # training-set accuracy, as a quick sanity check
+    classifier = IntentClassifier(model)
+    correct = sum(classifier.predict(m)[0] == label for label, messages in examples.items() for m in messages)
+    total = sum(len(messages) for messages in examples.values())
+
+    with open(args.output, "w") as f:
+        json.dump(model, f, indent=1, sort_keys=True)
+    print(f"Trained on {total} messages | Labels: {', '.join(model['labels'])} | "
+          f"Features: {len(model['vocabulary'])} | Training accuracy: {correct / total:.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+# Ollama backend pool :- least-loaded routing, health checks and a circuit breaker per backend
+import json
+import time
+import asyncio
+import threading
+from urllib.parse import urlsplit
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import metrics
+
+class NoBackendAvailable(Exception):
+    pass
+
+class OllamaBackend:
+    def __init__(self, url):
+        self.url = url
+        parts = urlsplit(url)
+        self.name = parts.netloc
+        self.health_url = f"{parts.scheme}://{parts.netloc}/api/tags"
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.healthy = True
+        # closed: normal, open: failing fast until the cooldown ends, half_open: one trial request
+        self.state = "closed"
+        self.opened_at = 0.0
+
+    def available(self, now):
+        if not self.healthy:
+            return False
+        if self.state == "open":
+            return now - self.opened_at >= settings.OLLAMA_BREAKER_COOLDOWN
+        if self.state == "half_open":
+            return self.in_flight == 0
+        return True
+
+    def begin(self):
+        with self.lock:
+            if self.state == "open":
+                self.state = "half_open"
+            self.in_flight += 1
+            self.requests += 1
+        metrics.incr(f"ollama.{self.name}.requests")
+        metrics.add_gauge(f"ollama.{self.name}.in_flight", 1)
+
+    def end(self):
+        with self.lock:
+            self.in_flight -= 1
+        metrics.add_gauge(f"ollama.{self.name}.in_flight", -1)
+
+    def record_success(self):
+        with self.lock:
+            if self.state != "closed":
+                logger.info(f"Ollama backend recovered | Backend: {self.name}")
+            self.failures = 0
+            self.state = "closed"
+
+    def record_failure(self, error):
+        metrics.incr(f"ollama.{self.name}.errors")
+        with self.lock:
+            self.failures += 1
+            tripped = self.state == "half_open" or (
+                self.state == "closed" and self.failures >= settings.OLLAMA_BREAKER_FAILURES
+            )
+            if tripped:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+        if tripped:
+            metrics.incr(f"ollama.{self.name}.breaker_opened")
+            logger.warning(f"Ollama circuit opened | Backend: {self.name} | Failures: {self.failures} | Error: {str(error)}")
+
+    def set_healthy(self, healthy):
+        if healthy != self.healthy:
+            logger.warning(f"Ollama backend {'healthy' if healthy else 'unhealthy'} | Backend: {self.name}")
+        self.healthy = healthy
+        metrics.set_gauge(f"ollama.{self.name}.healthy", int(healthy))
+
+    def describe(self):
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "state": self.state,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "consecutive_failures": self.failures
+        }
+
+class OllamaPool:
+    def __init__(self, urls):
+        self.backends = [OllamaBackend(url) for url in urls]
+
+    def pick(self, tried, preferred=None):
+        now = time.monotonic()
+        candidates = [b for b in self.backends if b not in tried and b.available(now)]
+        if not candidates:
+            metrics.incr("ollama.no_backend")
+            raise NoBackendAvailable("No Ollama backend available")
+        least_loaded = min(candidates, key=lambda b: (b.in_flight, b.requests))
+        # conversation affinity: stay on the backend that has the conversation's prompt cached unless it is busier
+        for backend in candidates:
+            if backend.url == preferred and backend.in_flight <= least_loaded.in_flight + settings.OLLAMA_AFFINITY_SLACK:
+                return backend
+        return least_loaded
+
+    def can_retry(self, tried, started):
+        # once tokens reached the client the answer cannot be restarted elsewhere
+        return settings.OLLAMA_RETRY and not started and len(tried) < len(self.backends)
+
+    async def astream(self, client, payload, preferred=None, on_done=None):
+        tried = set()
+        while True:
+            backend = self.pick(tried, preferred)
+            tried.add(backend)
+            backend.begin()
+            start_time = time.perf_counter()
+            started = False
+            try:
+                async with client.stream("POST", backend.url, json=payload) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        data = json.loads(line)
+                        if not started:
+                            started = True
+                            metrics.observe(f"ollama.{backend.name}.first_token", time.perf_counter() - start_time)
+                        if data.get("done"):
+                            record_prompt_eval(backend, data)
+                            if on_done:
+                                on_done(backend, data)
+                        yield data.get("response", "")
+                backend.record_success()
+                metrics.observe(f"ollama.{backend.name}.stream", time.perf_counter() - start_time)
+                return
+            except Exception as e:
+                backend.record_failure(e)
+                if not self.can_retry(tried, started):
+                    raise
+                metrics.incr("ollama.retries")
+                logger.warning(f"Ollama stream failed before first token, retrying | Backend: {backend.name} | Error: {str(e)}")
+            finally:
+                backend.end()
+
+    def stream(self, session, payload):
+        tried = set()
+        while True:
+            backend = self.pick(tried)
+            tried.add(backend)
+            backend.begin()
+            start_time = time.perf_counter()
+            started = False
+            try:
+                response = session.post(backend.url, json=payload, stream=True, timeout=settings.OLLAMA_TIMEOUT)
+                with response:
+                    response.raise_for_status()
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        data = json.loads(line.decode("utf-8"))
+                        if not started:
+                            started = True
+                            metrics.observe(f"ollama.{backend.name}.first_token", time.perf_counter() - start_time)
+                        yield data.get("response", "")
+                backend.record_success()
+                metrics.observe(f"ollama.{backend.name}.stream", time.perf_counter() - start_time)
+                return
+            except Exception as e:
+                backend.record_failure(e)
+                if not self.can_retry(tried, started):
+                    raise
+                metrics.incr("ollama.retries")
+                logger.warning(f"Ollama stream failed before first token, retrying | Backend: {backend.name} | Error: {str(e)}")
+            finally:
+                backend.end()
+
+    def generate(self, session, payload):
+        tried = set()
+        while True:
+            backend = self.pick(tried)
+            tried.add(backend)
+            backend.begin()
+            start_time = time.perf_counter()
+            try:
+                response = session.post(backend.url, json=payload, timeout=settings.OLLAMA_TIMEOUT)
+                response.raise_for_status()
+                backend.record_success()
+                metrics.observe(f"ollama.{backend.name}.generate", time.perf_counter() - start_time)
+                return response.json().get("response", "")
+            except Exception as e:
+                backend.record_failure(e)
+                if not self.can_retry(tried, False):
+                    raise
+                metrics.incr("ollama.retries")
+            finally:
+                backend.end()
+
+    async def check_health(self, client):
+        async def check(backend):
+            try:
+                response = await client.get(backend.health_url, timeout=settings.OLLAMA_HEALTH_TIMEOUT)
+                backend.set_healthy(response.status_code == 200)
+            except Exception:
+                backend.set_healthy(False)
+
+        await asyncio.gather(*(check(backend) for backend in self.backends))
+
+    async def health_loop(self, client, interval):
+        while True:
+            await self.check_health(client)
+            await asyncio.sleep(interval)
+
+    def describe(self):
+        return [backend.describe() for backend in self.backends]
+
+def record_prompt_eval(backend, data):
+    # Ollama reports durations in nanoseconds
+    metrics.incr("ollama.prompt_eval_tokens", data.get("prompt_eval_count", 0))
+    if "prompt_eval_duration" in data:
+        metrics.observe(f"ollama.{backend.name}.prompt_eval", data["prompt_eval_duration"] / 1e9)
+
+def configured_urls():
+    urls = [url.strip() for url in settings.OLLAMA_URLS.split(",") if url.strip()]
+    return urls or [settings.OLLAMA_URL]
+
+OLLAMA_POOL = OllamaPool(configured_urls())
+
+def get_pool():
+    return OLLAMA_POOL
+
+def reset_pool(urls=None):
+    global OLLAMA_POOL
+    OLLAMA_POOL = OllamaPool(urls or configured_urls())
+    return OLLAMA_POOL
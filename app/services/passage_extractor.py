@@ -0,0 +1,188 @@
+# Passage extraction :- split sections into paragraph / table-row / sentence windows / fenced blocks, keep the ones
+# matching the query together with the rest of their table
+import re
+from collections import Counter
+from app.core.config import settings
+from app.services.context_packer import count_tokens
+
+TABLE_ROWS_PER_PASSAGE = 1
+SENTENCE_WINDOW_TOKENS = 120
+# passages scoring well below the best one in their section are dropped, unless they belong to a matching table
+MIN_SCORE_SHARE = 0.5
+FENCE = "```"
+
+def tokenize(text):
+    # same normalisation as the page index; stop words never match the (already filtered) query tokens
+    return re.sub(r"[^a-z0-9\s]", " ", text.lower()).split()
+
+def split_blocks(text):
+    # blank lines separate blocks, except inside a ``` fence, which always stays one block
+    blocks, current, in_fence = [], [], False
+    for line in text.splitlines():
+        if line.lstrip().startswith(FENCE):
+            in_fence = not in_fence
+        if not line.strip() and not in_fence:
+            if current:
+                blocks.append("\n".join(current).strip())
+            current = []
+        else:
+            current.append(line)
+    if current:
+        blocks.append("\n".join(current).strip())
+    return [block for block in blocks if block]
+
+def table_header_size(lines):
+    # column names plus the |---| separator row
+    return 2 if len(lines) > 1 and re.match(r"^\s*\|?[\s:|-]+\|?\s*$", lines[1]) else 1
+
+def split_table(block):
+    lines = block.splitlines()
+    # every group of rows keeps the column header so it can be read on its own
+    header_size = table_header_size(lines)
+    header, rows = lines[:header_size], lines[header_size:]
+    if not rows:
+        return [block]
+    return [
+        "\n".join(header + rows[start:start + TABLE_ROWS_PER_PASSAGE])
+        for start in range(0, len(rows), TABLE_ROWS_PER_PASSAGE)
+    ]
+
+def is_list(block):
+    return all(re.match(r"^\s*([-*+]|\d+[.)])\s", line) or line.startswith((" ", "\t")) for line in block.splitlines())
+
+def split_sentences(block):
+    # lists are windowed by item, so every item keeps its own line
+    if is_list(block):
+        units, separator = block.splitlines(), "\n"
+    else:
+        units, separator = re.split(r"(?<=[.!?])\s+", block), " "
+    windows, current, current_tokens = [], [], 0
+    for unit in units:
+        unit_tokens = count_tokens(unit)
+        if current and current_tokens + unit_tokens > SENTENCE_WINDOW_TOKENS:
+            windows.append(separator.join(current))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += unit_tokens
+    if current:
+        windows.append(separator.join(current))
+    return windows
+
+def split_passages(content):
+    # the first line of a section is its heading (split_into_sections strips the "## ")
+    heading, _, body = content.partition("\n")
+    passages = []
+    for block in split_blocks(body):
+        if FENCE in block:
+            # code and diagrams are only readable whole
+            texts = [block]
+        elif block.lstrip().startswith("|"):
+            texts = split_table(block)
+        elif count_tokens(block) > SENTENCE_WINDOW_TOKENS:
+            texts = split_sentences(block)
+        else:
+            texts = [block]
+        passages.extend({"text": text, "token_count": count_tokens(text)} for text in texts)
+    return heading.strip(), passages
+
+def score_passage(text, query_counts, idf):
+    passage_counts = Counter(tokenize(text))
+    return sum(passage_counts[token] * weight * idf(token) for token, weight in query_counts.items())
+
+def is_table_row(text):
+    return text.lstrip().startswith("|")
+
+def table_groups(passages):
+    # consecutive row passages under the same column header come from one table
+    groups, header, group = [], None, -1
+    for position, passage in enumerate(passages):
+        lines = passage["text"].splitlines()
+        row_header = lines[:table_header_size(lines)] if is_table_row(passage["text"]) else None
+        if row_header is None or row_header != header:
+            group = position
+        header = row_header
+        groups.append(group)
+    return groups
+
+def has_split_fence(passages):
+    # stored by builds that cut ``` blocks at blank lines
+    return any(passage["text"].count(FENCE) % 2 for passage in passages)
+
+def extract_passages(ctx, query_tokens, idf, max_tokens=None):
+    max_tokens = settings.PASSAGE_MAX_TOKENS if max_tokens is None else max_tokens
+    heading, passages = ctx["content"].partition("\n")[0].strip(), ctx.get("passages")
+    if passages is None or has_split_fence(passages):
+        # indexes built before passages were stored, or before fences were kept whole
+        heading, passages = split_passages(ctx["content"] or "")
+    if not passages:
+        return ctx
+
+    query_counts = Counter(query_tokens)
+    scores = [score_passage(passage["text"], query_counts, idf) for passage in passages]
+    best_score = max(scores)
+    used = count_tokens(heading)
+    selected = set()
+
+    groups = table_groups(passages)
+
+    def cost(position):
+        passage = passages[position]
+        if not is_table_row(passage["text"]) or not any(groups[other] == groups[position] for other in selected):
+            return passage["token_count"]
+        # rows of a table already in the prompt share its header
+        lines = passage["text"].splitlines()
+        return count_tokens("\n".join(lines[table_header_size(lines):]))
+
+    def select(position):
+        nonlocal used
+        if position in selected:
+            return True
+        tokens = cost(position)
+        if selected and used + tokens > max_tokens:
+            return False
+        selected.add(position)
+        used += tokens
+        return True
+
+    if best_score <= 0 or score_passage(heading, query_counts, idf) >= best_score:
+        # the section as a whole answers the query (its heading matches best, or it was matched through dense
+        # retrieval): keep it from the top, in document order, as far as the budget goes
+        for position in range(len(passages)):
+            if not select(position):
+                break
+    else:
+        ranked = sorted(range(len(passages)), key=lambda position: (-scores[position], position))
+        for position in ranked:
+            if scores[position] <= 0 or scores[position] < best_score * MIN_SCORE_SHARE:
+                break
+            if not select(position):
+                continue
+            if is_table_row(passages[position]["text"]):
+                # the answer often sits in rows that do not repeat the query terms
+                for row in range(len(passages)):
+                    if groups[row] == groups[position] and not select(row):
+                        break
+            elif passages[position]["text"].rstrip().endswith(":") and position + 1 < len(passages):
+                # a lead-in ("Expenses were allocated as follows:") is answered by what comes next
+                select(position + 1)
+
+    # document order reads better than score order
+    texts = join_passages([passages[position]["text"] for position in sorted(selected)])
+    content = "\n\n".join([heading] + texts) if heading else "\n\n".join(texts)
+    token_count = count_tokens(content)
+    if ctx.get("token_count") is not None and token_count >= ctx["token_count"]:
+        return ctx
+    return {**ctx, "content": content, "token_count": token_count}
+
+def join_passages(texts):
+    blocks = []
+    for text in texts:
+        lines = text.splitlines()
+        previous = blocks[-1].splitlines() if blocks else []
+        header_size = table_header_size(lines)
+        # rows of the same table share one header
+        if lines[0].lstrip().startswith("|") and previous[:header_size] == lines[:header_size]:
+            blocks[-1] = "\n".join(previous + lines[header_size:])
+        else:
+            blocks.append(text)
+    return blocks
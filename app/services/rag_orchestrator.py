@@ -1,10 +1,107 @@
-from app.services.retrieval import retrieve
+import random
+import asyncio
+from app.services.retrieval import retrieve, tokenize_query, current_generation
+from app.services.passage_extractor import extract_passages
 from app.services.streaming import stream_ollama
+from app.services.context_packer import pack_contexts, count_tokens
+from app.services.intent_classifier import IntentClassifier, MODEL_PATH, QUESTION
+from app.core.config import settings
 from app.core.logger import logger
+from app.core.metrics import metrics
+
+# tokens kept free for the answer when continuing from a stored Ollama context
+RESPONSE_TOKEN_RESERVE = 1024
+
+CANNED_REPLIES = {
+    "greeting": [
+        "Hello! How can I help you today?",
+        "Hi there! Ask me anything about company policies, finance, marketing or engineering."
+    ],
+    "thanks": [
+        "You're welcome! Let me know if there's anything else I can help with.",
+        "Happy to help!"
+    ],
+    "goodbye": [
+        "Goodbye! Have a great day.",
+        "Take care! I'm here whenever you need me."
+    ]
+}
+SMALLTALK_FALLBACK = "I'm the company assistant. I can answer questions about the documents your role has access to."
+
+try:
+    INTENT_CLASSIFIER = IntentClassifier.load(MODEL_PATH)
+except Exception as e:
+    logger.warning(f"Intent model unavailable, every message goes through retrieval | Error: {str(e)}")
+    INTENT_CLASSIFIER = None
+
+def format_contexts(contexts):
+    context_text = ""
+
+    for idx, ctx in enumerate(contexts, 1):
+        context_text += f"\n[Document {idx} | Score: {ctx['score']}]\n"
+        context_text += ctx["content"] + "\n"
+
+    return context_text
+
+def build_followup_prompt(query, contexts):
+    # continues a conversation whose preamble and earlier turns Ollama already holds in its context
+    if not contexts:
+        return f"""
+    User Message:
+    {query}
+
+    Answer:
+    """
+
+    return f"""
+    Company Context:
+    {format_contexts(contexts)}
+
+    User Message:
+    {query}
+
+    Answer:
+    """
+
+def build_smalltalk_prompt(query):
+    return f"""
+    You are a friendly, intelligent AI assistant for the company.
+    Reply to this casual message briefly and politely, in one or two sentences.
+
+    User Message:
+    {query}
+
+    Answer:
+    """
+
+def route_message(query: str):
+    # "rag": retrieval + history + main model; "canned": fixed reply; "small_model": chit-chat on SMALL_MODEL
+    if not settings.INTENT_ROUTING or INTENT_CLASSIFIER is None:
+        return QUESTION, "rag"
 
-def build_prompt(query, contexts, history=None):
+    with metrics.timer("intent.classify"):
+        intent, confidence = INTENT_CLASSIFIER.predict(query)
+
+    if intent == QUESTION or confidence < settings.INTENT_MIN_CONFIDENCE or len(query.split()) > settings.INTENT_MAX_WORDS:
+        route = "rag"
+    elif intent in CANNED_REPLIES or not settings.SMALL_MODEL:
+        route = "canned"
+    else:
+        route = "small_model"
+
+    metrics.incr(f"intent.{intent}")
+    metrics.incr(f"intent.route.{route}")
+    logger.info(f"Intent: {intent} | Confidence: {confidence:.2f} | Route: {route}")
+    return intent, route
+
+def canned_reply(intent):
+    return random.choice(CANNED_REPLIES.get(intent, [SMALLTALK_FALLBACK]))
+
+def build_prompt(query, contexts, history=None, summary=None):
 
     conversation_context = ""
+    if summary:
+        conversation_context += f"Summary of earlier conversation: {summary}\n"
     if history:
         for msg in history:
             conversation_context += f"{msg['role']}: {msg['content']}\n"
@@ -28,11 +125,7 @@ def build_prompt(query, contexts, history=None):
         Answer:
         """
 
-    context_text = ""
-
-    for idx, ctx in enumerate(contexts, 1):
-        context_text += f"\n[Document {idx} | Score: {ctx['score']}]\n"
-        context_text += ctx["content"] + "\n"
+    context_text = format_contexts(contexts)
 
     return f"""
     You are a friendly, intelligent AI assistant for the company.
@@ -55,11 +148,68 @@ def build_prompt(query, contexts, history=None):
     Answer:
     """
 
-def stream_response(query: str, user_role: str, conversation_history=None):
+def select_passages(query, contexts):
+    query_tokens = tokenize_query(query)
+    term_weight = current_generation().term_weight
+    return [extract_passages(ctx, query_tokens, term_weight) for ctx in contexts]
+
+def retrieve_contexts(query: str, user_role: str):
     logger.info(f"User Role: {user_role}")
     logger.info(f"User Query: {query}")
 
     contexts = retrieve(query, user_role)
-    prompt = build_prompt(query, contexts, conversation_history)
-
-    return stream_ollama(prompt)
\ No newline at end of file
+    if settings.PASSAGE_EXTRACTION:
+        contexts = select_passages(query, contexts)
+    packed_contexts, context_tokens = pack_contexts(contexts, settings.CONTEXT_TOKEN_BUDGET)
+
+    metrics.incr("prompt.context_tokens", context_tokens)
+    logger.info(
+        f"Context packed | Sections: {len(packed_contexts)}/{len(contexts)} | "
+        f"Context Tokens: {context_tokens}/{settings.CONTEXT_TOKEN_BUDGET}"
+    )
+    return packed_contexts
+
+def prepare_prompt(query: str, contexts, conversation_history=None, conversation_summary=None):
+    prompt = build_prompt(query, contexts, conversation_history, conversation_summary)
+
+    prompt_tokens = count_tokens(prompt)
+    metrics.incr("prompt.requests")
+    metrics.incr("prompt.tokens", prompt_tokens)
+    logger.info(f"Prompt Tokens: {prompt_tokens}")
+    return prompt
+
+def stream_response(query: str, user_role: str, conversation_history=None, conversation_summary=None):
+    contexts = retrieve_contexts(query, user_role)
+    prompt = prepare_prompt(query, contexts, conversation_history, conversation_summary)
+    return stream_ollama(prompt)
+
+def reusable_context(conversation_context, followup_prompt):
+    if not conversation_context:
+        return None
+    if conversation_context["model"] != settings.OLLAMA_MODEL:
+        metrics.incr("prompt.context_model_changed")
+        return None
+    # leave room for the answer; past that, start over from the bounded history prompt
+    needed = len(conversation_context["context"]) + count_tokens(followup_prompt) + RESPONSE_TOKEN_RESERVE
+    if needed > settings.OLLAMA_NUM_CTX:
+        metrics.incr("prompt.context_overflow")
+        return None
+    return conversation_context
+
+async def aprepare_prompt(query: str, user_role: str, load_history):
+    # retrieval runs off the event loop while the history is fetched from Redis
+    contexts, (summary, history, conversation_context) = await asyncio.gather(
+        asyncio.to_thread(retrieve_contexts, query, user_role),
+        load_history()
+    )
+
+    followup_prompt = build_followup_prompt(query, contexts)
+    conversation_context = reusable_context(conversation_context, followup_prompt)
+    if conversation_context:
+        metrics.incr("prompt.context_reused")
+        metrics.incr("prompt.requests")
+        metrics.incr("prompt.tokens", count_tokens(followup_prompt))
+        logger.info(f"Reusing Ollama context | Context Tokens: {len(conversation_context['context'])}")
+        return followup_prompt, conversation_context
+
+    return prepare_prompt(query, contexts, history, summary), None
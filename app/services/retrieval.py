@@ -1,29 +1,419 @@
 from pathlib import Path
 import json
 import re
-from collections import defaultdict
+import heapq
+import hashlib
+import threading
+import time
+import numpy as np
+from scipy import sparse
+from app.core.config import settings
 from app.core.logger import logger
+from app.core.metrics import metrics
+from app.core.ttl_cache import TTLCache
+from app.services.compact_index import CompactIndex
+from app.services.binary_index import BinaryIndex
+from app.services.dense_index import DenseIndex
 
 INDEX_PATH = Path("page_index")
 PAGE_STORE_FILE = INDEX_PATH / "page_store.json"
 INVERTED_INDEX_FILE = INDEX_PATH / "inverted_index.json"
 METADATA_INDEX_FILE = INDEX_PATH / "metadata_index.json"
 IDF_INDEX_FILE = INDEX_PATH / "idf_index.json"
+COMPACT_INDEX_FILE = INDEX_PATH / "compact_index.npz"
+BINARY_INDEX_FILE = INDEX_PATH / "index.bin"
+MANIFEST_FILE = INDEX_PATH / "manifest.json"
+LSA_VECTORS_FILE = INDEX_PATH / "lsa_vectors.npy"
+LSA_MODEL_FILE = INDEX_PATH / "lsa_model.npz"
+# touched by POST /admin/reload-index so every worker, not just the one serving the request, reloads
+RELOAD_MARKER_FILE = INDEX_PATH / "reload.marker"
+WATCHED_FILES = [
+    BINARY_INDEX_FILE, COMPACT_INDEX_FILE, PAGE_STORE_FILE, INVERTED_INDEX_FILE,
+    METADATA_INDEX_FILE, MANIFEST_FILE, LSA_VECTORS_FILE, LSA_MODEL_FILE, RELOAD_MARKER_FILE
+]
 
-with open(PAGE_STORE_FILE, 'r', encoding="utf-8") as file:
-    PAGE_STORE = json.load(file)
+def build_role_masks(metadata_index, index):
+    role_masks = {}
+    for role, page_ids in metadata_index.items():
+        mask = np.zeros(index.num_docs, dtype=bool)
+        doc_ids = [index.page_id_lookup[page_id] for page_id in page_ids if page_id in index.page_id_lookup]
+        mask[doc_ids] = True
+        role_masks[role] = mask
+    return role_masks
 
-with open(INVERTED_INDEX_FILE, "r", encoding="utf-8") as file:
-    INVERTED_INDEX = json.load(file)
+def load_json_index():
+    with open(PAGE_STORE_FILE, 'r', encoding="utf-8") as file:
+        page_store = json.load(file)
 
-with open(METADATA_INDEX_FILE, "r", encoding="utf-8") as file:
-    METADATA_INDEX = json.load(file)
+    with open(METADATA_INDEX_FILE, "r", encoding="utf-8") as file:
+        metadata_index = json.load(file)
 
-if IDF_INDEX_FILE.exists():
-    with open(IDF_INDEX_FILE, "r", encoding="utf-8") as f:
-        IDF_INDEX = json.load(f)
-else:
-    IDF_INDEX = None
+    if COMPACT_INDEX_FILE.exists():
+        index = CompactIndex.load(COMPACT_INDEX_FILE)
+    else:
+        # Older index builds only ship JSON postings; convert them once at load time
+        logger.warning("Compact index not found. Converting JSON postings in memory.")
+        with open(INVERTED_INDEX_FILE, "r", encoding="utf-8") as file:
+            inverted_index = json.load(file)
+
+        idf_index = None
+        if IDF_INDEX_FILE.exists():
+            with open(IDF_INDEX_FILE, "r", encoding="utf-8") as f:
+                idf_index = json.load(f)
+
+        index = CompactIndex.from_inverted_index(page_store.keys(), inverted_index, idf_index)
+
+    def get_page(doc_id):
+        return page_store.get(index.page_ids[doc_id])
+
+    return index, build_role_masks(metadata_index, index), get_page
+
+def load_dense_index(index):
+    if not (LSA_VECTORS_FILE.exists() and LSA_MODEL_FILE.exists()):
+        return None
+    dense_index = DenseIndex.load(LSA_VECTORS_FILE, LSA_MODEL_FILE)
+    if dense_index.num_terms != index.num_terms or len(dense_index.vectors) != index.num_docs:
+        logger.warning("LSA vectors do not match the page index. Rebuild the index to enable hybrid retrieval.")
+        return None
+    return dense_index
+
+def index_fingerprint():
+    # changes whenever IndexBuilder rewrites page_index/; equal across workers reading the same files
+    parts = []
+    for path in WATCHED_FILES:
+        if path.exists():
+            stat = path.stat()
+            parts.append(f"{path.name}:{stat.st_mtime_ns}:{stat.st_size}")
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+def reload_marker_stamp():
+    return RELOAD_MARKER_FILE.stat().st_mtime_ns if RELOAD_MARKER_FILE.exists() else None
+
+class IndexGeneration:
+    def __init__(self, version, index, role_masks, get_page, fingerprint, dense_index=None):
+        self.version = version
+        self.index = index
+        self.dense_index = dense_index
+        self.role_masks = role_masks
+        self.get_page = get_page
+        self.fingerprint = fingerprint
+        self.reload_marker = None
+        self.loaded_at = time.time()
+        self.term_document_matrices = {}
+
+    @classmethod
+    def load(cls, version):
+        # read before the files, so a change made while loading is picked up by the next check
+        fingerprint = index_fingerprint()
+        reload_marker = reload_marker_stamp()
+        if BINARY_INDEX_FILE.exists():
+            # Sections are decoded from the mapping on demand, only for the pages a query returns
+            index = BinaryIndex(BINARY_INDEX_FILE)
+            generation = cls(version, index, index.role_masks(), index.page, fingerprint, load_dense_index(index))
+            logger.info(f"Binary page index mapped | Generation: {version} | Docs: {index.num_docs} | Terms: {index.num_terms}")
+        else:
+            index, role_masks, get_page = load_json_index()
+            generation = cls(version, index, role_masks, get_page, fingerprint, load_dense_index(index))
+            logger.info(f"JSON page index loaded | Generation: {version} | Docs: {index.num_docs} | Terms: {index.num_terms}")
+        generation.reload_marker = reload_marker
+        return generation
+
+    def describe(self):
+        return {
+            "generation": self.version,
+            "fingerprint": self.fingerprint,
+            "loaded_at": self.loaded_at,
+            "format": "binary" if isinstance(self.index, BinaryIndex) else "json",
+            "docs": self.index.num_docs,
+            "terms": self.index.num_terms,
+            "dense": self.dense_index is not None
+        }
+
+    def rbac_filter(self, user_role):
+        roles = [user_role] if isinstance(user_role, str) else user_role
+        allowed_mask = np.zeros(self.index.num_docs, dtype=bool)
+        for role in roles:
+            role_mask = self.role_masks.get(role.casefold())
+            if role_mask is not None:
+                allowed_mask |= role_mask
+        return allowed_mask
+
+    def lexical_search(self, tokens, allowed_mask):
+        page_scores = np.zeros(self.index.num_docs, dtype=np.float64)
+        # position of the first query token that matched each doc, used to keep ties in match order
+        first_match = np.full(self.index.num_docs, len(tokens), dtype=np.int32)
+
+        for position, token in enumerate(tokens):
+            postings = self.index.postings(token)
+            if postings is None:
+                continue
+            doc_ids, tfs = postings
+            allowed = allowed_mask[doc_ids]
+            doc_ids, tfs = doc_ids[allowed], tfs[allowed]
+            if not len(doc_ids):
+                continue
+
+            idf = self.index.term_idf(token)
+            if idf is not None:
+                scores = tfs * idf
+            else:
+                scores = tfs
+            # doc ids are unique within one postings list, so a fancy-indexed add is safe
+            page_scores[doc_ids] += scores
+            first_match[doc_ids] = np.minimum(first_match[doc_ids], position)
+
+        matched = np.flatnonzero(first_match < len(tokens))
+        matched = matched[np.lexsort((matched, first_match[matched]))]
+        return {self.index.page_ids[doc_id]: float(page_scores[doc_id]) for doc_id in matched.tolist()}
+
+    def top_k_search(self, tokens, allowed_mask, top_k = 5, score_threshold = 0.0):
+        query_terms = {}
+        for token in tokens:
+            if token in query_terms:
+                query_terms[token]["count"] += 1
+                continue
+            postings = self.index.postings(token)
+            if postings is None or not len(postings[0]):
+                continue
+            query_terms[token] = {
+                "count": 1,
+                "postings": postings,
+                "idf": self.index.term_idf(token),
+                "max_score": self.index.term_max_score(token)
+            }
+        if not query_terms:
+            return []
+
+        # MaxScore: visit terms with the largest upper bound first. Once the remaining terms
+        # cannot lift an unseen doc over the current k-th best score, only known candidates are
+        # scored, and candidates that cannot reach it any more are dropped.
+        ordered_terms = sorted(query_terms.values(), key=lambda term: term["count"] * term["max_score"], reverse=True)
+        remaining = sum(term["count"] * term["max_score"] for term in ordered_terms)
+        threshold = score_threshold
+        partial_scores = np.zeros(self.index.num_docs, dtype=np.float64)
+        candidates = np.zeros(self.index.num_docs, dtype=bool)
+        accept_new = True
+
+        for term in ordered_terms:
+            doc_ids, tfs = term["postings"]
+            remaining -= term["count"] * term["max_score"]
+
+            if accept_new:
+                allowed = allowed_mask[doc_ids]
+                doc_ids, tfs = doc_ids[allowed], tfs[allowed]
+                candidates[doc_ids] = True
+            else:
+                candidate_ids = np.flatnonzero(candidates)
+                if len(candidate_ids) * np.log2(len(doc_ids) + 1) < len(doc_ids):
+                    hits, positions = match_postings(doc_ids, candidate_ids)
+                    doc_ids, tfs = candidate_ids[hits], tfs[positions]
+                else:
+                    matched = candidates[doc_ids]
+                    doc_ids, tfs = doc_ids[matched], tfs[matched]
+
+            weight = term["count"] * (term["idf"] if term["idf"] is not None else 1.0)
+            partial_scores[doc_ids] += tfs * weight
+
+            candidate_ids = np.flatnonzero(candidates)
+            if len(candidate_ids) >= top_k > 0:
+                # partial scores only grow, so the k-th best partial score is a lower bound of the final one
+                kth_score = np.partition(partial_scores[candidate_ids], -top_k)[-top_k]
+                threshold = max(threshold, kth_score)
+
+            if accept_new and cannot_reach(remaining, threshold):
+                accept_new = False
+            if not accept_new:
+                upper_bounds = partial_scores[candidate_ids] + remaining
+                candidates[candidate_ids[cannot_reach(upper_bounds, threshold)]] = False
+
+        return self.rank_candidates(tokens, query_terms, np.flatnonzero(candidates), top_k, score_threshold)
+
+    def query_terms(self, tokens):
+        terms = {}
+        for token in tokens:
+            if token not in terms:
+                postings = self.index.postings(token)
+                if postings is not None and len(postings[0]):
+                    terms[token] = {"postings": postings, "idf": self.index.term_idf(token)}
+        return terms
+
+    def rank_candidates(self, tokens, query_terms, candidate_ids, top_k, score_threshold, scores=None):
+        # exact scores summed in query order like lexical_search (unless given), ties kept in first-match order
+        if not len(candidate_ids):
+            return []
+        page_scores = np.zeros(len(candidate_ids), dtype=np.float64)
+        first_match = np.full(len(candidate_ids), len(tokens), dtype=np.int32)
+        for position, token in enumerate(tokens):
+            term = query_terms.get(token)
+            if term is None:
+                continue
+            doc_ids, tfs = term["postings"]
+            hits, positions = match_postings(doc_ids, candidate_ids)
+            if term["idf"] is not None:
+                page_scores[hits] += tfs[positions] * term["idf"]
+            else:
+                page_scores[hits] += tfs[positions]
+            first_match[hits] = np.minimum(first_match[hits], position)
+        if scores is not None:
+            page_scores = scores
+
+        order = np.lexsort((candidate_ids, first_match))
+        ranked = heapq.nlargest(
+            top_k,
+            ((int(candidate_ids[i]), float(page_scores[i])) for i in order.tolist()),
+            key=lambda x: x[1]
+        )
+        return [(doc_id, score) for doc_id, score in ranked if score >= score_threshold]
+
+    def dense_search(self, tokens, allowed_mask, depth):
+        term_ids = [term_id for term_id in map(self.index.term_id, tokens) if term_id is not None]
+        query_vector = self.dense_index.encode_query(term_ids)
+        if query_vector is None:
+            return []
+        return self.dense_index.search(query_vector, allowed_mask, depth, settings.DENSE_MIN_SIMILARITY)
+
+    def term_document_matrix(self, scoring="tfidf"):
+        k1, b = settings.BM25_K1, settings.BM25_B
+        cache_key = (scoring, k1, b) if scoring == "bm25" else (scoring,)
+        if cache_key in self.term_document_matrices:
+            return self.term_document_matrices[cache_key]
+
+        matrix = self.index.term_frequency_matrix()
+        term_of_posting = np.repeat(np.arange(self.index.num_terms), self.index.doc_freqs)
+        tfs = matrix.data
+
+        if scoring == "bm25":
+            doc_freqs = self.index.doc_freqs.astype(np.float64)
+            num_docs = self.index.num_docs
+            idf = np.log(1 + (num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5))
+            doc_lengths = self.index.doc_lengths.astype(np.float64)
+            avg_length = doc_lengths.mean() if num_docs else 0.0
+            length_norms = k1 * (1 - b + b * doc_lengths / avg_length) if avg_length else np.full(num_docs, k1)
+            matrix.data = idf[term_of_posting] * tfs * (k1 + 1) / (tfs + length_norms[matrix.indices])
+        elif scoring == "tfidf":
+            if self.index.idf is not None:
+                matrix.data = tfs * self.index.idf[term_of_posting]
+        else:
+            raise ValueError(f"Unknown scoring mode: {scoring}")
+
+        self.term_document_matrices[cache_key] = matrix
+        logger.info(f"Term-document matrix built | Scoring: {scoring} | Shape: {matrix.shape} | Non-zeros: {matrix.nnz}")
+        return matrix
+
+    def query_matrix(self, token_lists):
+        rows, cols = [], []
+        for row, tokens in enumerate(token_lists):
+            for token in tokens:
+                term_id = self.index.term_id(token)
+                if term_id is not None:
+                    rows.append(row)
+                    cols.append(term_id)
+        # duplicate (row, col) entries are summed, so a repeated token counts twice like in lexical_search
+        return sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)),
+            shape=(len(token_lists), self.index.num_terms)
+        )
+
+    def term_weight(self, term):
+        if self.index.term_id(term) is None:
+            return 0.0
+        idf = self.index.term_idf(term)
+        return 1.0 if idf is None else idf
+
+    def build_contexts(self, ranked_docs):
+        contexts = []
+        for doc_id, score in ranked_docs:
+            page_data = self.get_page(doc_id)
+            if page_data:
+                contexts.append({
+                    "page_id": self.index.page_ids[doc_id],
+                    "score": score,
+                    "title": page_data.get("title"),
+                    "content": page_data.get("content"),
+                    "token_count": page_data.get("token_count"),
+                    "passages": page_data.get("passages")
+                })
+        return contexts
+
+# Readers grab the current generation once per query, so a swap never affects a query in flight;
+# the old generation is released once its last reader finishes.
+CURRENT_GENERATION = IndexGeneration.load(1)
+RELOAD_LOCK = threading.Lock()
+metrics.set_gauge("index.generation", CURRENT_GENERATION.version)
+metrics.set_gauge("index.docs", CURRENT_GENERATION.index.num_docs)
+
+def current_generation():
+    return CURRENT_GENERATION
+
+def reload_index():
+    global CURRENT_GENERATION
+    with RELOAD_LOCK:
+        previous = CURRENT_GENERATION
+        start_time = time.time()
+        try:
+            generation = IndexGeneration.load(previous.version + 1)
+        except Exception as e:
+            metrics.incr("index.reload_failures")
+            logger.error(f"Index reload failed, keeping generation {previous.version} | Error: {str(e)}")
+            raise
+
+        CURRENT_GENERATION = generation
+        load_time = time.time() - start_time
+
+    # entries are keyed by fingerprint too; clearing just frees what the old generation can no longer hit
+    RETRIEVAL_CACHE.clear()
+
+    metrics.incr("index.reloads")
+    metrics.observe("index.reload_seconds", load_time)
+    metrics.set_gauge("index.generation", generation.version)
+    metrics.set_gauge("index.docs", generation.index.num_docs)
+    logger.info(
+        f"Index generation swapped | {previous.version} -> {generation.version} | "
+        f"Docs: {previous.index.num_docs} -> {generation.index.num_docs} | Load Time: {round(load_time, 2)}s"
+    )
+    return generation
+
+def broadcast_reload():
+    # the marker is touched before reloading here, so this worker's generation already includes it
+    try:
+        RELOAD_MARKER_FILE.write_text(str(time.time()))
+    except OSError as e:
+        logger.warning(f"Could not touch the reload marker, only this worker reloads | Error: {str(e)}")
+    return reload_index()
+
+def watch_index(stop_event, interval, follow_files=True):
+    # follow_files: reload once page_index/ changed and then stayed unchanged for a full interval (build finished).
+    # Otherwise only follow the reload marker, so a reload requested on another worker reaches this one.
+    pending = None
+    failed = None
+    while not stop_event.wait(interval):
+        current = None
+        try:
+            seen = CURRENT_GENERATION.fingerprint if follow_files else CURRENT_GENERATION.reload_marker
+            current = index_fingerprint() if follow_files else reload_marker_stamp()
+            if current in (seen, failed):
+                pending = None
+                continue
+            if follow_files and current != pending:
+                pending = current
+                continue
+            logger.info("Index change detected on disk. Reloading...")
+            reload_index()
+            pending = None
+        except Exception as e:
+            logger.error(f"Index watcher error: {str(e)}")
+            # a failed reload is not retried until the files change again; a failed check just runs again
+            if current is not None:
+                failed = current
+
+def start_index_watcher(interval, follow_files=True):
+    stop_event = threading.Event()
+    thread = threading.Thread(
+        target=watch_index, args=(stop_event, interval, follow_files), name="index-watcher", daemon=True
+    )
+    thread.start()
+    logger.info(f"Index watcher started | Interval: {interval}s | Follows: {'page_index/' if follow_files else 'reload marker'}")
+    return stop_event
 
 STOP_WORDS = {
     "the", "is", "a", "an", "in", "on", "at", "for",
@@ -39,63 +429,165 @@ def tokenize_query(query: str):
     tokens = [t for t in tokens if t not in STOP_WORDS and len(t) > 2]
     return tokens
 
-def rbac_filter(user_role: str):
-    user_role = user_role.casefold()
-    return set(METADATA_INDEX.get(user_role, []))
-
-def lexical_search(tokens, allowed_pages):
-    page_scores = defaultdict(float)
-    for token in tokens:
-        if token not in INVERTED_INDEX:
-            continue
-        postings = INVERTED_INDEX[token]
-        for entry in postings:
-            page_id = entry["page_id"]
-            tf = entry["tf"]
-            if page_id not in allowed_pages:
-                continue
-            if IDF_INDEX:
-                idf = IDF_INDEX.get(token, 1.0)
-                score = tf * idf
-            else:
-                score = tf
-            page_scores[page_id] += score
-    return page_scores
-
 def rank_pages(page_score, top_k = 5):
-    ranked = sorted(page_score.items(), key = lambda x : x[1], reverse=True)
-    return ranked[:top_k]
+    return heapq.nlargest(top_k, page_score.items(), key = lambda x : x[1])
+
+# relative slack on pruning decisions, since partial sums are accumulated in a different order
+PRUNE_TOLERANCE = 1e-9
+
+def cannot_reach(upper_bound, threshold):
+    return upper_bound < threshold * (1 - PRUNE_TOLERANCE)
+
+def match_postings(doc_ids, candidate_ids):
+    # binary search the candidates in the sorted postings instead of scanning the whole list
+    positions = np.searchsorted(doc_ids, candidate_ids)
+    positions = np.minimum(positions, len(doc_ids) - 1)
+    hits = doc_ids[positions] == candidate_ids
+    return hits, positions[hits]
+
+def retrieve_many(queries, user_role, top_k: int = 5, score_threshold: float = 0.5, scoring: str = "tfidf"):
+    logger.info(f"Running batched lexical retrieval | Queries: {len(queries)} | Scoring: {scoring}")
+    generation = current_generation()
+
+    allowed_mask = generation.rbac_filter(user_role)
+    if not allowed_mask.any():
+        logger.warning("No pages allowed for this role")
+        return [[] for _ in queries]
+
+    token_lists = [tokenize_query(query) for query in queries]
+    matrix = generation.term_document_matrix(scoring)
+    scores = (generation.query_matrix(token_lists) @ matrix).tocsr()
+
+    results = []
+    for row, tokens in enumerate(token_lists):
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        doc_ids, row_scores = scores.indices[start:end], scores.data[start:end]
+        # the matrix sums terms in a different order, so cut-offs leave slack for the exact rescoring below
+        keep = allowed_mask[doc_ids] & ~cannot_reach(row_scores, score_threshold)
+        doc_ids, row_scores = doc_ids[keep], row_scores[keep]
+        if len(row_scores) > top_k > 0:
+            kth_score = np.partition(row_scores, -top_k)[-top_k]
+            keep = ~cannot_reach(row_scores, kth_score)
+            doc_ids, row_scores = doc_ids[keep], row_scores[keep]
+
+        # same scores and tie order as retrieve(); BM25 keeps the matrix scores
+        order = np.argsort(doc_ids)
+        ranked_docs = generation.rank_candidates(
+            tokens, generation.query_terms(tokens), doc_ids[order], top_k, score_threshold,
+            scores=row_scores[order] if scoring == "bm25" else None
+        )
+        results.append(generation.build_contexts(ranked_docs))
+
+    return results
+
+RETRIEVAL_CACHE = TTLCache("retrieval", settings.RETRIEVAL_CACHE_SIZE, settings.RETRIEVAL_CACHE_TTL)
+
+def retrieval_cache_key(generation, tokens, user_role, top_k, score_threshold):
+    roles = [user_role] if isinstance(user_role, str) else user_role
+    # tokens are kept as a sorted multiset since a repeated token changes the scores
+    return (
+        generation.fingerprint,
+        settings.HYBRID_RETRIEVAL,
+        tuple(sorted(tokens)),
+        tuple(sorted(role.casefold() for role in roles)),
+        top_k,
+        score_threshold
+    )
+
+def shared_cache_key(key):
+    digest = hashlib.sha256(json.dumps(key[1:]).encode("utf-8")).hexdigest()
+    return f"retrieval:{key[0]}:{digest}"
+
+def get_cached_contexts(key):
+    contexts = RETRIEVAL_CACHE.get(key)
+    if contexts is not None or not settings.RETRIEVAL_CACHE_REDIS:
+        return contexts
+
+    from app.core.cache import redis_client
+    try:
+        cached = redis_client.get(shared_cache_key(key))
+    except Exception as e:
+        logger.warning(f"Shared retrieval cache unavailable: {str(e)}")
+        return None
+    if cached is None:
+        metrics.incr("cache.retrieval_shared.misses")
+        return None
+    metrics.incr("cache.retrieval_shared.hits")
+    contexts = json.loads(cached)
+    RETRIEVAL_CACHE.set(key, contexts)
+    return contexts
+
+def set_cached_contexts(key, contexts):
+    RETRIEVAL_CACHE.set(key, contexts)
+    if not settings.RETRIEVAL_CACHE_REDIS:
+        return
+
+    from app.core.cache import redis_client
+    try:
+        redis_client.set(shared_cache_key(key), json.dumps(contexts), ex=settings.RETRIEVAL_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Shared retrieval cache unavailable: {str(e)}")
 
 def retrieve(query: str, user_role: str, top_k: int = 5,score_threshold: float = 0.5):
     logger.info("Running lexical retrieval")
+    generation = current_generation()
 
     tokens = tokenize_query(query)
     if not tokens:
         logger.warning("No valid tokens found in query")
         return []
-    
-    allowed_pages = rbac_filter(user_role)
-    if not allowed_pages:
+
+    cache_key = retrieval_cache_key(generation, tokens, user_role, top_k, score_threshold)
+    contexts = get_cached_contexts(cache_key)
+    if contexts is not None:
+        logger.info("Retrieval cache hit")
+        return [dict(ctx) for ctx in contexts]
+
+    contexts = search(generation, tokens, user_role, top_k, score_threshold)
+    set_cached_contexts(cache_key, contexts)
+    return [dict(ctx) for ctx in contexts]
+
+def reciprocal_rank_fusion(rankings, k):
+    fused = {}
+    for ranking in rankings:
+        for rank, (doc_id, _) in enumerate(ranking, 1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    # sorted() is stable, so ties keep the lexical-first insertion order
+    return sorted(fused.items(), key=lambda x: x[1], reverse=True)
+
+def search(generation, tokens, user_role, top_k, score_threshold):
+    allowed_mask = generation.rbac_filter(user_role)
+    if not allowed_mask.any():
         logger.warning("No pages allowed for this role")
         return []
+
+    if settings.HYBRID_RETRIEVAL and generation.dense_index is not None:
+        return hybrid_search(generation, tokens, allowed_mask, top_k, score_threshold)
     
-    page_scores = lexical_search(tokens, allowed_pages)
-    if not page_scores:
+    ranked_docs = generation.top_k_search(tokens, allowed_mask, top_k, score_threshold)
+    if not ranked_docs:
         logger.info("No lexical matches found")
         return []
 
-    ranked_pages = rank_pages(page_scores, top_k)
-    filtered_pages = [(page_id, score) for page_id, score in ranked_pages if score >= score_threshold]
-    contexts = []
-
-    for page_id, score in filtered_pages:
-        page_data = PAGE_STORE.get(page_id)
-        if page_data:
-            contexts.append({
-                "page_id": page_id,
-                "score": score,
-                "title": page_data.get("title"),
-                "content": page_data.get("content")
-            })
-    
-    return contexts
\ No newline at end of file
+    return generation.build_contexts(ranked_docs)
+
+def hybrid_search(generation, tokens, allowed_mask, top_k, score_threshold):
+    depth = max(top_k, settings.HYBRID_CANDIDATES)
+    lexical_docs = generation.top_k_search(tokens, allowed_mask, depth, score_threshold)
+
+    start_time = time.perf_counter()
+    dense_docs = generation.dense_search(tokens, allowed_mask, depth)
+    dense_time = time.perf_counter() - start_time
+
+    metrics.observe("retrieval.dense_seconds", dense_time)
+    if dense_time * 1000 > settings.DENSE_BUDGET_MS:
+        metrics.incr("retrieval.dense_over_budget")
+        logger.warning(f"Dense retrieval over budget | {round(dense_time * 1000, 2)}ms > {settings.DENSE_BUDGET_MS}ms")
+
+    ranked_docs = reciprocal_rank_fusion([lexical_docs, dense_docs], settings.RRF_K)[:top_k]
+    if not ranked_docs:
+        logger.info("No hybrid matches found")
+        return []
+
+    logger.info(f"Hybrid retrieval | Lexical: {len(lexical_docs)} | Dense: {len(dense_docs)} | Dense Time: {round(dense_time * 1000, 2)}ms")
+    return generation.build_contexts(ranked_docs)
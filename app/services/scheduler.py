@@ -0,0 +1,143 @@
+# LLM request scheduler :- caps concurrent generations, queues the rest by priority with a deadline,
+# and rejects early (429 queue full / 503 deadline passed) so a burst does not time out every user together
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import metrics
+
+# lower runs first
+PRIORITY_HIGH = 0
+PRIORITY_INTERACTIVE = 1
+PRIORITY_BATCH = 2
+
+class SchedulerRejected(Exception):
+    def __init__(self, status_code, detail, retry_after):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+class Ticket:
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.start_time = time.perf_counter()
+        self.released = False
+
+    def release(self):
+        # safe to call from both the stream's finally and the response background task
+        if not self.released:
+            self.released = True
+            self.scheduler.release(time.perf_counter() - self.start_time)
+
+class Scheduler:
+    def __init__(self, name, limit, queue_size, queue_timeout):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.queued = 0
+        self.waiters = []
+        self.sequence = itertools.count()
+        # smoothed time a request holds its slot, used for Retry-After
+        self.service_time = 10.0
+
+    def retry_after(self):
+        limit = max(self.limit, 1)
+        return max(1, math.ceil(self.service_time * (self.queued + 1) / limit))
+
+    def update_gauges(self):
+        metrics.set_gauge(f"scheduler.{self.name}.active", self.active)
+        metrics.set_gauge(f"scheduler.{self.name}.queued", self.queued)
+
+    def reject(self, status_code, reason, detail):
+        metrics.incr(f"scheduler.{self.name}.rejected.{reason}")
+        return SchedulerRejected(status_code, detail, self.retry_after())
+
+    def shed_lowest(self, priority):
+        # a full queue makes room for more urgent work by dropping its least urgent waiter
+        live = [entry for entry in self.waiters if not entry[2].done()]
+        if not live:
+            return False
+        lowest = max(live, key=lambda entry: (entry[0], entry[1]))
+        if lowest[0] <= priority:
+            return False
+        lowest[2].set_exception(self.reject(429, "shed", "Server busy, request displaced by higher priority work"))
+        self.queued -= 1
+        return True
+
+    async def acquire(self, priority=PRIORITY_INTERACTIVE):
+        if self.limit <= 0:
+            return Ticket(self)
+
+        metrics.incr(f"scheduler.{self.name}.requests")
+        if self.active < self.limit and self.queued == 0:
+            self.active += 1
+            self.update_gauges()
+            metrics.observe(f"scheduler.{self.name}.wait", 0.0)
+            return Ticket(self)
+
+        if self.queued >= self.queue_size and not self.shed_lowest(priority):
+            logger.warning(f"Scheduler queue full | Queue: {self.name} | Active: {self.active} | Queued: {self.queued}")
+            raise self.reject(429, "queue_full", "Server busy, try again later")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.sequence), future))
+        self.queued += 1
+        self.update_gauges()
+        start_time = time.perf_counter()
+
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.queued -= 1
+            self.update_gauges()
+            logger.warning(f"Scheduler deadline passed | Queue: {self.name} | Waited: {time.perf_counter() - start_time:.2f}s")
+            raise self.reject(503, "deadline", "Server busy, request waited too long")
+        except asyncio.CancelledError:
+            # client disconnected while queued; pass on a slot that was already handed over
+            if future.cancelled():
+                self.queued -= 1
+            elif future.exception() is None:
+                self.release(0.0, track=False)
+            self.update_gauges()
+            raise
+        finally:
+            wait_time = time.perf_counter() - start_time
+            metrics.observe(f"scheduler.{self.name}.wait", wait_time)
+            metrics.observe(f"scheduler.{self.name}.wait.priority_{priority}", wait_time)
+
+        return Ticket(self)
+
+    def release(self, held_for, track=True):
+        if self.limit <= 0:
+            return
+        if track:
+            self.service_time = 0.9 * self.service_time + 0.1 * held_for
+        self.active -= 1
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if future.done():
+                # timed out, cancelled or shed while waiting
+                continue
+            future.set_result(True)
+            self.queued -= 1
+            self.active += 1
+            break
+        self.update_gauges()
+
+def request_priority(role, batch=False):
+    if batch:
+        return PRIORITY_BATCH
+    high_roles = {r.strip().casefold() for r in settings.LLM_PRIORITY_ROLES.split(",") if r.strip()}
+    return PRIORITY_HIGH if str(role).casefold() in high_roles else PRIORITY_INTERACTIVE
+
+LLM_SCHEDULER = Scheduler("llm", settings.LLM_CONCURRENCY, settings.LLM_QUEUE_SIZE, settings.LLM_QUEUE_TIMEOUT)
+# small talk runs on its own, smaller budget so it never takes slots from real questions
+SMALLTALK_SCHEDULER = Scheduler("smalltalk", settings.SMALL_MODEL_CONCURRENCY, settings.LLM_QUEUE_SIZE, settings.LLM_QUEUE_TIMEOUT)
+# bcrypt runs on its own few workers, so a login storm queues here instead of taking the request threadpool
+PASSWORD_SCHEDULER = Scheduler("password", settings.PASSWORD_WORKERS, settings.PASSWORD_QUEUE_SIZE, settings.PASSWORD_QUEUE_TIMEOUT)
@@ -1,29 +1,70 @@
-import json
+import asyncio
+import httpx
 import requests
 from app.core.config import settings
 from app.core.logger import logger
+from app.services.ollama_pool import get_pool
+
+GENERATION_ERROR = "Error generating response."
+
+# keep-alive connections to Ollama, shared by every request in the worker
+OLLAMA_SESSION = requests.Session()
+OLLAMA_CLIENT = None
+
+def ollama_payload(prompt: str, stream: bool, options=None, context=None, model=None):
+    payload = {
+        "model": model or settings.OLLAMA_MODEL,
+        "prompt": prompt,
+        "stream": stream,
+        "options": {
+            "num_ctx": settings.OLLAMA_NUM_CTX,
+            **(options or {})
+        }
+    }
+    # token state returned by the previous turn; Ollama continues from it instead of re-reading the history
+    if context:
+        payload["context"] = context
+    return payload
+
+def get_ollama_client():
+    global OLLAMA_CLIENT
+    # created on first use so it binds to the server's event loop
+    if OLLAMA_CLIENT is None:
+        OLLAMA_CLIENT = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OLLAMA_MAX_CONNECTIONS
+            ),
+            timeout=httpx.Timeout(settings.OLLAMA_TIMEOUT, connect=5.0)
+        )
+    return OLLAMA_CLIENT
+
+async def close_ollama_client():
+    global OLLAMA_CLIENT
+    if OLLAMA_CLIENT is not None:
+        await OLLAMA_CLIENT.aclose()
+        OLLAMA_CLIENT = None
 
 def stream_ollama(prompt: str):
     try:
-        response = requests.post(
-            settings.OLLAMA_URL,
-            json={
-                "model": settings.OLLAMA_MODEL,
-                "prompt": prompt,
-                "stream": True,
-                "options": {
-                    "num_ctx": 8192
-                }
-            },
-            stream=True,
-            timeout=120
-        )
+        yield from get_pool().stream(OLLAMA_SESSION, ollama_payload(prompt, True))
+
+    except Exception as e:
+        logger.error(f"Streaming error: {str(e)}")
+        yield GENERATION_ERROR
 
-        for line in response.iter_lines():
-            if line:
-                data = json.loads(line.decode("utf-8"))
-                yield data.get("response", "")
+async def astream_ollama(prompt: str, context=None, preferred_backend=None, on_done=None, model=None):
+    try:
+        payload = ollama_payload(prompt, True, context=context, model=model)
+        async for chunk in get_pool().astream(get_ollama_client(), payload, preferred_backend, on_done):
+            yield chunk
 
+    except asyncio.CancelledError:
+        # client went away; closing the stream hands the connection back to the pool
+        raise
     except Exception as e:
         logger.error(f"Streaming error: {str(e)}")
-        yield "Error generating response."
\ No newline at end of file
+        yield GENERATION_ERROR
+
+def generate_ollama(prompt: str, options=None):
+    return get_pool().generate(OLLAMA_SESSION, ollama_payload(prompt, False, options))
@@ -0,0 +1,143 @@
+# Rolling conversation summary :- older turns are folded into a cached summary by a background worker,
+# prompts get the summary plus the last few raw turns under a token budget
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.core.cache import get_message_window, get_summary, set_summary, try_lock, unlock
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.services.context_packer import count_tokens, truncate_to_tokens
+from app.services.scheduler import LLM_SCHEDULER, PRIORITY_BATCH, SchedulerRejected
+from app.services.streaming import generate_ollama
+
+# "role: " prefix and newline added by build_prompt
+MESSAGE_OVERHEAD_TOKENS = 4
+# a worker holding the lock longer than this is assumed dead
+SUMMARY_LOCK_TTL = 300
+
+SUMMARY_EXECUTOR = ThreadPoolExecutor(max_workers=settings.SUMMARY_WORKERS, thread_name_prefix="summarizer")
+PENDING = set()
+PENDING_LOCK = threading.Lock()
+
+def raw_window_size():
+    return settings.HISTORY_RAW_TURNS * 2
+
+def fit_history(summary, messages, token_budget=None):
+    token_budget = settings.HISTORY_TOKEN_BUDGET if token_budget is None else token_budget
+    summary_tokens = count_tokens(summary)
+    if summary_tokens > token_budget // 2:
+        summary = truncate_to_tokens(summary, token_budget // 2)
+        summary_tokens = count_tokens(summary)
+
+    kept, used = [], summary_tokens
+    # newest turns first; the latest message is always kept, cut down if needed
+    for msg in reversed(messages):
+        cost = count_tokens(msg["content"]) + MESSAGE_OVERHEAD_TOKENS
+        remaining = token_budget - used
+        if cost > remaining:
+            if kept or remaining <= MESSAGE_OVERHEAD_TOKENS:
+                break
+            msg = {**msg, "content": truncate_to_tokens(msg["content"], remaining - MESSAGE_OVERHEAD_TOKENS)}
+            cost = remaining
+        kept.append(msg)
+        used += cost
+
+    return summary, kept[::-1], used
+
+def history_context(username, conversation_id):
+    summary, covered = get_summary(username, conversation_id)
+    first_index, messages = get_message_window(username, conversation_id)
+    # turns already folded into the summary are not repeated
+    unsummarized = messages[max(0, covered - first_index):]
+    summary, recent, history_tokens = fit_history(summary, unsummarized[-raw_window_size():])
+    metrics.incr("prompt.history_tokens", history_tokens)
+    return summary, recent
+
+def build_summary_prompt(summary, messages):
+    conversation = "".join(f"{msg['role']}: {msg['content']}\n" for msg in messages)
+    return f"""
+    Update the running summary of a conversation between a user and the company assistant.
+    Keep the facts, names, numbers and open questions the assistant may need later. Be concise.
+
+    Current Summary:
+    {summary or "(empty)"}
+
+    New Messages:
+    {conversation}
+
+    Updated Summary:
+    """
+
+def acquire_llm_slot(loop):
+    # summaries share the generation slots with /chat and queue behind every interactive request;
+    # the scheduler lives on the event loop, so the worker thread waits on it from outside
+    if loop is None:
+        return None
+    return asyncio.run_coroutine_threadsafe(LLM_SCHEDULER.acquire(PRIORITY_BATCH), loop).result()
+
+def summarize_conversation(username, conversation_id, loop=None):
+    lock_name = f"chat:{username}:{conversation_id}:summary"
+    # one summary job per conversation across API workers
+    if not try_lock(lock_name, SUMMARY_LOCK_TTL):
+        return
+    try:
+        summary, covered = get_summary(username, conversation_id)
+        first_index, messages = get_message_window(username, conversation_id)
+
+        end = first_index + len(messages) - raw_window_size()
+        start = max(covered, first_index)
+        if covered < first_index:
+            logger.warning(f"Summary fell behind MAX_HISTORY | Conv: {conversation_id} | Lost Messages: {first_index - covered}")
+            metrics.incr("summary.lost_messages", first_index - covered)
+        if end - start < 2:
+            return
+
+        older = messages[start - first_index:end - first_index]
+        try:
+            ticket = acquire_llm_slot(loop)
+        except SchedulerRejected as e:
+            # the turns stay unsummarized and are picked up by the next job
+            metrics.incr("summary.deferred")
+            logger.info(f"Summary deferred | Conv: {conversation_id} | Status: {e.status_code}")
+            return
+        try:
+            with metrics.timer("summary.generate"):
+                new_summary = generate_ollama(
+                    build_summary_prompt(summary, older),
+                    {"num_predict": settings.SUMMARY_MAX_TOKENS}
+                ).strip()
+        finally:
+            if ticket is not None:
+                loop.call_soon_threadsafe(ticket.release)
+        if not new_summary:
+            return
+
+        set_summary(username, conversation_id, new_summary, end)
+        metrics.incr("summary.updates")
+        logger.info(f"Summary updated | Conv: {conversation_id} | Covered: {end} | Tokens: {count_tokens(new_summary)}")
+    finally:
+        unlock(lock_name)
+
+def run_summary(username, conversation_id, loop=None):
+    try:
+        summarize_conversation(username, conversation_id, loop)
+    except Exception as e:
+        metrics.incr("summary.errors")
+        logger.error(f"Summary failed | Conv: {conversation_id} | Error: {str(e)}")
+    finally:
+        with PENDING_LOCK:
+            PENDING.discard((username, conversation_id))
+
+def schedule_summary(username, conversation_id):
+    with PENDING_LOCK:
+        if (username, conversation_id) in PENDING:
+            return
+        PENDING.add((username, conversation_id))
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # called outside the server (scripts, tests): no scheduler to share
+        loop = None
+    metrics.incr("summary.jobs")
+    SUMMARY_EXECUTOR.submit(run_summary, username, conversation_id, loop)
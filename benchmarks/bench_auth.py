@@ -0,0 +1,58 @@
+# Auth overhead per request :- get_current_user with full JWT verification on every call vs the verified
+# claims cache, with and without a populated in-process deny-list.
+#
+# Usage: python -m benchmarks.bench_auth --requests 20000
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import logging
+from app.core import security
+from app.core.logger import logger
+from app.core.metrics import percentile
+from app.api.dependencies import get_current_user
+
+def measure(tokens, requests):
+    timings = []
+    for i in range(requests):
+        token = tokens[i % len(tokens)]
+        start = time.perf_counter()
+        get_current_user(token)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=100, help="distinct tokens in use")
+    parser.add_argument("--revoked", type=int, default=50000, help="deny-list entries for the last run")
+    args = parser.parse_args()
+
+    # the benchmark measures verification, not logging
+    logger.setLevel(logging.WARNING)
+    tokens = [security.create_access_tokens({"sub": f"user{i}", "role": "employee"}) for i in range(args.users)]
+
+    runs = []
+    security.TOKEN_CACHE.max_entries = 0
+    runs.append(("verify every request", measure(tokens, args.requests)))
+
+    security.TOKEN_CACHE.max_entries = 10000
+    security.TOKEN_CACHE.clear()
+    runs.append(("claims cache", measure(tokens, args.requests)))
+
+    expires_at = time.time() + 3600
+    for i in range(args.revoked):
+        security.REVOKED_TOKENS.add(security.token_hash(f"revoked-{i}"), expires_at)
+    runs.append((f"cache + {args.revoked} revoked", measure(tokens, args.requests)))
+
+    print(f"{'mode':<28} {'p50 us':>8} {'p99 us':>8} {'mean us':>8}")
+    for name, timings in runs:
+        mean = sum(timings) / len(timings)
+        print(f"{name:<28} {percentile(timings, 0.5) * 1e6:>8.1f} {percentile(timings, 0.99) * 1e6:>8.1f} {mean * 1e6:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Single-flight coalescing :- upstream generations and latency for a burst of identical questions
+#
+# Usage: python -m benchmarks.bench_coalescing --streams 50 --distinct 3
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services import streaming
+from app.services.ollama_pool import reset_pool
+from app.services.coalescer import Coalescer, generation_key
+from benchmarks.fake_ollama import start_process, reset_stats
+
+async def run_burst(streams, distinct, arrival_gap, coalesce):
+    coalescer = Coalescer()
+
+    async def one(i):
+        await asyncio.sleep(i * arrival_gap)
+        prompt = f"What is the leave policy? (variant {i % distinct})"
+        key = generation_key(prompt) if coalesce else None
+        start = time.perf_counter()
+        answer = "".join([chunk async for chunk in coalescer.subscribe(key, lambda: streaming.astream_ollama(prompt))])
+        return time.perf_counter() - start, answer
+
+    try:
+        return await asyncio.gather(*(one(i) for i in range(streams)))
+    finally:
+        await streaming.close_ollama_client()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--streams", type=int, default=50)
+    parser.add_argument("--distinct", type=int, default=3, help="distinct prompts in the burst")
+    parser.add_argument("--parallel", type=int, default=4, help="generations the fake backend runs at once")
+    parser.add_argument("--tokens", type=int, default=30)
+    parser.add_argument("--delay", type=float, default=0.02)
+    parser.add_argument("--arrival-gap", type=float, default=0.01)
+    parser.add_argument("--port", type=int, default=11470)
+    args = parser.parse_args()
+
+    server = start_process(args.port, tokens=args.tokens, delay=args.delay, parallel=args.parallel)
+    reset_pool([f"http://127.0.0.1:{args.port}/api/generate"])
+    try:
+        print(f"{args.streams} requests, {args.distinct} distinct prompts, backend runs {args.parallel} at once")
+        print(f"{'mode':<12} {'upstream':>9} {'p50 s':>7} {'max s':>7}  complete answers")
+        for name, coalesce in (("separate", False), ("coalesced", True)):
+            reset_stats(args.port)
+            results = asyncio.run(run_burst(args.streams, args.distinct, args.arrival_gap, coalesce))
+            upstream = reset_stats(args.port)["requests"]
+            latencies = sorted(latency for latency, _ in results)
+            complete = all(answer.count("token") == args.tokens for _, answer in results)
+            print(f"{name:<12} {upstream:>9} {latencies[len(latencies) // 2]:>7.2f} {latencies[-1]:>7.2f}  {complete}")
+    finally:
+        server.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# Conversation context reuse :- prompt tokens evaluated and time to first token per turn, resending the
+# history every turn vs continuing from the stored Ollama context. Drives /chat in-process with fakeredis
+# (pip install fakeredis) against the fake Ollama server.
+#
+# Usage: python -m benchmarks.bench_context_reuse --turns 8
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fakeredis
+import httpx
+from app.core import cache
+from app.core.config import settings
+from app.core.history_store import RedisHistoryStore
+from app.core.security import create_access_tokens
+from app.services import answer_cache, streaming
+from app.services.ollama_pool import reset_pool
+from benchmarks.fake_ollama import start_process, reset_stats
+
+QUESTIONS = [
+    "What is the leave policy?",
+    "How many sick days do I get?",
+    "Do unused casual leaves carry over?",
+    "What is the maternity leave entitlement?",
+    "How do I apply for leave?",
+    "What are the working hours?",
+    "How are travel expenses reimbursed?",
+    "What happens during the notice period?",
+    "How often are performance reviews held?",
+    "What is the work from home policy?",
+]
+
+async def run_conversation(app, turns, port, user):
+    results = []
+    token = create_access_tokens({"sub": user, "role": "employee"})
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for turn in range(turns):
+            reset_stats(port)
+            start = time.perf_counter()
+            first_token = None
+            payload = {"query": QUESTIONS[turn % len(QUESTIONS)], "conversation_id": "bench"}
+            headers = {"Authorization": f"Bearer {token}"}
+            async with client.stream("POST", "/chat", json=payload, headers=headers) as response:
+                async for _ in response.aiter_text():
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+            results.append((first_token, reset_stats(port)["prompt_eval_tokens"]))
+    # the pooled client belongs to this event loop
+    await streaming.close_ollama_client()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--tokens", type=int, default=120, help="tokens per answer")
+    parser.add_argument("--prompt-eval-delay", type=float, default=0.0005, help="seconds per prompt token")
+    parser.add_argument("--port", type=int, default=11480)
+    args = parser.parse_args()
+
+    redis_server = fakeredis.FakeServer()
+    cache.set_history_store(RedisHistoryStore(
+        fakeredis.FakeRedis(server=redis_server),
+        lambda: fakeredis.FakeAsyncRedis(server=redis_server),
+        cache.redis_call
+    ))
+    # every turn should reach the model
+    answer_cache.ANSWER_CACHE.max_entries = 0
+    settings.OLLAMA_HEALTH_INTERVAL = 0
+
+    import main as api
+
+    server = start_process(args.port, tokens=args.tokens, delay=0.001, prompt_eval_delay=args.prompt_eval_delay)
+    reset_pool([f"http://127.0.0.1:{args.port}/api/generate"])
+    try:
+        runs = {}
+        for mode, enabled in (("full history", False), ("context reuse", True)):
+            settings.CONVERSATION_CONTEXT = enabled
+            runs[mode] = asyncio.run(run_conversation(api.app, args.turns, args.port, f"bench_{enabled}"))
+
+        print(f"{'turn':>4} {'history tokens':>15} {'history ttft ms':>16} {'reuse tokens':>13} {'reuse ttft ms':>14}")
+        for turn, (full, reuse) in enumerate(zip(runs["full history"], runs["context reuse"]), 1):
+            print(f"{turn:>4} {full[1]:>15} {full[0] * 1000:>16.0f} {reuse[1]:>13} {reuse[0] * 1000:>14.0f}")
+        full_tokens = sum(tokens for _, tokens in runs["full history"][1:])
+        reuse_tokens = sum(tokens for _, tokens in runs["context reuse"][1:])
+        print(f"Follow-up prompt tokens evaluated: {full_tokens} -> {reuse_tokens} "
+              f"({full_tokens / max(reuse_tokens, 1):.1f}x fewer)")
+    finally:
+        server.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Dense LSA search latency :- brute-force role-filtered cosine search vs DENSE_BUDGET_MS
+#
+# Usage: python -m benchmarks.bench_dense --docs 10000 100000 300000 --dims 128
+import sys
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings
+from app.services.dense_index import DenseIndex, normalize_rows
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, nargs="+", default=[10_000, 100_000, 300_000])
+    parser.add_argument("--dims", type=int, default=settings.LSA_DIM)
+    parser.add_argument("--terms", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--role-share", type=float, default=0.3, help="share of docs visible to the role")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    components = rng.standard_normal((args.dims, args.terms)).astype(np.float32)
+    idf = rng.uniform(1, 8, args.terms).astype(np.float32)
+
+    print(f"Budget: {settings.DENSE_BUDGET_MS}ms | dims: {args.dims} | depth: {settings.HYBRID_CANDIDATES}")
+    print(f"{'docs':>9} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}  within budget")
+    for num_docs in args.docs:
+        vectors = normalize_rows(rng.standard_normal((num_docs, args.dims))).astype(np.float32)
+        dense_index = DenseIndex(vectors, idf, components)
+        allowed_mask = rng.random(num_docs) < args.role_share
+
+        timings = []
+        for _ in range(args.queries):
+            term_ids = rng.integers(0, args.terms, 4).tolist()
+            start = time.perf_counter()
+            query_vector = dense_index.encode_query(term_ids)
+            dense_index.search(query_vector, allowed_mask, settings.HYBRID_CANDIDATES, -1.0)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+        p50, p95 = timings[len(timings) // 2], timings[int(len(timings) * 0.95)]
+        print(f"{num_docs:>9} {p50:>8.2f} {p95:>8.2f} {timings[-1]:>8.2f}  {p95 <= settings.DENSE_BUDGET_MS}")
+
+if __name__ == "__main__":
+    main()
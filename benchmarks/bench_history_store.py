@@ -0,0 +1,85 @@
+# History storage :- stored bytes per conversation (JSON text vs msgpack vs msgpack + zlib) and put/get
+# latency per backend. Answers are sections of the documents under data/, like real RAG answers.
+# The Redis backend uses fakeredis (pip install fakeredis) unless --redis points at a server.
+#
+# Usage: python -m benchmarks.bench_history_store --conversations 200 --turns 10 [--redis]
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fakeredis
+from app.core import cache
+from app.core.config import settings
+from app.core.metrics import percentile
+from app.core.history_store import RedisHistoryStore, MemoryHistoryStore
+
+QUESTIONS = [
+    "What is the leave policy?",
+    "Summarise the Q3 marketing results.",
+    "What were the operating expenses last quarter?",
+    "How does the payments service handle retries?",
+]
+
+def load_answers(data_path):
+    answers = []
+    for path in sorted(Path(data_path).rglob("*.md")):
+        text = path.read_text(encoding="utf-8")
+        answers.extend(section.strip() for section in text.split("\n## ") if len(section.strip()) > 200)
+    return answers
+
+def run(store, conversations, turns, answers):
+    rng = random.Random(0)
+    put_times, get_times = [], []
+    for turn in range(turns):
+        for i in range(conversations):
+            messages = [
+                {"role": "user", "content": rng.choice(QUESTIONS)},
+                {"role": "assistant", "content": rng.choice(answers)[:2000]}
+            ]
+            start = time.perf_counter()
+            store.load("bench", f"conv{i}")
+            get_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            store.append("bench", f"conv{i}", messages)
+            put_times.append(time.perf_counter() - start)
+    stored = sum(store.conversation_bytes("bench", f"conv{i}") for i in range(conversations)) / conversations
+    # the same messages as the JSON text the history used to be stored as
+    as_json = sum(
+        len(json.dumps(m).encode("utf-8")) for i in range(conversations) for m in store.load("bench", f"conv{i}")[0]
+    ) / conversations
+    put_times.sort()
+    get_times.sort()
+    return stored, as_json, put_times, get_times
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--redis", action="store_true", help="use the Redis from settings instead of fakeredis")
+    args = parser.parse_args()
+
+    answers = load_answers(settings.DATA_PATH)
+    if args.redis:
+        redis_client = cache.redis_client
+    else:
+        redis_client = fakeredis.FakeRedis()
+
+    print(f"{'backend':<8} {'encoding':<15} {'json B/conv':>12} {'stored B/conv':>14} {'ratio':>6} "
+          f"{'put p50 us':>11} {'put p99 us':>11} {'get p50 us':>11} {'get p99 us':>11}")
+    for encoding, compress_min_bytes in (("msgpack", 0), ("msgpack + zlib", 512)):
+        settings.HISTORY_COMPRESS_MIN_BYTES = compress_min_bytes
+        for store in (RedisHistoryStore(redis_client, None, cache.redis_call), MemoryHistoryStore(0, 0)):
+            if store.name == "redis":
+                redis_client.flushdb()
+            stored, as_json, put_times, get_times = run(store, args.conversations, args.turns, answers)
+            print(f"{store.name:<8} {encoding:<15} {as_json:>12.0f} {stored:>14.0f} {as_json / stored:>5.1f}x "
+                  f"{percentile(put_times, 0.5) * 1e6:>11.0f} {percentile(put_times, 0.99) * 1e6:>11.0f} "
+                  f"{percentile(get_times, 0.5) * 1e6:>11.0f} {percentile(get_times, 0.99) * 1e6:>11.0f}")
+
+if __name__ == "__main__":
+    main()
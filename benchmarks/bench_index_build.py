@@ -0,0 +1,58 @@
+# Index build scaling benchmark :- serial vs ProcessPoolExecutor build over a replicated corpus
+#
+# Usage: python -m benchmarks.bench_index_build --copies 50 --workers 1 2 4 8
+import os
+import sys
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings
+from app.services import index_builder
+
+def replicate_corpus(source, target, copies):
+    for root, _, files in os.walk(source):
+        for file in files:
+            if not file.endswith("md"):
+                continue
+            relative_dir = Path(root).relative_to(source)
+            for copy in range(copies):
+                destination = Path(target) / relative_dir / f"copy{copy:04d}_{file}"
+                destination.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(Path(root) / file, destination)
+
+def digest(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()[:16]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--copies", type=int, default=50, help="copies of every source document")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()])
+    args = parser.parse_args()
+
+    source = Path(settings.DATA_PATH).resolve()
+    with tempfile.TemporaryDirectory() as workdir:
+        corpus = Path(workdir) / "data"
+        replicate_corpus(source, corpus, args.copies)
+        files = sum(1 for _ in corpus.rglob("*.md"))
+        os.chdir(workdir)
+
+        print(f"Corpus: {files} files | cores: {os.cpu_count()}")
+        print(f"{'workers':>8} {'seconds':>9} {'speed-up':>9}  index.bin digest")
+
+        baseline = None
+        for workers in args.workers:
+            shutil.rmtree(index_builder.INDEX_PATH, ignore_errors=True)
+            start = time.perf_counter()
+            index_builder.IndexBuilder(str(corpus)).build(workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>9.2f} {baseline / elapsed:>8.2f}x  {digest(index_builder.BINARY_INDEX_FILE)}")
+
+if __name__ == "__main__":
+    main()
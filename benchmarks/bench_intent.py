@@ -0,0 +1,130 @@
+# Intent fast path :- classifier overhead and accuracy on held-out messages, then /chat latency per route
+# with intent routing on vs off. Drives /chat in-process with fakeredis (pip install fakeredis) against
+# the fake Ollama server.
+#
+# Usage: python -m benchmarks.bench_intent --rounds 3
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+from collections import defaultdict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fakeredis
+import httpx
+from app.core import cache
+from app.core.config import settings
+from app.core.history_store import RedisHistoryStore
+from app.core.metrics import percentile
+from app.core.security import create_access_tokens
+from app.services import answer_cache, streaming
+from app.services.ollama_pool import reset_pool
+from app.services.intent_classifier import IntentClassifier
+from app.services.rag_orchestrator import route_message
+from benchmarks.fake_ollama import start_process
+
+# not in models/intent_examples.json
+HELD_OUT = [
+    ("hi, good evening to you", "greeting"),
+    ("hey, good afternoon", "greeting"),
+    ("thanks so much", "thanks"),
+    ("thank you, that helps", "thanks"),
+    ("bye for now", "goodbye"),
+    ("see you tomorrow", "goodbye"),
+    ("how is your day going", "smalltalk"),
+    ("who made this assistant", "smalltalk"),
+    ("what is the reimbursement limit for client dinners", "question"),
+    ("summarise the q3 marketing campaign results", "question"),
+    ("how many casual leaves can I carry forward", "question"),
+    ("which services does the payments api depend on", "question"),
+    ("what were total operating expenses in 2024", "question"),
+    ("explain the code review process", "question"),
+    # questions that open with or contain chit-chat words
+    ("morning shift allowance", "question"),
+    ("good morning, salary date?", "question"),
+    ("ok thanks, and maternity leave?", "question"),
+    ("hey, gratuity eligibility?", "question"),
+    ("thanks, payroll date?", "question"),
+    ("morning! pension contribution?", "question"),
+    # requests for help are questions, not thanks
+    ("help!", "question"),
+    ("please help", "question"),
+    ("i need help with my reimbursement", "question"),
+]
+
+MESSAGES = ["hi", "thanks!", "how are you", "bye", "What is the leave policy?"]
+
+def bench_classifier(repeat):
+    classifier = IntentClassifier.load()
+    correct = sum(classifier.predict(text)[0] == label for text, label in HELD_OUT)
+    timings = []
+    for _ in range(repeat):
+        for text, _ in HELD_OUT:
+            start = time.perf_counter()
+            classifier.predict(text)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"Held-out accuracy: {correct}/{len(HELD_OUT)} ({correct / len(HELD_OUT):.0%})")
+    print(f"Classification: p50 {percentile(timings, 0.5) * 1e6:.0f}us | p99 {percentile(timings, 0.99) * 1e6:.0f}us")
+
+async def run_messages(app, rounds, user):
+    latencies = defaultdict(list)
+    token = create_access_tokens({"sub": user, "role": "employee"})
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for i in range(rounds):
+            for message in MESSAGES:
+                start = time.perf_counter()
+                payload = {"query": message, "conversation_id": f"bench{i}"}
+                response = await client.post("/chat", json=payload, headers={"Authorization": f"Bearer {token}"})
+                response.raise_for_status()
+                latencies[message].append(time.perf_counter() - start)
+    # the pooled client belongs to this event loop
+    await streaming.close_ollama_client()
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=2000, help="classification passes over the held-out set")
+    parser.add_argument("--tokens", type=int, default=120, help="tokens per answer")
+    parser.add_argument("--prompt-eval-delay", type=float, default=0.0005, help="seconds per prompt token")
+    parser.add_argument("--port", type=int, default=11481)
+    args = parser.parse_args()
+
+    bench_classifier(args.repeat)
+
+    redis_server = fakeredis.FakeServer()
+    cache.set_history_store(RedisHistoryStore(
+        fakeredis.FakeRedis(server=redis_server),
+        lambda: fakeredis.FakeAsyncRedis(server=redis_server),
+        cache.redis_call
+    ))
+    # every message should reach the model
+    answer_cache.ANSWER_CACHE.max_entries = 0
+    settings.OLLAMA_HEALTH_INTERVAL = 0
+    settings.SMALL_MODEL = "small"
+
+    import main as api
+
+    server = start_process(args.port, tokens=args.tokens, delay=0.001, prompt_eval_delay=args.prompt_eval_delay)
+    reset_pool([f"http://127.0.0.1:{args.port}/api/generate"])
+    try:
+        runs = {}
+        for mode, enabled in (("routing off", False), ("routing on", True)):
+            settings.INTENT_ROUTING = enabled
+            runs[mode] = asyncio.run(run_messages(api.app, args.rounds, f"bench_{enabled}"))
+
+        print(f"{'message':<28} {'route':<12} {'off mean ms':>12} {'on mean ms':>11}")
+        for message in MESSAGES:
+            _, route = route_message(message)
+            off = sum(runs["routing off"][message]) / args.rounds
+            on = sum(runs["routing on"][message]) / args.rounds
+            print(f"{message:<28} {route:<12} {off * 1000:>12.0f} {on * 1000:>11.0f}")
+    finally:
+        server.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# Login storm :- latency of a threadpool endpoint (/jwt_validation) while hundreds of users log in at once,
+# with bcrypt on the shared request threadpool (PASSWORD_WORKERS=0, the old behaviour) vs its own bounded
+# pool, then a brute-force burst against one account to count how many attempts reach bcrypt.
+# Uses a throwaway SQLite database.
+#
+# Usage: python -m benchmarks.bench_login --users 300
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_login.db"
+
+import httpx
+from app.core.config import settings, engine, SessionLocal
+from app.core.metrics import metrics, percentile
+from app.core.security import create_access_tokens, hash_password
+from app.models import Base, Employee
+from app.services.scheduler import PASSWORD_SCHEDULER
+from app.api import auth
+
+PASSWORD = "bench-password"
+
+def create_users(count):
+    Base.metadata.create_all(engine)
+    # one hash for everyone; hashing each would take count * ~0.3s
+    hashed = hash_password(PASSWORD)
+    with SessionLocal() as db:
+        db.add_all(
+            Employee(employee_id=f"E{i}", email=f"user{i}@bench", role="employee", hashed_password=hashed)
+            for i in range(count)
+        )
+        db.commit()
+
+async def storm(app, users, probe_interval):
+    token = create_access_tokens({"sub": "probe", "role": "employee"})
+    transport = httpx.ASGITransport(app=app)
+    login_times, probe_times, queue_depth = [], [], [0]
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        async def login(i):
+            start = time.perf_counter()
+            response = await client.post("/login", data={"username": f"user{i}@bench", "password": PASSWORD})
+            login_times.append((time.perf_counter() - start, response.status_code))
+
+        async def probe(done):
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/jwt_validation", headers={"Authorization": f"Bearer {token}"})
+                probe_times.append(time.perf_counter() - start)
+                queue_depth[0] = max(queue_depth[0], metrics.snapshot()["gauges"].get("scheduler.password.queued", 0))
+                await asyncio.sleep(probe_interval)
+
+        done = asyncio.Event()
+        probe_task = asyncio.create_task(probe(done))
+        start = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(users)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await probe_task
+
+    return login_times, sorted(probe_times), queue_depth[0], elapsed
+
+async def brute_force(app, attempts):
+    transport = httpx.ASGITransport(app=app)
+    statuses = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        async def attempt():
+            response = await client.post("/login", data={"username": "user0@bench", "password": "wrong"})
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        # all at once, so attempts in flight must count against the limit
+        start = time.perf_counter()
+        await asyncio.gather(*(attempt() for _ in range(attempts)))
+    return statuses, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=settings.PASSWORD_WORKERS, help="bcrypt workers for the bounded run")
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    parser.add_argument("--attempts", type=int, default=200, help="brute-force attempts against one account")
+    args = parser.parse_args()
+
+    create_users(args.users)
+    settings.OLLAMA_HEALTH_INTERVAL = 0
+    PASSWORD_SCHEDULER.queue_size = max(PASSWORD_SCHEDULER.queue_size, args.users)
+    PASSWORD_SCHEDULER.queue_timeout = 600
+    # every storm login comes from the one test client IP
+    auth.IP_LIMITER.limit = 0
+
+    import main as api
+
+    print(f"{'bcrypt pool':<18} {'login p50 s':>11} {'login p99 s':>11} {'probe p50 ms':>13} {'probe p99 ms':>13} "
+          f"{'peak queue':>10} {'total s':>8}")
+    for name, workers in (("request threadpool", 0), (f"{args.workers} workers", args.workers)):
+        settings.PASSWORD_WORKERS = workers
+        PASSWORD_SCHEDULER.limit = workers
+        login_times, probe_times, queue_depth, elapsed = asyncio.run(storm(api.app, args.users, args.probe_interval))
+        failed = sum(status != 200 for _, status in login_times)
+        times = sorted(t for t, _ in login_times)
+        print(f"{name:<18} {percentile(times, 0.5):>11.2f} {percentile(times, 0.99):>11.2f} "
+              f"{percentile(probe_times, 0.5) * 1000:>13.1f} {percentile(probe_times, 0.99) * 1000:>13.1f} "
+              f"{queue_depth:>10.0f} {elapsed:>8.1f}" + (f"  ({failed} failed)" if failed else ""))
+
+    auth.IP_LIMITER.limit = settings.LOGIN_IP_FAILURES
+    statuses, elapsed = asyncio.run(brute_force(api.app, args.attempts))
+    print(f"Brute force: {args.attempts} attempts in {elapsed:.1f}s | {statuses.get(401, 0)} reached bcrypt or the "
+          f"account check | {statuses.get(429, 0)} shed with 429")
+    auth.ACCOUNT_LIMITER.reset("user0@bench")
+    auth.IP_LIMITER.reset("127.0.0.1")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Ollama backend pool :- throughput as fake backends are added, with one dead backend in the list
+#
+# Usage: python -m benchmarks.bench_ollama_pool --backends 1 2 3 --parallel 4 --streams 48
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.metrics import metrics
+from app.services import streaming
+from app.services.ollama_pool import reset_pool
+from benchmarks.fake_ollama import start_process
+
+BASE_PORT = 11440
+# nothing listens here; the circuit breaker should take it out of rotation
+DEAD_URL = "http://127.0.0.1:11439/api/generate"
+
+async def run_streams(streams):
+    async def one(i):
+        chunks = []
+        async for chunk in streaming.astream_ollama(f"question {i}"):
+            chunks.append(chunk)
+        return "Error generating response." not in chunks
+
+    try:
+        return await asyncio.gather(*(one(i) for i in range(streams)))
+    finally:
+        await streaming.close_ollama_client()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--parallel", type=int, default=4, help="concurrent generations per backend")
+    parser.add_argument("--streams", type=int, default=48)
+    parser.add_argument("--tokens", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    servers = [
+        start_process(BASE_PORT + i, tokens=args.tokens, delay=args.delay, parallel=args.parallel)
+        for i in range(max(args.backends))
+    ]
+    try:
+        print(f"{args.streams} streams, {args.parallel} slots per backend, one dead backend listed first")
+        print(f"{'backends':>8} {'wall s':>8} {'ok':>5} {'retries':>8}  requests per backend")
+        for count in args.backends:
+            urls = [DEAD_URL] + [f"http://127.0.0.1:{BASE_PORT + i}/api/generate" for i in range(count)]
+            pool = reset_pool(urls)
+            retries_before = metrics.snapshot()["counters"].get("ollama.retries", 0)
+
+            start = time.perf_counter()
+            results = asyncio.run(run_streams(args.streams))
+            elapsed = time.perf_counter() - start
+
+            retries = metrics.snapshot()["counters"].get("ollama.retries", 0) - retries_before
+            spread = " ".join(f"{b.name}={b.requests}({b.state})" for b in pool.backends)
+            print(f"{count:>8} {elapsed:>8.2f} {sum(results):>5} {int(retries):>8}  {spread}")
+    finally:
+        for server in servers:
+            server.terminate()
+
+if __name__ == "__main__":
+    main()
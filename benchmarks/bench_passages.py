@@ -0,0 +1,89 @@
+# Passage extraction :- prompt tokens with whole sections vs best passages on a fixed query set, and how many
+# hand-labelled answers survive extraction
+#
+# Usage: python -m benchmarks.bench_passages [--max-tokens 256]
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings
+from app.services.retrieval import retrieve, tokenize_query, current_generation
+from app.services.passage_extractor import extract_passages
+from app.services.context_packer import pack_contexts, count_tokens
+from app.services.rag_orchestrator import build_prompt
+
+# (role, query, hand-labelled answer spans); a span only counts when retrieval returned a section holding it
+QUERIES = [
+    ("employee", "How many days of annual leave do employees get?", ["15-21 days/year"]),
+    ("employee", "What is the maternity leave policy?", ["26 weeks (first two children)"]),
+    ("employee", "How are travel expenses reimbursed?", ["economy class", "submit your claim within 30 days"]),
+    ("employee", "types of leave", ["Privilege/Annual", "Compensatory Off", "Public Holidays"]),
+    ("hr", "What happens during the notice period when an employee resigns?", ["typically 30-90 days"]),
+    ("hr", "How often are performance reviews conducted?", ["Annual and mid-year reviews"]),
+    ("finance", "What was the gross margin in Q3 2024?", ["**Gross Margin**: 62%"]),
+    ("finance", "What were the total operating expenses in 2024?", ["Operating Expenses to Revenue Ratio**: 40%"]),
+    ("finance", "How did vendor costs change in Q2?", ["$125 million"]),
+    ("finance", "quarterly expense breakdown", ["$120 million, with 40%", "Other Operational Expenses**: $30 million"]),
+    ("marketing", "What was the customer acquisition cost in Q1 2024?", ["$13.33"]),
+    ("marketing", "What was the ROI target in Q4?", ["4.4x"]),
+    ("marketing", "What are the marketing targets for Q2 2024?", ["200,000 new customers", "$6 million", "$2.5 million"]),
+    ("developer", "Which database is used in the technology stack?", ["PostgreSQL 15, MongoDB 6.0, Redis 7.0"]),
+    ("developer", "How are deployments rolled back?", ["Automated rollback on failure"]),
+    ("developer", "What encryption is used for data at rest?", ["AES-256 encryption using AWS KMS"]),
+    ("c-level", "What are the recommendations for 2025?", ["Optimize Marketing ROI", "Enhance Cash Flow Management"]),
+    ("c-level", "what is the high-level architecture?", ["[Infrastructure]", "Cloudflare (CDN, DDoS Protection)"]),
+    ("manager", "What monitoring tools does engineering use?", ["Prometheus, Grafana, ELK Stack"]),
+]
+
+def prompt_tokens(query, contexts):
+    packed, _ = pack_contexts(contexts, settings.CONTEXT_TOKEN_BUDGET)
+    return count_tokens(build_prompt(query, packed))
+
+def found_spans(spans, contexts):
+    return {span for span in spans if any(span in (ctx["content"] or "") for ctx in contexts)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-tokens", type=int, default=settings.PASSAGE_MAX_TOKENS)
+    args = parser.parse_args()
+
+    term_weight = current_generation().term_weight
+    totals = {"sections": 0, "passages": 0, "prompt_sections": 0, "prompt_passages": 0}
+    kept, answerable, missed = 0, 0, []
+
+    print(f"{'role':<10} {'sections':>9} {'passages':>9} {'ratio':>6}  query")
+    for role, query, spans in QUERIES:
+        query_tokens = tokenize_query(query)
+        contexts = retrieve(query, role)
+        extracted = [extract_passages(ctx, query_tokens, term_weight, args.max_tokens) for ctx in contexts]
+
+        section_tokens = sum(count_tokens(ctx["content"]) for ctx in contexts)
+        passage_tokens = sum(count_tokens(ctx["content"]) for ctx in extracted)
+        totals["sections"] += section_tokens
+        totals["passages"] += passage_tokens
+        totals["prompt_sections"] += prompt_tokens(query, contexts)
+        totals["prompt_passages"] += prompt_tokens(query, extracted)
+
+        # answers present in the retrieved sections must survive extraction
+        in_sections = found_spans(spans, contexts)
+        in_passages = found_spans(in_sections, extracted)
+        answerable += len(in_sections)
+        kept += len(in_passages)
+        missed += [f"{query} -> {span}" for span in sorted(in_sections - in_passages)]
+
+        ratio = section_tokens / passage_tokens if passage_tokens else 0.0
+        print(f"{role:<10} {section_tokens:>9} {passage_tokens:>9} {ratio:>5.1f}x  {query}")
+
+    print()
+    print(f"Context tokens: {totals['sections']} -> {totals['passages']} "
+          f"({totals['sections'] / max(totals['passages'], 1):.1f}x smaller)")
+    print(f"Prompt tokens (budget {settings.CONTEXT_TOKEN_BUDGET}): {totals['prompt_sections']} -> {totals['prompt_passages']} "
+          f"({totals['prompt_sections'] / max(totals['prompt_passages'], 1):.1f}x smaller)")
+    print(f"Answer spans kept: {kept}/{answerable} ({100 * kept / max(answerable, 1):.1f}%)")
+    for miss in missed:
+        print(f"  missing: {miss}")
+
+if __name__ == "__main__":
+    main()
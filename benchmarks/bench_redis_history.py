@@ -0,0 +1,107 @@
+# Redis history round trips :- per-turn latency of the old write path (rpush + ltrim + incr per message,
+# then lrange) vs one pipelined read and one MULTI write on the pooled async client, with many
+# conversations in flight. Uses the Redis from settings, or a fakeredis TCP server with --fake.
+#
+# Usage: python -m benchmarks.bench_redis_history --turns 20 --concurrency 50 [--fake]
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import redis
+from app.core import cache
+from app.core.config import settings
+from app.core.metrics import metrics, percentile
+
+ANSWER = "The leave policy allows 24 days of paid leave per year. " * 10
+
+async def sequential_turn(client, username, conversation_id):
+    key = f"chat:{username}:{conversation_id}"
+    await client.lrange(key, 0, -1)
+    for role, content in (("user", "What is the leave policy?"), ("assistant", ANSWER)):
+        await client.rpush(key, json.dumps({"role": role, "content": content}))
+        await client.ltrim(key, -settings.MAX_HISTORY, -1)
+        await client.incr(f"{key}:count")
+
+async def pipelined_turn(client, username, conversation_id):
+    await cache.aget_history(username, conversation_id)
+    await cache.asave_turn(username, conversation_id, "What is the leave policy?", ANSWER)
+
+async def run(mode, turns, concurrency):
+    client = cache.get_async_redis()
+    await client.flushdb()
+    timings = []
+
+    async def conversation(i):
+        for _ in range(turns):
+            start = time.perf_counter()
+            if mode == "sequential":
+                await sequential_turn(client, "bench", f"conv{i}")
+            else:
+                await pipelined_turn(client, "bench", f"conv{i}")
+            timings.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(conversation(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await cache.close_async_redis()
+    timings.sort()
+    return timings, elapsed
+
+# fakeredis answers each pipelined command with its own small write; without TCP_NODELAY those replies
+# stall on delayed ACKs, which real Redis does not do
+FAKE_SERVER = """
+import socket
+from fakeredis import TcpFakeServer
+
+class NoDelayServer(TcpFakeServer):
+    def get_request(self):
+        connection, address = super().get_request()
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return connection, address
+
+NoDelayServer(("127.0.0.1", {port})).serve_forever()
+"""
+
+def start_fake_server(port):
+    process = subprocess.Popen([sys.executable, "-c", FAKE_SERVER.format(port=port)])
+    for _ in range(100):
+        try:
+            redis.Redis(port=port).ping()
+            return process
+        except redis.ConnectionError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("fakeredis server did not start")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=20, help="turns per conversation")
+    parser.add_argument("--concurrency", type=int, default=50, help="conversations in flight")
+    parser.add_argument("--fake", action="store_true", help="run against a local fakeredis TCP server")
+    parser.add_argument("--fake-port", type=int, default=16399)
+    args = parser.parse_args()
+
+    server = None
+    if args.fake:
+        server = start_fake_server(args.fake_port)
+        settings.REDIS_HOST, settings.REDIS_PORT = "127.0.0.1", args.fake_port
+    try:
+        print(f"{'mode':<11} {'round trips':>11} {'p50 ms':>8} {'p99 ms':>8} {'turns/s':>8}")
+        for mode, round_trips in (("sequential", 7), ("pipelined", 2)):
+            timings, elapsed = asyncio.run(run(mode, args.turns, args.concurrency))
+            print(f"{mode:<11} {round_trips:>11} {percentile(timings, 0.5) * 1000:>8.2f} "
+                  f"{percentile(timings, 0.99) * 1000:>8.2f} {len(timings) / elapsed:>8.0f}")
+        saturation = metrics.snapshot()["gauges"].get("redis.async.saturation")
+        print(f"Async pool: {settings.REDIS_MAX_CONNECTIONS} connections | last saturation: {saturation}")
+    finally:
+        if server:
+            server.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# LLM scheduler under overload :- latency of admitted requests with and without the concurrency limit,
+# against a fake Ollama that can only run a few generations at once
+#
+# Usage: python -m benchmarks.bench_scheduler --streams 200 --limit 4 --queue 16
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services import streaming
+from app.services.ollama_pool import reset_pool
+from app.services.scheduler import Scheduler, SchedulerRejected, PRIORITY_HIGH, PRIORITY_INTERACTIVE
+from benchmarks.fake_ollama import start_process
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+async def run_burst(scheduler, streams, arrival_gap):
+    async def one(i):
+        await asyncio.sleep(i * arrival_gap)
+        start = time.perf_counter()
+        # every tenth request comes from a high-priority role
+        priority = PRIORITY_HIGH if i % 10 == 0 else PRIORITY_INTERACTIVE
+        try:
+            ticket = await scheduler.acquire(priority)
+        except SchedulerRejected as e:
+            return e.status_code, time.perf_counter() - start, priority
+        try:
+            async for _ in streaming.astream_ollama(f"question {i}"):
+                pass
+        finally:
+            ticket.release()
+        return 200, time.perf_counter() - start, priority
+
+    try:
+        return await asyncio.gather(*(one(i) for i in range(streams)))
+    finally:
+        await streaming.close_ollama_client()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=4)
+    parser.add_argument("--queue", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=5.0)
+    parser.add_argument("--parallel", type=int, default=4, help="generations the fake backend runs at once")
+    parser.add_argument("--tokens", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.02)
+    parser.add_argument("--arrival-gap", type=float, default=0.005, help="seconds between arrivals")
+    parser.add_argument("--port", type=int, default=11460)
+    args = parser.parse_args()
+
+    server = start_process(args.port, tokens=args.tokens, delay=args.delay, parallel=args.parallel)
+    reset_pool([f"http://127.0.0.1:{args.port}/api/generate"])
+    try:
+        print(f"{args.streams} requests, backend runs {args.parallel} at once, {args.tokens} tokens x {args.delay * 1000:.0f} ms")
+        print(f"{'mode':<26} {'ok':>5} {'429':>5} {'503':>5} {'ok p50 s':>9} {'ok p99 s':>9} {'high p99 s':>10}")
+        modes = [
+            ("unlimited", Scheduler("bench_unlimited", 0, 0, 0)),
+            (f"limit {args.limit}, queue {args.queue}", Scheduler("bench", args.limit, args.queue, args.timeout)),
+        ]
+        for name, scheduler in modes:
+            results = asyncio.run(run_burst(scheduler, args.streams, args.arrival_gap))
+            ok = [latency for status, latency, _ in results if status == 200]
+            high = [latency for status, latency, priority in results if status == 200 and priority == PRIORITY_HIGH]
+            counts = {code: sum(1 for status, _, _ in results if status == code) for code in (200, 429, 503)}
+            print(f"{name:<26} {counts[200]:>5} {counts[429]:>5} {counts[503]:>5} "
+                  f"{percentile(ok, 0.5):>9.2f} {percentile(ok, 0.99):>9.2f} {percentile(high, 0.99):>10.2f}")
+    finally:
+        server.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Concurrent Ollama streams :- pooled async client vs blocking requests on a Starlette-sized threadpool,
+# against the local fake Ollama server
+#
+# Usage: python -m benchmarks.bench_streams --streams 400 --tokens 50 --delay 0.02
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services import streaming
+from app.services.ollama_pool import reset_pool
+from benchmarks.fake_ollama import start_process, reset_stats
+
+# anyio's default thread limiter, which caps sync StreamingResponse generators
+STARLETTE_THREADS = 40
+
+def percentiles(values):
+    values = sorted(values)
+    return values[len(values) // 2], values[int(len(values) * 0.95)]
+
+def sync_stream(prompt, start):
+    first_token = None
+    chunks = 0
+    for chunk in streaming.stream_ollama(prompt):
+        if first_token is None:
+            first_token = time.perf_counter() - start
+        chunks += 1
+    return first_token, chunks
+
+def run_sync(streams):
+    # time to first token counts from arrival, including the wait for a free thread
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=STARLETTE_THREADS) as pool:
+        return list(pool.map(sync_stream, [f"question {i}" for i in range(streams)], [start] * streams))
+
+async def async_stream(prompt, start):
+    first_token = None
+    chunks = 0
+    async for chunk in streaming.astream_ollama(prompt):
+        if first_token is None:
+            first_token = time.perf_counter() - start
+        chunks += 1
+    return first_token, chunks
+
+async def run_async(streams):
+    start = time.perf_counter()
+    try:
+        return await asyncio.gather(*(async_stream(f"question {i}", start) for i in range(streams)))
+    finally:
+        await streaming.close_ollama_client()
+
+def report(name, elapsed, results, port, tokens):
+    first_tokens = [first for first, _ in results]
+    complete = sum(1 for _, chunks in results if chunks == tokens + 1)
+    p50, p95 = percentiles(first_tokens)
+    peak = reset_stats(port)["peak_in_flight"]
+    print(f"{name:<22} {elapsed:>8.2f} {p50 * 1000:>9.0f} {p95 * 1000:>9.0f} {peak:>9} {complete:>9}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--streams", type=int, default=400)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.02, help="seconds between tokens")
+    parser.add_argument("--port", type=int, default=11435)
+    args = parser.parse_args()
+
+    fake_server = start_process(args.port, tokens=args.tokens, delay=args.delay)
+    reset_pool([f"http://127.0.0.1:{args.port}/api/generate"])
+    # sync sessions keep one pooled connection per thread
+    streaming.OLLAMA_SESSION.mount("http://", streaming.requests.adapters.HTTPAdapter(pool_maxsize=STARLETTE_THREADS))
+
+    print(f"{args.streams} streams x {args.tokens} tokens, {args.delay * 1000:.0f} ms/token")
+    print(f"{'client':<22} {'wall s':>8} {'ttft p50':>9} {'ttft p95':>9} {'peak open':>9} {'complete':>9}")
+
+    try:
+        start = time.perf_counter()
+        results = run_sync(args.streams)
+        report(f"requests x{STARLETTE_THREADS} threads", time.perf_counter() - start, results, args.port, args.tokens)
+
+        start = time.perf_counter()
+        results = asyncio.run(run_async(args.streams))
+        report("httpx.AsyncClient", time.perf_counter() - start, results, args.port, args.tokens)
+    finally:
+        fake_server.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# Minimal stand-in for Ollama's /api/generate :- streams canned tokens at a fixed rate
+#
+# Usage: python -m benchmarks.fake_ollama --port 11435 --tokens 50 --delay 0.02
+import json
+import asyncio
+import argparse
+import sys
+import time
+import subprocess
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+# rough prompt tokenisation, good enough to size prompt evaluation
+CHARS_PER_TOKEN = 4
+
+def create_app(tokens=50, delay=0.02, first_token_delay=0.0, parallel=0, prompt_eval_delay=0.0):
+    app = FastAPI()
+    # like OLLAMA_NUM_PARALLEL: further requests wait for a free slot
+    slots = asyncio.Semaphore(parallel) if parallel > 0 else None
+    app.state.in_flight = 0
+    app.state.peak_in_flight = 0
+    app.state.requests = 0
+    app.state.prompt_eval_tokens = 0
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        # a passed-in context is already evaluated, only the new prompt text costs time
+        context = body.get("context") or []
+        prompt_tokens = len(body.get("prompt", "")) // CHARS_PER_TOKEN
+        prompt_eval_time = prompt_tokens * prompt_eval_delay
+        app.state.prompt_eval_tokens += prompt_tokens
+
+        if not body.get("stream", True):
+            await asyncio.sleep(first_token_delay + prompt_eval_time + tokens * delay)
+            return {"model": body.get("model"), "response": "token " * tokens, "done": True}
+
+        async def token_stream():
+            if slots:
+                await slots.acquire()
+            app.state.in_flight += 1
+            app.state.peak_in_flight = max(app.state.peak_in_flight, app.state.in_flight)
+            try:
+                await asyncio.sleep(first_token_delay + prompt_eval_time)
+                for i in range(tokens):
+                    await asyncio.sleep(delay)
+                    yield json.dumps({"model": body.get("model"), "response": f"token{i} ", "done": False}) + "\n"
+                yield json.dumps({
+                    "model": body.get("model"),
+                    "response": "",
+                    "done": True,
+                    "context": context + list(range(prompt_tokens + tokens)),
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": int(prompt_eval_time * 1e9)
+                }) + "\n"
+            finally:
+                app.state.in_flight -= 1
+                if slots:
+                    slots.release()
+
+        return StreamingResponse(token_stream(), media_type="application/x-ndjson")
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": "fake"}]}
+
+    @app.post("/stats/reset")
+    async def reset_stats():
+        stats = {
+            "in_flight": app.state.in_flight,
+            "peak_in_flight": app.state.peak_in_flight,
+            "requests": app.state.requests,
+            "prompt_eval_tokens": app.state.prompt_eval_tokens
+        }
+        app.state.peak_in_flight = 0
+        app.state.requests = 0
+        app.state.prompt_eval_tokens = 0
+        return stats
+
+    return app
+
+def start_process(port, tokens=50, delay=0.02, first_token_delay=0.0, parallel=0, prompt_eval_delay=0.0):
+    # separate process, so the fake server does not compete with the client for the GIL
+    process = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_ollama", "--port", str(port), "--tokens", str(tokens),
+        "--delay", str(delay), "--first-token-delay", str(first_token_delay), "--parallel", str(parallel),
+        "--prompt-eval-delay", str(prompt_eval_delay)
+    ])
+    for _ in range(100):
+        try:
+            httpx.post(f"http://127.0.0.1:{port}/stats/reset")
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("fake Ollama server did not start")
+
+def reset_stats(port):
+    return httpx.post(f"http://127.0.0.1:{port}/stats/reset").json()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.02, help="seconds between tokens")
+    parser.add_argument("--first-token-delay", type=float, default=0.0)
+    parser.add_argument("--parallel", type=int, default=0, help="concurrent generations, 0 for unlimited")
+    parser.add_argument("--prompt-eval-delay", type=float, default=0.0, help="seconds per prompt token")
+    args = parser.parse_args()
+    app = create_app(args.tokens, args.delay, args.first_token_delay, args.parallel, args.prompt_eval_delay)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning", backlog=4096)
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,40 @@ from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from app.api import auth
 from app.api import chat
+from app.api import admin
+from app.api import conversations
+from app.core.config import settings
 from app.core.logger import logger
+from app.services.retrieval import start_index_watcher
+from app.services.streaming import close_ollama_client, get_ollama_client
+from app.services.ollama_pool import get_pool
+from app.core.cache import close_async_redis
+import asyncio
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("🚀 Internal Chatbot API is starting up...")
-    logger.info("Routers registered: auth, chat")
+    logger.info("Routers registered: auth, chat, admin, conversations")
     logger.info("-" * 60)
 
+    index_watcher = None
+    if settings.INDEX_WATCH_INTERVAL > 0:
+        index_watcher = start_index_watcher(settings.INDEX_WATCH_INTERVAL)
+    elif settings.INDEX_RELOAD_POLL_INTERVAL > 0:
+        # /admin/reload-index is served by one worker; the others follow its reload marker
+        index_watcher = start_index_watcher(settings.INDEX_RELOAD_POLL_INTERVAL, follow_files=False)
+
+    health_checks = None
+    if settings.OLLAMA_HEALTH_INTERVAL > 0:
+        health_checks = asyncio.create_task(get_pool().health_loop(get_ollama_client(), settings.OLLAMA_HEALTH_INTERVAL))
+
     yield
+    if index_watcher:
+        index_watcher.set()
+    if health_checks:
+        health_checks.cancel()
+    await close_ollama_client()
+    await close_async_redis()
     logger.info("🛑 Internal Chatbot API is shutting down...")
     logger.info("-" * 60)
 
@@ -18,6 +43,8 @@ app = FastAPI(title = "Internal Chatbot Api",lifespan=lifespan)
 
 app.include_router(auth.router)
 app.include_router(chat.router)
+app.include_router(admin.router)
+app.include_router(conversations.router)
 
 @app.get("/")
 def root():
@@ -0,0 +1,60 @@
+import os
+import sys
+import json
+import random
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+# the app reads page_index/ relative to the working directory
+os.chdir(ROOT)
+
+for name, value in {
+    "SECRET_KEY": "test-secret",
+    "ACCESS_TOKENS_EXPIRE_MINUTES": "60",
+    "OLLAMA_MODEL": "test-model",
+    "OLLAMA_URL": "http://127.0.0.1:9/api/generate",
+    "ALGORITHM": "HS256",
+    "DATABASE_URL": f"sqlite:///{tempfile.mkdtemp()}/test.db",
+    "MAX_HISTORY": "10",
+    "CSV_PATH": str(ROOT / "data" / "HR" / "hr_data.csv"),
+    "DEFAULT_PASSWORD": "test-password",
+    "DATA_PATH": str(ROOT / "data"),
+    "HISTORY_BACKEND": "memory",
+}.items():
+    os.environ.setdefault(name, value)
+
+DATA_PATH = ROOT / "data"
+
+def build_index(directory, workers=1, data_path=DATA_PATH, incremental=False):
+    from app.services.index_builder import IndexBuilder
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        builder = IndexBuilder(str(data_path))
+        if incremental:
+            builder.build_incremental()
+        else:
+            builder.build(workers=workers)
+    finally:
+        os.chdir(cwd)
+    return Path(directory) / "page_index"
+
+@pytest.fixture(scope="session")
+def built_index(tmp_path_factory):
+    return build_index(tmp_path_factory.mktemp("serial"))
+
+@pytest.fixture(scope="session")
+def sample_queries():
+    # section headings plus seeded random term combinations from the shipped vocabulary
+    with open(ROOT / "page_index" / "page_store.json", encoding="utf-8") as f:
+        page_store = json.load(f)
+    with open(ROOT / "page_index" / "idf_index.json", encoding="utf-8") as f:
+        vocabulary = sorted(json.load(f))
+    queries = sorted({page["content"].partition("\n")[0].strip() for page in page_store.values() if page.get("content")})
+    rng = random.Random(7)
+    queries += [" ".join(rng.sample(vocabulary, rng.randint(1, 4))) for _ in range(150)]
+    return queries
@@ -0,0 +1,57 @@
+import shutil
+from pathlib import Path
+
+from conftest import DATA_PATH, build_index
+
+NEW_DOCUMENT = """---
+title: Remote Work Policy
+department: general
+role_access: employee,hr,c-level
+sensitivity: low
+document_type: policy
+last_updated: 2024-06-01
+version: 1.0
+---
+
+# Remote Work Policy
+
+## Eligibility
+Employees who completed probation may work remotely up to three days a week.
+
+## Equipment
+| Item | Allowance |
+|------|-----------|
+| Laptop | Provided |
+| Internet | 1,000 per month |
+"""
+
+def index_files(index_path):
+    return {path.name: path.read_bytes() for path in sorted(Path(index_path).iterdir())}
+
+def assert_same_files(actual, expected):
+    actual_files, expected_files = index_files(actual), index_files(expected)
+    assert sorted(actual_files) == sorted(expected_files)
+    for name in expected_files:
+        assert actual_files[name] == expected_files[name], f"{name} differs"
+
+def test_parallel_build_matches_serial(tmp_path, built_index):
+    parallel = build_index(tmp_path, workers=2)
+    assert_same_files(parallel, built_index)
+
+def test_incremental_build_matches_full_build(tmp_path):
+    data = tmp_path / "data"
+    shutil.copytree(DATA_PATH, data)
+    incremental_dir, full_dir = tmp_path / "incremental", tmp_path / "full"
+    incremental_dir.mkdir()
+    full_dir.mkdir()
+    build_index(incremental_dir, data_path=data)
+
+    # one edited, one deleted and one added document
+    edited = data / "marketing" / "marketing_report_q1_2024.md"
+    edited.write_text(edited.read_text(encoding="utf-8") + "\n## Addendum\nBudget moved to Q2 campaigns.\n", encoding="utf-8")
+    (data / "marketing" / "market_report_q4_2024.md").unlink()
+    (data / "general" / "remote_work_policy.md").write_text(NEW_DOCUMENT, encoding="utf-8")
+
+    incremental = build_index(incremental_dir, data_path=data, incremental=True)
+    full = build_index(full_dir, data_path=data)
+    assert_same_files(incremental, full)
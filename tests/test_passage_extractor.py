@@ -0,0 +1,64 @@
+from app.services.context_packer import count_tokens
+from app.services.passage_extractor import extract_passages, split_blocks, split_passages
+
+def idf(token):
+    return 1.0
+
+def section(content):
+    return {"page_id": "doc_sec_0", "content": content, "token_count": count_tokens(content)}
+
+FILLER = " ".join(f"Filler sentence number {i} about unrelated office matters." for i in range(40))
+
+def test_heading_only_match_keeps_the_section_in_document_order():
+    ctx = section(
+        "Quarterly Expense Breakdown\n"
+        "Spending was allocated to growth initiatives:\n\n"
+        "- **Vendor Services**: $120 million\n- **Software Subscriptions**: $45 million\n\n"
+        "Other costs covered travel and supplies.\n\n" + FILLER
+    )
+    content = extract_passages(ctx, ["quarterly", "expense", "breakdown"], idf, max_tokens=120)["content"]
+    assert "$120 million" in content and "$45 million" in content
+    assert content.index("allocated") < content.index("$120 million") < content.index("travel and supplies")
+    assert count_tokens(content) <= 120
+
+def test_unmatched_section_keeps_its_opening_passages():
+    ctx = section("Overview\nFirst paragraph of the overview.\n\nSecond paragraph of the overview.\n\n" + FILLER)
+    content = extract_passages(ctx, ["nothing", "matches"], idf, max_tokens=80)["content"]
+    assert "First paragraph" in content and "Second paragraph" in content
+
+def test_matching_table_row_keeps_the_whole_table():
+    ctx = section(
+        "Leave Entitlements\n"
+        "| Leave Type | Details |\n|------------|---------|\n"
+        "| **Privilege/Annual** | 15-21 days/year |\n"
+        "| **Sick Leave** | 12 days/year |\n"
+        "| **Compensatory Off** | For work on holidays |\n"
+        "| **Public Holidays** | 10-14 days/year |\n\n" + FILLER
+    )
+    content = extract_passages(ctx, ["sick"], idf)["content"]
+    for row in ("Privilege/Annual", "Sick Leave", "Compensatory Off", "Public Holidays"):
+        assert row in content
+    # one header for the table, not one per row
+    assert content.count("| Leave Type | Details |") == 1
+    assert "Filler sentence" not in content
+
+def test_fenced_block_stays_whole():
+    body = "Architecture\n```\n[Client Apps]\n  Web App\n\n[Data Layer]\n  PostgreSQL\n```\n\nClosing note."
+    blocks = split_blocks(body.partition("\n")[2])
+    assert blocks[0].startswith("```") and blocks[0].endswith("```")
+    assert "[Data Layer]" in blocks[0]
+    _, passages = split_passages(body)
+    assert all(passage["text"].count("```") % 2 == 0 for passage in passages)
+
+def test_split_fences_in_stored_passages_are_resplit():
+    content = "Architecture\n```\n[Client Apps]\n  Web App\n\n[Data Layer]\n  PostgreSQL\n```\n\n" + FILLER
+    stale = [{"text": "```\n[Client Apps]\n  Web App", "token_count": 8}, {"text": "[Data Layer]\n  PostgreSQL\n```", "token_count": 8}]
+    extracted = extract_passages({**section(content), "passages": stale}, ["postgresql"], idf)["content"]
+    assert "[Client Apps]" in extracted and extracted.count("```") == 2
+
+def test_long_list_is_windowed_by_item():
+    items = "\n".join(f"- **Item {i}**: value {i} with a longer description of the line item" for i in range(20))
+    _, passages = split_passages("Items\n" + items)
+    assert len(passages) > 1
+    for passage in passages:
+        assert all(line.startswith("- **Item") for line in passage["text"].splitlines())
@@ -0,0 +1,96 @@
+import json
+import threading
+from collections import defaultdict
+
+import pytest
+
+from app.core.config import settings
+from app.services import retrieval
+from app.services.retrieval import IndexGeneration, tokenize_query, search
+
+ROLES = ["employee", "hr", "finance", "marketing", "developer", "c-level"]
+
+class JsonReference:
+    # the original dict-of-postings retrieval, kept as the ranking every index format must reproduce
+    def __init__(self, index_path):
+        with open(index_path / "inverted_index.json", encoding="utf-8") as f:
+            self.inverted_index = json.load(f)
+        with open(index_path / "metadata_index.json", encoding="utf-8") as f:
+            self.metadata_index = json.load(f)
+        with open(index_path / "idf_index.json", encoding="utf-8") as f:
+            self.idf_index = json.load(f)
+
+    def retrieve(self, query, role, top_k=5, score_threshold=0.5):
+        allowed_pages = set(self.metadata_index.get(role.casefold(), []))
+        page_scores = defaultdict(float)
+        for token in tokenize_query(query):
+            for entry in self.inverted_index.get(token, []):
+                if entry["page_id"] in allowed_pages:
+                    page_scores[entry["page_id"]] += entry["tf"] * self.idf_index.get(token, 1.0)
+        ranked = sorted(page_scores.items(), key=lambda x: x[1], reverse=True)[:top_k]
+        return [(page_id, score) for page_id, score in ranked if score >= score_threshold]
+
+def ranking(contexts):
+    return [(ctx["page_id"], ctx["score"]) for ctx in contexts]
+
+def assert_same_ranking(actual, expected):
+    assert [page_id for page_id, _ in actual] == [page_id for page_id, _ in expected]
+    assert [score for _, score in actual] == pytest.approx([score for _, score in expected])
+
+@pytest.fixture
+def lexical_only(monkeypatch):
+    monkeypatch.setattr(settings, "HYBRID_RETRIEVAL", False)
+    monkeypatch.setattr(retrieval.RETRIEVAL_CACHE, "max_entries", 0)
+    retrieval.RETRIEVAL_CACHE.clear()
+
+@pytest.fixture(scope="module")
+def binary_generation(built_index):
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(built_index.parent)
+        generation = IndexGeneration.load(1)
+    return generation
+
+def test_top_k_search_matches_json_reference(sample_queries, lexical_only):
+    generation = retrieval.current_generation()
+    reference = JsonReference(retrieval.INDEX_PATH)
+    for role in ROLES:
+        for query in sample_queries:
+            tokens = tokenize_query(query)
+            if tokens:
+                assert_same_ranking(ranking(search(generation, tokens, role, 5, 0.5)), reference.retrieve(query, role))
+
+def test_retrieve_many_matches_retrieve(sample_queries, lexical_only):
+    for role in ROLES:
+        assert retrieval.retrieve_many(sample_queries, role) == [retrieval.retrieve(q, role) for q in sample_queries]
+
+def test_binary_index_matches_json_reference(built_index, binary_generation, sample_queries, lexical_only):
+    assert binary_generation.describe()["format"] == "binary"
+    reference = JsonReference(built_index)
+    with open(built_index / "page_store.json", encoding="utf-8") as f:
+        page_store = json.load(f)
+    for role in ROLES:
+        for query in sample_queries:
+            tokens = tokenize_query(query)
+            if not tokens:
+                continue
+            contexts = search(binary_generation, tokens, role, 5, 0.5)
+            assert_same_ranking(ranking(contexts), reference.retrieve(query, role))
+            # sections decoded lazily from the mapping equal the JSON page store
+            for ctx in contexts:
+                assert ctx["content"] == page_store[ctx["page_id"]]["content"]
+
+def test_index_watcher_survives_failed_checks(monkeypatch):
+    stop_event = threading.Event()
+    stamps = iter([OSError("page_index unavailable"), 123])
+
+    def reload_marker_stamp():
+        stamp = next(stamps)
+        if isinstance(stamp, Exception):
+            raise stamp
+        return stamp
+
+    monkeypatch.setattr(retrieval, "reload_marker_stamp", reload_marker_stamp)
+    monkeypatch.setattr(retrieval, "reload_index", stop_event.set)
+    # returns only once the check after the failure has reloaded
+    retrieval.watch_index(stop_event, 0.01, follow_files=False)
+    assert stop_event.is_set()